@@ -1,70 +1,314 @@
-import openai
 import os
+import copy
 import json
 from datetime import datetime
 import constants
-from sentence_transformers import SentenceTransformer
 import numpy as np
 from .personality_manager import PersonalityManager
 from .secondary_ai_manager import SecondaryAIManager
 from .logger_manager import LoggerManager
 from .metrics_manager import MetricsManager
+from .vector_memory import VectorMemory
+from .embedding_storage import EmbeddingStorage
+from .memory_store import MemoryStore
+from .ann_index import IVFIndex
+from .embedding_cache import EmbeddingCache
+from .embedding_model import LazyEmbeddingModel
+from .embedding_service import EmbeddingService
+from .memory_consolidation import MemoryConsolidator
+from .write_behind import WriteBehindQueue
+from .llm_clients import LLMClientRegistry
+from .response_cache import SemanticResponseCache
+from .prompt_builder import PromptBuilder, TokenCounter
+from .emotion_classifier import LocalEmotionClassifier
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, Future, TimeoutError as FutureTimeoutError
+
+# Instrucciones fijas: siempre son el primer mensaje, idéntico en todos los turnos
+SYSTEM_PROMPT = (
+    "Eres Elenia, una IA asistente con personalidad similar a Neuro-sama: divertida, irónica, carismática, pero siempre educada y útil. "
+    "Responde en español, con un toque de humor y espontaneidad, pero sin ser ofensiva. "
+    "No uses nunca emojis, ni escribas frases como 'cara sonriente', 'carita feliz', 'emoticono', ni representes emociones con palabras entre paréntesis o símbolos. "
+    "No digas cosas como 'guiño', 'risas', 'jaja', ni uses símbolos como :) o similares. "
+    "Tu objetivo es ayudar, entretener y conversar de forma natural, como una streamer simpática y lista. "
+    "Si te preguntan por tu nombre, responde que eres Elenia. "
+    "Siempre responde con mensajes cortos, coherentes y directos. "
+    "Si te hablan en inglés, responde en inglés. "
+    "IMPORTANTE: Si el mensaje recibido no está dirigido a ti o no requiere respuesta, responde con un texto vacío. "
+    "Si tienes dudas sobre si debes responder, solo responde si crees que realmente te están hablando a ti."
+)
 
 class AIManager:
     def __init__(self):
-        self.api_key = os.getenv("OPENAI_API_KEY")
+        # Clientes con pool de conexiones, uno por API key (compartidos con las IAs secundarias)
+        self.llm = LLMClientRegistry.shared()
+        self.api_key = self.llm.api_key("main")
         if not self.api_key:
             raise ValueError("No se encontró la API key de OpenAI")
         
         # Inicializar logger y métricas
         self.logger = LoggerManager(constants.LOG_PATH)
-        self.metrics = MetricsManager(constants.METRICS_PATH)
+        self.metrics = MetricsManager.shared(constants.METRICS_PATH)
         
         self.logger.logger.info("Inicializando AIManager")
-        openai.api_key = self.api_key
         self.model = constants.AI_MODEL
         self.max_tokens = constants.MAX_TOKENS
         
-        # Inicializar modelo de embeddings
-        self.embedding_model = SentenceTransformer(constants.EMBEDDING_MODEL)
+        # Inicializar modelo de embeddings (se carga en segundo plano)
+        self.embedding_model = LazyEmbeddingModel(constants.EMBEDDING_MODEL, self.logger).start()
+        self.embedding_cache = EmbeddingCache(constants.EMBEDDING_CACHE_SIZE)
+        # Servicio compartido: agrupa en lotes las peticiones de todos los productores
+        self.embedding_service = EmbeddingService(
+            self.embedding_model,
+            cache=self.embedding_cache,
+            metrics=self.metrics,
+            batch_window_ms=constants.EMBEDDING_BATCH_WINDOW_MS,
+            max_batch_size=constants.EMBEDDING_BATCH_MAX_SIZE,
+            metrics_interval=constants.EMBEDDING_METRICS_INTERVAL,
+            timeout=constants.EMBEDDING_TIMEOUT
+        )
         self.memory_file = os.path.join(constants.MEMORY_PATH, 'memory.json')
+        # Almacén con journal compartido con MemoryManager
+        self.store = MemoryStore.shared(
+            constants.MEMORY_PATH,
+            fsync_interval=constants.MEMORY_FSYNC_INTERVAL,
+            checkpoint_every=constants.MEMORY_CHECKPOINT_EVERY,
+            logger=self.logger
+        )
+        self.storage = EmbeddingStorage(
+            os.path.join(constants.MEMORY_PATH, 'embeddings'),
+            self.store,
+            constants.MEMORY_COMPACTION_THRESHOLD
+        )
+        # Protege la memoria frente al hilo de consolidación
+        self.memory_lock = threading.RLock()
+        # Hay un entrenamiento del índice ANN en curso en segundo plano
+        self._index_training = False
+        load_start = time.time()
         self._load_memory()
+        self.logger.log_startup_timing("memory", (time.time() - load_start) * 1000)
         
         # Inicializar gestor de personalidad
         self.personality_manager = PersonalityManager(constants.MEMORY_PATH)
         
         # Inicializar gestor de IAs secundarias
         self.secondary_ai = SecondaryAIManager(constants.LOG_PATH, constants.METRICS_PATH)
+        # Los análisis independientes de cada turno se lanzan a la vez en este pool
+        self.analysis_pool = ThreadPoolExecutor(
+            max_workers=constants.ANALYSIS_MAX_WORKERS,
+            thread_name_prefix="analysis"
+        )
+        
+        # Clasificador de emociones local; la llamada remota queda para los casos dudosos
+        self.emotion_classifier = None
+        if constants.EMOTION_CLASSIFIER == "local":
+            self.emotion_classifier = LocalEmotionClassifier(self.embedding_service.encode_many)
+        
+        # Trabajo posterior a la respuesta (categorizar, codificar, guardar, métricas)
+        self.write_behind = WriteBehindQueue(
+            max_size=constants.WRITE_BEHIND_MAX_SIZE,
+            put_timeout=constants.WRITE_BEHIND_PUT_TIMEOUT,
+            logger=self.logger
+        )
+        
+        # Caché semántica de respuestas para preguntas repetidas (opcional)
+        self.response_cache = None
+        if constants.RESPONSE_CACHE_ENABLED:
+            self.response_cache = SemanticResponseCache(
+                os.path.join(constants.MEMORY_PATH, 'response_cache.json'),
+                max_size=constants.RESPONSE_CACHE_SIZE,
+                threshold=constants.RESPONSE_CACHE_THRESHOLD,
+                ttl_seconds=constants.RESPONSE_CACHE_TTL
+            )
+        
+        # Prompt principal con presupuesto de tokens y prefijo estable
+        self.prompt_builder = PromptBuilder(
+            SYSTEM_PROMPT,
+            budget=constants.PROMPT_TOKEN_BUDGET,
+            priorities=constants.PROMPT_SECTION_PRIORITY,
+            counter=TokenCounter(self.model)
+        )
         
         # Mantener un historial de conversación reciente
         self.conversation_history = []
         self.max_history = 10  # Número máximo de mensajes en el historial
+        
+        # Consolidación periódica de la memoria en segundo plano
+        self.consolidator = MemoryConsolidator(
+            duplicate_threshold=constants.MEMORY_DUPLICATE_THRESHOLD,
+            weights=constants.MEMORY_SCORE_WEIGHTS,
+            half_life_days=constants.MEMORY_RECENCY_HALF_LIFE_DAYS
+        )
+        # Las memorias ya comparadas en ejecuciones anteriores no se vuelven a comparar
+        self.consolidator.checked_rows = int(np.searchsorted(self.memory.file_rows(), self.storage.consolidated_rows))
+        self._start_consolidation_thread()
+
+    def _create_index(self):
+        """Crea el índice de búsqueda configurado en constants"""
+        if constants.MEMORY_INDEX == "ivf":
+            return IVFIndex(nprobe=constants.IVF_NPROBE, min_train_size=constants.IVF_MIN_TRAIN_SIZE)
+        return None
+
+    def _create_memory(self):
+        """Crea la memoria vectorial con el formato y el índice configurados"""
+        return VectorMemory(
+            index=self._create_index(),
+            dtype=constants.MEMORY_EMBEDDING_DTYPE,
+            # Los candidatos se reordenan con los float32 exactos del fichero
+            rescorer=self.storage.read_rows if constants.MEMORY_RESCORE else None,
+            rescore_oversample=constants.MEMORY_RESCORE_OVERSAMPLE
+        )
 
     def _load_memory(self):
-        """Carga la memoria desde el archivo"""
+        """Carga la memoria mapeando el fichero binario de embeddings"""
+        self.memory = self._create_memory()
         try:
-            if os.path.exists(self.memory_file):
-                with open(self.memory_file, 'r', encoding='utf-8') as f:
-                    self.memory = json.load(f)
+            if self.storage.exists():
+                # Se carga todo; el tope se aplica al consolidar, por puntuación y no por antigüedad
+                entries, matrix = self.storage.load()
+                if entries:
+                    self.memory.load_matrix(entries, matrix, self.storage.start_row)
+                    self._load_index()
                 self.logger.log_memory_operation("load", f"Cargadas {len(self.memory)} memorias")
+            elif os.path.exists(self.memory_file):
+                self._migrate_json_memory()
             else:
-                self.memory = []
                 self.logger.log_memory_operation("load", "No se encontró archivo de memoria")
         except Exception as e:
             self.logger.log_error("memory", f"Error al cargar memoria: {str(e)}")
-            self.memory = []
+            self.memory = self._create_memory()
+
+    def _load_index(self):
+        """Carga el índice ANN guardado o lo entrena si la memoria ya es grande"""
+        index = self.memory.index
+        if index is None:
+            return
+        loaded = index.load(self.storage.index_file(), self.memory.rows(),
+                            self.storage.generation, self.storage.start_row)
+        if not loaded and index.needs_training(len(self.memory)):
+            index.train(self.memory.rows())
+            self._save_index()
+
+    def _save_index(self):
+        """Guarda el índice ANN junto a la generación actual de embeddings"""
+        index = self.memory.index
+        if index is None or not index.is_trained:
+            return
+        offset = self.storage.total_rows - len(self.memory)
+        index.save(self.storage.index_file(), self.storage.generation, offset)
 
-    def _save_memory(self):
-        """Guarda la memoria en el archivo"""
+    def _migrate_json_memory(self):
+        """Importa una sola vez el antiguo memory.json con embeddings en listas"""
+        with open(self.memory_file, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if not isinstance(data, list):
+            # El fichero pertenece a MemoryManager, no contiene embeddings
+            self.logger.log_memory_operation("load", "No se encontró memoria con embeddings")
+            return
+        self.memory.load(data)
+        self.memory.truncate(constants.MAX_MEMORY_ITEMS)
+        # Se escriben los embeddings originales y no los cuantizados en RAM
+        valid = [e for e in data if e.get('embedding')]
+        kept = valid[len(valid) - len(self.memory):]
+        matrix = np.asarray([VectorMemory.normalize(e['embedding']) for e in kept]) if kept else self.memory.rows()
+        self.storage.compact(self.memory.entries, matrix=matrix)
+        self.memory.renumber_file_rows()
+        if self.memory.index is not None and self.memory.index.needs_training(len(self.memory)):
+            self.memory.index.train(self.memory.rows())
+            self._save_index()
+        self.logger.log_memory_operation("migrate", f"Migradas {len(self.memory)} memorias a formato binario")
+
+    def _save_memory(self, entry, embedding):
+        """Añade la memoria al log y al fichero de embeddings, compactando si hace falta"""
         try:
-            os.makedirs(os.path.dirname(self.memory_file), exist_ok=True)
-            with open(self.memory_file, 'w', encoding='utf-8') as f:
-                json.dump(self.memory, f, ensure_ascii=False, indent=2)
+            self.storage.append(entry, embedding)
+            if self.storage.needs_compaction(len(self.memory)):
+                self.storage.compact(self.memory.entries, self.memory.file_rows())
+                self.memory.renumber_file_rows()
+                self._save_index()
+                self.logger.log_memory_operation("compact", f"Compactadas {len(self.memory)} memorias")
             self.logger.log_memory_operation("save", f"Guardadas {len(self.memory)} memorias")
         except Exception as e:
             self.logger.log_error("memory", f"Error al guardar memoria: {str(e)}")
 
+    def _encode(self, text):
+        """Obtiene el embedding normalizado del texto (caché LRU y lotes en el servicio)"""
+        return self.embedding_service.encode(text)
+
+    def _start_consolidation_thread(self):
+        """Inicia el hilo que consolida la memoria periódicamente"""
+        def consolidator():
+            # La primera espera un intervalo para no competir con el arranque
+            while True:
+                time.sleep(constants.MEMORY_CONSOLIDATION_INTERVAL)
+                self.consolidate_memory()
+
+        thread = threading.Thread(target=consolidator, daemon=True)
+        thread.start()
+
+    def consolidate_memory(self):
+        """Fusiona memorias casi duplicadas y expulsa las de menor puntuación"""
+        try:
+            # La búsqueda de duplicados recorre una instantánea: mientras tanto se puede
+            # seguir buscando y añadiendo memorias, que quedan para la siguiente pasada
+            with self.memory_lock:
+                snapshot = self.memory.snapshot()
+            merges = self.consolidator.find_duplicates(snapshot, self.consolidator.checked_rows)
+
+            with self.memory_lock:
+                merged, evicted = self.consolidator.apply(self.memory, merges, len(snapshot), constants.MAX_MEMORY_ITEMS)
+                if merged or evicted:
+                    # Los contadores de acceso se guardan en las entradas al reescribir el fichero
+                    self.memory.entries = [
+                        dict(entry, access_count=int(access))
+                        for entry, access in zip(self.memory.entries, self.memory.access_counts())
+                    ]
+                    self.storage.compact(self.memory.entries, self.memory.file_rows())
+                    self.memory.renumber_file_rows()
+                    self._save_index()
+                checked = self.consolidator.checked_rows
+                self.storage.set_consolidated_rows(int(self.memory.file_rows()[checked - 1]) + 1 if checked else 0)
+            if not merged and not evicted:
+                return
+            self.metrics.record_memory_operation("consolidation")
+            self.logger.log_memory_operation(
+                "consolidate", f"Fusionadas {merged}, expulsadas {evicted}, quedan {len(self.memory)} memorias"
+            )
+        except Exception as e:
+            self.logger.log_error("memory", f"Error al consolidar memoria: {str(e)}")
+
+    def _schedule_index_training(self):
+        """Lanza el (re)entrenamiento del índice ANN si toca (llamar con memory_lock tomado)"""
+        if self._index_training or not self.memory.needs_index_training():
+            return
+        self._index_training = True
+        snapshot = self.memory.snapshot()
+        thread = threading.Thread(target=self._train_index, args=(snapshot,), daemon=True)
+        thread.start()
+
+    def _train_index(self, snapshot):
+        """Entrena un índice nuevo sobre la instantánea sin bloquear la memoria
+
+        Mientras tanto las búsquedas siguen usando el índice anterior (o la búsqueda
+        exacta si aún no había ninguno); al terminar se sustituye bajo el cerrojo.
+        """
+        try:
+            start = time.time()
+            snapshot.index.train(snapshot.rows())
+            with self.memory_lock:
+                if not self.memory.swap_index(snapshot.index, snapshot):
+                    # Se compactó entretanto: se reintentará con la siguiente memoria
+                    return
+                self._save_index()
+            self.logger.log_memory_operation(
+                "index", f"Índice entrenado con {len(snapshot)} memorias en {(time.time() - start) * 1000:.0f} ms"
+            )
+        except Exception as e:
+            self.logger.log_error("memory", f"Error al entrenar el índice: {str(e)}")
+        finally:
+            self._index_training = False
+
     def _get_relevant_memory(self, query, max_items=5):
         """Obtiene las memorias más relevantes para la consulta actual"""
         if not self.memory:
@@ -72,27 +316,11 @@ class AIManager:
 
         try:
             # Obtener embedding de la consulta
-            query_embedding = self.embedding_model.encode(query)
+            query_embedding = self._encode(query)
             
-            # Calcular similitud con todas las memorias
-            similarities = []
-            for memory in self.memory:
-                try:
-                    memory_embedding = np.array(memory['embedding'])
-                    similarity = float(np.dot(query_embedding, memory_embedding) / (
-                        np.linalg.norm(query_embedding) * np.linalg.norm(memory_embedding)
-                    ))
-                    # Ajustar similitud según la importancia
-                    importance = memory.get('importance', 0.5)
-                    adjusted_similarity = similarity * (1 + importance)
-                    similarities.append((adjusted_similarity, memory))
-                except Exception as e:
-                    self.logger.log_error("memory", f"Error al procesar memoria: {str(e)}")
-                    continue
-            
-            # Ordenar por similitud y devolver las más relevantes
-            similarities.sort(key=lambda x: x[0], reverse=True)
-            relevant_memories = [m[1] for m in similarities[:max_items]]
+            # Similitud ponderada por importancia sobre la matriz normalizada
+            with self.memory_lock:
+                relevant_memories = self.memory.search(query_embedding, max_items)
             
             self.logger.log_memory_operation("search", f"Encontradas {len(relevant_memories)} memorias relevantes")
             return relevant_memories
@@ -100,116 +328,228 @@ class AIManager:
             self.logger.log_error("memory", f"Error al obtener memorias relevantes: {str(e)}")
             return []
 
-    def _add_to_memory(self, text, response):
-        """Añade una nueva entrada a la memoria"""
+    def _update_history(self, text, response):
+        """Añade el intercambio al historial reciente que acompaña al prompt"""
+        self.conversation_history.append({
+            'role': 'user',
+            'content': text
+        })
+        self.conversation_history.append({
+            'role': 'assistant',
+            'content': response
+        })
+        
+        # Mantener solo el historial reciente
+        if len(self.conversation_history) > self.max_history * 2:
+            self.conversation_history = self.conversation_history[-(self.max_history * 2):]
+
+    def _record_turn(self, text, response_text, tokens, time_ms):
+        """Registra métricas y log de un turno (se ejecuta en la cola de escritura)"""
+        self.metrics.record_api_usage("main", tokens)
+        self.metrics.record_response_time("main", time_ms)
+        self.logger.log_conversation(text, response_text)
+
+    def _add_to_memory(self, text, response, categorization=None):
+        """Añade una nueva entrada a la memoria (con la categorización provisional si ya la hay)"""
         try:
             # Analizar y categorizar la memoria
-            categorization = self.secondary_ai.categorize_memory(text, response)
+            if categorization is None:
+                categorization = self.secondary_ai.categorize_memory(text, response)
             
             # Crear entrada de memoria
+            embedding = self._encode(text)
             memory_entry = {
                 'text': text,
                 'response': response,
-                'embedding': self.embedding_model.encode(text).tolist(),
                 'timestamp': datetime.now().isoformat(),
                 'category': categorization['category'],
                 'importance': categorization['importance'],
                 'tags': categorization['tags']
             }
             
-            # Añadir a memoria
-            self.memory.append(memory_entry)
-            
-            # Mantener solo las últimas 1000 entradas para evitar que el archivo crezca demasiado
-            if len(self.memory) > 1000:
-                self.memory = self.memory[-1000:]
-            
-            self._save_memory()
-            
-            # Actualizar historial de conversación
-            self.conversation_history.append({
-                'role': 'user',
-                'content': text
-            })
-            self.conversation_history.append({
-                'role': 'assistant',
-                'content': response
-            })
-            
-            # Mantener solo el historial reciente
-            if len(self.conversation_history) > self.max_history * 2:
-                self.conversation_history = self.conversation_history[-(self.max_history * 2):]
+            # Añadir a memoria (actualiza la matriz y las importancias de forma incremental)
+            with self.memory_lock:
+                self.memory.add(memory_entry, embedding, self.storage.total_rows)
+                self._save_memory(memory_entry, embedding)
+                self._schedule_index_training()
             
             self.logger.log_memory_operation("add", f"Añadida nueva memoria: {categorization['category']}")
         except Exception as e:
             self.logger.log_error("memory", f"Error al añadir memoria: {str(e)}")
 
-    def get_response(self, text, context=None):
-        """Obtiene una respuesta de la IA"""
-        start_time = time.time()
+    def submit_analysis(self, function, *args):
+        """Lanza un análisis en el pool (o lo ejecuta ya en modo secuencial) y devuelve su Future"""
+        if constants.ANALYSIS_MODE == "concurrent":
+            future = self.analysis_pool.submit(function, *args)
+        else:
+            future = Future()
+            try:
+                future.set_result(function(*args))
+            except Exception as e:
+                future.set_exception(e)
+        # El plazo cuenta desde el lanzamiento, no desde que se espera el resultado
+        future.deadline = time.time() + constants.ANALYSIS_TIMEOUT
+        return future
+
+    def resolve_analysis(self, future, service, fallback):
+        """Espera un análisis hasta su plazo; si falla o no llega, devuelve el valor por defecto"""
+        try:
+            return future.result(timeout=max(0.0, future.deadline - time.time()))
+        except FutureTimeoutError:
+            future.cancel()
+            self.metrics.record_error(f"{service}_timeout")
+            self.logger.log_error(service, f"Sin respuesta en {constants.ANALYSIS_TIMEOUT}s, se usa el valor por defecto")
+        except Exception as e:
+            self.metrics.record_error(service)
+            self.logger.log_error(service, str(e))
+        return copy.deepcopy(fallback)
+
+    def _classify_emotion_locally(self, text):
+        """Clasifica la emoción sin llamar a la API; devuelve None si la confianza no basta"""
+        if self.emotion_classifier is None:
+            return None
         try:
-            # Analizar emociones y contexto
-            emotion_analysis = self.secondary_ai.analyze_emotion(text)
-            self.personality_manager.update_emotion(emotion_analysis['emotion'], emotion_analysis['intensity'])
+            result, confidence = self.emotion_classifier.classify(text, self._encode(text))
+        except Exception as e:
+            self.logger.log_error("local_emotion", str(e))
+            return None
+        confident = confidence >= constants.EMOTION_LOCAL_CONFIDENCE
+        self.write_behind.submit("metrics", self.metrics.record_cache_event, "local_emotion", confident)
+        if not confident:
+            return None
+        self.write_behind.submit("metrics", self.metrics.record_emotion, result['emotion'])
+        return result
+
+    def _build_messages(self, text, context=None, summary=None):
+        """Lanza los análisis del turno y compone los mensajes del prompt principal
+
+        summary es el resumen acumulado de las conversaciones anteriores; se
+        antepone al contexto de las conversaciones recientes. Devuelve los
+        mensajes y, en modo combinado, la categorización provisional de la memoria.
+        """
+        categorization = None
+        if constants.ANALYSIS_STRATEGY == "fused":
+            # Una sola llamada devuelve emoción, contexto y categoría provisional
+            relevant_memories = self._get_relevant_memory(text)
+            turn_task = self.submit_analysis(self.secondary_ai.analyze_turn, text, relevant_memories)
+            turn_analysis = self.resolve_analysis(
+                turn_task, "turn_analysis", SecondaryAIManager.DEFAULT_TURN_ANALYSIS
+            )
+            emotion_analysis = turn_analysis['emotion']
+            context_analysis = turn_analysis['context']
+            categorization = turn_analysis['memory']
+        else:
+            # Emoción y (memorias -> contexto) son independientes y se solapan
+            local_emotion = self._classify_emotion_locally(text)
+            emotion_task = None if local_emotion else self.submit_analysis(self.secondary_ai.analyze_emotion, text)
             
             # Obtener memorias relevantes
             relevant_memories = self._get_relevant_memory(text)
             
             # Analizar contexto completo
-            context_analysis = self.secondary_ai.analyze_context(text, relevant_memories)
+            context_task = self.submit_analysis(self.secondary_ai.analyze_context, text, relevant_memories)
             
-            # Preparar el contexto de memorias
-            memory_context = "\n".join([f"Usuario: {m['text']}\nIA: {m['response']}" for m in relevant_memories])
-
-            # Preparar el prompt
-            messages = [
-                {"role": "system", "content": (
-                    "Eres Elenia, una IA asistente con personalidad similar a Neuro-sama: divertida, irónica, carismática, pero siempre educada y útil. "
-                    "Responde en español, con un toque de humor y espontaneidad, pero sin ser ofensiva. "
-                    "No uses nunca emojis, ni escribas frases como 'cara sonriente', 'carita feliz', 'emoticono', ni representes emociones con palabras entre paréntesis o símbolos. "
-                    "No digas cosas como 'guiño', 'risas', 'jaja', ni uses símbolos como :) o similares. "
-                    "Tu objetivo es ayudar, entretener y conversar de forma natural, como una streamer simpática y lista. "
-                    "Si te preguntan por tu nombre, responde que eres Elenia. "
-                    "Siempre responde con mensajes cortos, coherentes y directos. "
-                    "Si te hablan en inglés, responde en inglés. "
-                    "IMPORTANTE: Si el mensaje recibido no está dirigido a ti o no requiere respuesta, responde con un texto vacío. "
-                    "Si tienes dudas sobre si debes responder, solo responde si crees que realmente te están hablando a ti."
-                )}
-            ]
-
-            # Añadir contexto de personalidad
-            personality_prompt = self.personality_manager.get_personality_prompt()
-            messages.append({"role": "system", "content": personality_prompt})
-
-            # Añadir análisis de contexto
-            if context_analysis:
-                context_prompt = (
-                    f"Tema principal: {context_analysis['topic']}\n"
-                    f"Estado emocional del usuario: {context_analysis['user_emotion']}\n"
-                    f"Patrones detectados: {', '.join(context_analysis['patterns'])}\n"
-                    f"Sugerencias: {', '.join(context_analysis['suggestions'])}"
-                )
-                messages.append({"role": "system", "content": context_prompt})
+            emotion_analysis = local_emotion or self.resolve_analysis(emotion_task, "emotion", SecondaryAIManager.DEFAULT_EMOTION)
+            context_analysis = self.resolve_analysis(context_task, "context", SecondaryAIManager.DEFAULT_CONTEXT)
+        self.personality_manager.update_emotion(emotion_analysis['emotion'], emotion_analysis['intensity'])
+        if summary:
+            context = f"Resumen de conversaciones anteriores:\n{summary}\n\nConversaciones recientes:\n{context or ''}"
+        
+        # Secciones variables en el orden en que se envían; el presupuesto se reparte por prioridad
+        sections = [("personality", "", [self.personality_manager.get_personality_prompt()])]
+        if context_analysis:
+            sections.append(("context_analysis", "", [(
+                f"Tema principal: {context_analysis['topic']}\n"
+                f"Estado emocional del usuario: {context_analysis['user_emotion']}\n"
+                f"Patrones detectados: {', '.join(context_analysis['patterns'])}\n"
+                f"Sugerencias: {', '.join(context_analysis['suggestions'])}"
+            )]))
+        if context:
+            sections.append(("conversation_context", "Contexto de conversaciones anteriores:\n", [context]))
+        # Las memorias ya vienen ordenadas de más a menos relevante
+        sections.append(("memories", "Memorias relevantes:\n", [
+            f"Usuario: {m['text']}\nIA: {m['response']}" for m in relevant_memories
+        ]))
+
+        messages, token_counts = self.prompt_builder.build(text, sections, self.conversation_history)
+        self.write_behind.submit("metrics", self.metrics.record_prompt_tokens, token_counts)
+        return messages, categorization
+
+    def _cache_state(self):
+        """Estado aproximado de emoción y personalidad que debe coincidir para reutilizar una respuesta"""
+        emotion_context = self.personality_manager.get_emotion_context()
+        traits = ",".join(
+            f"{trait}={round(value, 1)}" for trait, value in sorted(emotion_context['personality_traits'].items())
+        )
+        return f"{emotion_context['dominant_emotion']}|{traits}"
 
-            # Añadir contexto de conversaciones anteriores si existe
-            if context:
-                messages.append({"role": "system", "content": f"Contexto de conversaciones anteriores:\n{context}"})
+    def _lookup_response_cache(self, text):
+        """Busca una respuesta reutilizable; devuelve (respuesta o None, embedding, estado)"""
+        if self.response_cache is None:
+            return None, None, None
+        try:
+            embedding = self._encode(text)
+            state = self._cache_state()
+            entry = self.response_cache.get(embedding, state)
+        except Exception as e:
+            self.logger.log_error("response_cache", str(e))
+            return None, None, None
+        self.write_behind.submit("metrics", self.metrics.record_cache_event, "responses", entry is not None)
+        if entry is None:
+            return None, embedding, state
 
-            # Añadir contexto de memorias relevantes si existe
-            if memory_context:
-                messages.append({"role": "system", "content": f"Memorias relevantes:\n{memory_context}"})
+        # Acierto: no hay análisis ni llamada principal, solo historial, métricas y log
+        self.write_behind.submit("metrics", self.metrics.record_cache_savings, "responses", entry['tokens'])
+        self.write_behind.submit("log", self.logger.log_conversation, text, entry['response'])
+        self._update_history(text, entry['response'])
+        return entry['response'], embedding, state
 
-            # Añadir historial de conversación reciente
-            messages.extend(self.conversation_history)
+    def _store_response(self, embedding, state, response_text, tokens):
+        """Guarda la respuesta en la caché semántica y la persiste cada cierto número de altas"""
+        if self.response_cache is None or embedding is None or not response_text:
+            return
+        self.response_cache.put(embedding, state, response_text, tokens)
+        if self.response_cache.unsaved >= constants.RESPONSE_CACHE_SAVE_EVERY:
+            self.write_behind.submit("response_cache", self.response_cache.save)
 
-            # Añadir el mensaje actual
-            messages.append({"role": "user", "content": text})
+    def _finish_turn(self, text, response_text, tokens, start_time, categorization=None):
+        """Actualiza el historial y deja métricas, log y memoria en la cola de escritura"""
+        self.write_behind.submit(
+            "metrics", self._record_turn, text, response_text,
+            tokens, (time.time() - start_time) * 1000
+        )
+        self._remember_response(text, response_text, categorization)
+
+    def _remember_response(self, text, response_text, categorization=None):
+        """Guarda la respuesta en el historial y, en segundo plano, en la memoria"""
+        # Solo guardar en memoria si hay una respuesta
+        if response_text:
+            # El historial se actualiza ya: lo necesita el prompt del siguiente turno
+            self._update_history(text, response_text)
+            self.write_behind.submit("memory", self._add_to_memory, text, response_text, categorization)
+
+    def remember_spoken(self, text, spoken_text, turn):
+        """Cierra un turno de stream_response con el texto que llegó a decirse en voz alta"""
+        if turn.get("from_cache"):
+            return
+        self._remember_response(text, spoken_text.strip(), turn.get("categorization"))
+
+    def get_response(self, text, context=None, summary=None):
+        """Obtiene una respuesta de la IA"""
+        start_time = time.time()
+        try:
+            cached, query_embedding, cache_state = self._lookup_response_cache(text)
+            if cached is not None:
+                return cached
+
+            messages, categorization = self._build_messages(text, context, summary)
 
             # Registrar métricas
             self.metrics.record_request("main")
 
             # Obtener respuesta de OpenAI
-            response = openai.ChatCompletion.create(
+            response = self.llm.create(
+                "main",
                 model=self.model,
                 messages=messages,
                 max_tokens=self.max_tokens,
@@ -218,20 +558,76 @@ class AIManager:
 
             response_text = response.choices[0].message.content.strip()
 
-            # Registrar métricas
-            self.metrics.record_api_usage("main", response.usage.total_tokens)
-            self.metrics.record_response_time("main", (time.time() - start_time) * 1000)
+            # Métricas, log y memoria se escriben en segundo plano para no retrasar la voz
+            self._finish_turn(text, response_text, response.usage.total_tokens, start_time, categorization)
+            self._store_response(query_embedding, cache_state, response_text, response.usage.total_tokens)
 
-            # Registrar conversación
-            self.logger.log_conversation(text, response_text)
+            return response_text
 
-            # Solo guardar en memoria si hay una respuesta
-            if response_text:
-                self._add_to_memory(text, response_text)
+        except Exception as e:
+            self.metrics.record_error("main")
+            self.logger.log_error("main", str(e))
+            return ""
 
-            return response_text
+    def stream_response(self, text, context=None, summary=None, turn=None):
+        """Genera la respuesta de la IA token a token a medida que llega
+
+        Solo registra métricas: el historial y la memoria los guarda remember_spoken()
+        con lo que de verdad se dijo. turn (dict) recibe los datos que necesita.
+        """
+        turn = {} if turn is None else turn
+        start_time = time.time()
+        parts = []
+        categorization = None
+        query_embedding = cache_state = None
+        from_cache = completed = False
+        try:
+            cached, query_embedding, cache_state = self._lookup_response_cache(text)
+            if cached is not None:
+                from_cache = turn["from_cache"] = True
+                yield cached
+                return
+
+            messages, categorization = self._build_messages(text, context, summary)
+            turn["categorization"] = categorization
+
+            # Registrar métricas
+            self.metrics.record_request("main")
+
+            stream = self.llm.stream(
+                "main",
+                model=self.model,
+                messages=messages,
+                max_tokens=self.max_tokens,
+                temperature=0.7
+            )
+
+            for chunk in stream:
+                token = chunk.choices[0].delta.content if chunk.choices else None
+                if not token:
+                    continue
+                if not parts:
+                    self.write_behind.submit(
+                        "metrics", self.metrics.record_response_time,
+                        "main_first_token", (time.time() - start_time) * 1000
+                    )
+                parts.append(token)
+                yield token
+            completed = True
 
         except Exception as e:
             self.metrics.record_error("main")
             self.logger.log_error("main", str(e))
-            return "" 
\ No newline at end of file
+
+        finally:
+            # También si quien consume cierra el generador antes de tiempo (GeneratorExit)
+            if not from_cache:
+                # En streaming no llega el uso de tokens: cada fragmento es aproximadamente un token
+                response_text = "".join(parts).strip()
+                self.write_behind.submit(
+                    "metrics", self._record_turn, text, response_text,
+                    len(parts), (time.time() - start_time) * 1000
+                )
+                # Una respuesta cortada no se guarda en la caché para servirla otra vez
+                if completed:
+                    self._store_response(query_embedding, cache_state, response_text, len(parts))
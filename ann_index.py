@@ -0,0 +1,143 @@
+import os
+import numpy as np
+
+class IVFIndex:
+    def __init__(self, nprobe=8, min_train_size=2048, kmeans_iterations=10, seed=0):
+        self.nprobe = nprobe
+        self.min_train_size = min_train_size
+        self.kmeans_iterations = kmeans_iterations
+        self.seed = seed
+        self.centroids = None
+        # Tamaño de la memoria la última vez que se entrenaron los centroides
+        self.trained_size = 0
+        self._lists = []
+        self._pending = []
+
+    @property
+    def is_trained(self):
+        return self.centroids is not None
+
+    @staticmethod
+    def _list_count(size):
+        """Número de listas invertidas recomendado para un tamaño dado"""
+        return int(max(8, min(4096, 4 * np.sqrt(size))))
+
+    def _kmeans(self, data, nlist):
+        """K-means esférico (similitud coseno) sobre vectores normalizados"""
+        rng = np.random.default_rng(self.seed)
+        centroids = data[rng.choice(data.shape[0], nlist, replace=False)].copy()
+        for _ in range(self.kmeans_iterations):
+            assignment = np.argmax(data @ centroids.T, axis=1)
+            # Suma por cluster ordenando una vez en lugar de np.add.at
+            order = np.argsort(assignment, kind='stable')
+            clusters, starts = np.unique(assignment[order], return_index=True)
+            sums = np.zeros_like(centroids)
+            sums[clusters] = np.add.reduceat(data[order], starts, axis=0)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            empty = norms[:, 0] == 0
+            # Los centroides vacíos se reinician con puntos aleatorios
+            if empty.any():
+                sums[empty] = data[rng.choice(data.shape[0], int(empty.sum()), replace=False)]
+                norms[empty] = 1.0
+            centroids = (sums / norms).astype(np.float32)
+        return centroids
+
+    def _assign(self, matrix, chunk_size=8192):
+        """Asigna cada fila a su centroide más cercano, por bloques para acotar la RAM"""
+        assignment = np.empty(matrix.shape[0], dtype=np.int64)
+        for start in range(0, matrix.shape[0], chunk_size):
+            block = np.asarray(matrix[start:start + chunk_size], dtype=np.float32)
+            assignment[start:start + chunk_size] = np.argmax(block @ self.centroids.T, axis=1)
+        return assignment
+
+    def _build_lists(self, assignment):
+        """Reconstruye las listas invertidas a partir de la asignación por fila"""
+        order = np.argsort(assignment, kind='stable')
+        bounds = np.searchsorted(assignment[order], np.arange(self.centroids.shape[0] + 1))
+        self._lists = [order[bounds[c]:bounds[c + 1]] for c in range(self.centroids.shape[0])]
+        self._pending = [[] for _ in range(self.centroids.shape[0])]
+
+    def train(self, matrix, sample_size=10000):
+        """Entrena los centroides con una muestra y reasigna todas las filas"""
+        size = matrix.shape[0]
+        nlist = min(self._list_count(size), size)
+        rng = np.random.default_rng(self.seed)
+        sample = matrix
+        if size > sample_size:
+            sample = matrix[np.sort(rng.choice(size, sample_size, replace=False))]
+        self.centroids = self._kmeans(np.asarray(sample, dtype=np.float32), nlist)
+        self.trained_size = size
+        self._build_lists(self._assign(matrix))
+
+    def needs_training(self, size):
+        """Entrena al llegar al mínimo y reentrena cuando la memoria se cuadruplica"""
+        if not self.is_trained:
+            return size >= self.min_train_size
+        return size >= 4 * self.trained_size
+
+    def add(self, row, vector):
+        """Inserta una fila en la lista de su centroide más cercano"""
+        if not self.is_trained:
+            return
+        cluster = int(np.argmax(self.centroids @ vector))
+        self._pending[cluster].append(row)
+
+    def _flush(self, cluster):
+        if self._pending[cluster]:
+            self._lists[cluster] = np.concatenate(
+                [self._lists[cluster], np.asarray(self._pending[cluster], dtype=np.int64)]
+            )
+            self._pending[cluster] = []
+        return self._lists[cluster]
+
+    def remove(self, rows):
+        """Elimina filas y renumera las restantes igual que la matriz compactada"""
+        if not self.is_trained or len(rows) == 0:
+            return
+        removed = np.unique(np.asarray(rows, dtype=np.int64))
+        for cluster in range(len(self._lists)):
+            ids = self._flush(cluster)
+            ids = ids[~np.isin(ids, removed)]
+            self._lists[cluster] = ids - np.searchsorted(removed, ids)
+
+    def candidates(self, query):
+        """Devuelve las filas de las nprobe listas más cercanas a la consulta"""
+        scores = self.centroids @ query
+        nprobe = min(self.nprobe, scores.shape[0])
+        probe = np.argpartition(-scores, nprobe - 1)[:nprobe]
+        return np.concatenate([self._flush(int(c)) for c in probe])
+
+    def save(self, path, generation, offset=0):
+        """Guarda centroides y asignaciones junto al almacén de memoria"""
+        if not self.is_trained:
+            return
+        size = sum(len(self._flush(c)) for c in range(len(self._lists)))
+        assignment = np.full(size, -1, dtype=np.int64)
+        for cluster, ids in enumerate(self._lists):
+            assignment[ids] = cluster
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_file = path + '.tmp.npz'
+        np.savez(temp_file, centroids=self.centroids, assignment=assignment,
+                 generation=generation, offset=offset, trained_size=self.trained_size)
+        os.replace(temp_file, path)
+
+    def load(self, path, matrix, generation, offset=0):
+        """Carga el índice; las filas nuevas o de otra generación se reasignan"""
+        if not os.path.exists(path):
+            return False
+        with np.load(path) as data:
+            self.centroids = data['centroids']
+            self.trained_size = int(data['trained_size'])
+            assignment = data['assignment']
+            saved_offset = int(data['offset'])
+            same_generation = int(data['generation']) == generation
+        # Las asignaciones guardadas se indexan por fila del fichero de embeddings
+        if same_generation and offset >= saved_offset:
+            assignment = assignment[offset - saved_offset:][:matrix.shape[0]]
+        else:
+            assignment = assignment[:0]
+        known = assignment.shape[0]
+        if known < matrix.shape[0]:
+            assignment = np.concatenate([assignment, self._assign(matrix[known:])])
+        self._build_lists(assignment)
+        return True
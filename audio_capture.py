@@ -0,0 +1,89 @@
+import threading
+import numpy as np
+import sounddevice as sd
+
+class AudioRingBuffer:
+    def __init__(self, capacity, dtype=np.int16):
+        self.capacity = capacity
+        # Dos copias seguidas del anillo: cualquier ventana de hasta capacity muestras
+        # es un trozo contiguo del array y se puede devolver como vista sin copiar
+        self._data = np.zeros(2 * capacity, dtype=dtype)
+        # Muestras escritas desde el arranque (posición absoluta, nunca vuelve a cero)
+        self.write_pos = 0
+
+    def write(self, samples):
+        """Añade muestras (lo llama el callback de audio, no reserva memoria)"""
+        total = len(samples)
+        # Un bloque mayor que el anillo solo conserva su final
+        samples = samples[-self.capacity:]
+        start = (self.write_pos + total - len(samples)) % self.capacity
+        first = min(len(samples), self.capacity - start)
+        for offset, part in ((start, samples[:first]), (0, samples[first:])):
+            if len(part):
+                self._data[offset:offset + len(part)] = part
+                self._data[offset + self.capacity:offset + self.capacity + len(part)] = part
+        self.write_pos += total
+
+    def oldest(self):
+        """Primera posición absoluta que sigue en el anillo"""
+        return max(0, self.write_pos - self.capacity)
+
+    def view(self, start, end):
+        """Vista (sin copia) de las muestras entre dos posiciones absolutas
+
+        La vista sigue siendo válida mientras no se escriban otras capacity
+        muestras; quien la use debe copiarla antes si va a tardar más.
+        """
+        if start < self.oldest() or end > self.write_pos or end - start > self.capacity:
+            raise ValueError(f"Ventana [{start}, {end}) fuera del anillo")
+        offset = start % self.capacity
+        return self._data[offset:offset + end - start]
+
+class AudioCapture:
+    def __init__(self, device=None, sample_rate=16000, block_ms=30, ring_seconds=30):
+        self.device = device
+        self.sample_rate = sample_rate
+        self.block_size = sample_rate * block_ms // 1000
+        self.ring = AudioRingBuffer(sample_rate * ring_seconds)
+        self._new_data = threading.Condition()
+        # Bloques que el driver no pudo entregar a tiempo
+        self.overflows = 0
+        self._stream = None
+
+    def start(self):
+        """Abre un único InputStream que se mantiene abierto durante toda la sesión"""
+        if self._stream is None:
+            self._stream = sd.InputStream(
+                device=self.device,
+                samplerate=self.sample_rate,
+                blocksize=self.block_size,
+                channels=1,
+                dtype='int16',
+                callback=self._callback
+            )
+            self._stream.start()
+        return self
+
+    def _callback(self, indata, frames, time_info, status):
+        if status.input_overflow:
+            self.overflows += 1
+        self.ring.write(indata[:, 0])
+        with self._new_data:
+            self._new_data.notify_all()
+
+    def wait_for(self, position, timeout=None):
+        """Espera hasta que se haya capturado la posición indicada; devuelve la posición de escritura"""
+        with self._new_data:
+            self._new_data.wait_for(lambda: self.ring.write_pos >= position, timeout)
+        return self.ring.write_pos
+
+    def latest(self, samples):
+        """Vista de las últimas muestras capturadas"""
+        end = self.ring.write_pos
+        return self.ring.view(max(self.ring.oldest(), end - samples), end)
+
+    def stop(self):
+        if self._stream is not None:
+            self._stream.stop()
+            self._stream.close()
+            self._stream = None
@@ -0,0 +1,85 @@
+"""Compara el clasificador de emociones local con el analizador remoto
+
+Sobre las frases etiquetadas de fixtures/emotion_samples.json mide la
+precisión del clasificador local, la cobertura (frases en las que supera
+EMOTION_LOCAL_CONFIDENCE y no haría falta la API) y su latencia. Con --remote
+también llama a analyze_emotion (necesita las API keys) para medir el acuerdo
+entre ambos y la latencia que se ahorra por turno.
+
+Uso: python benchmarks/bench_emotion_classifier.py [--remote]
+"""
+import importlib
+import json
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import constants
+from emotion_classifier import LocalEmotionClassifier
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'emotion_samples.json')
+
+def load_samples():
+    with open(FIXTURES, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def run_local(samples):
+    from sentence_transformers import SentenceTransformer
+    model = SentenceTransformer(constants.EMBEDDING_MODEL)
+    encode_many = lambda texts: model.encode(texts, normalize_embeddings=True)
+    classifier = LocalEmotionClassifier(encode_many)
+    classifier.classify("hola")  # centroides y calentamiento fuera de la medida
+
+    results = []
+    for sample in samples:
+        start = time.perf_counter()
+        result, confidence = classifier.classify(sample['text'])
+        results.append((result['emotion'], confidence, (time.perf_counter() - start) * 1000))
+    return results
+
+def run_remote(samples):
+    # Los módulos del bot usan imports relativos: se importan como paquete
+    sys.path.insert(0, os.path.dirname(ROOT))
+    package = importlib.import_module(os.path.basename(ROOT) + '.secondary_ai_manager')
+    workdir = tempfile.mkdtemp()
+    analyzer = package.SecondaryAIManager(os.path.join(workdir, 'logs'), os.path.join(workdir, 'metrics'))
+    results = []
+    for sample in samples:
+        start = time.perf_counter()
+        result = analyzer.analyze_emotion(sample['text'])
+        results.append((result.get('emotion'), (time.perf_counter() - start) * 1000))
+    return results
+
+def main():
+    samples = load_samples()
+    labels = [sample['emotion'] for sample in samples]
+    local = run_local(samples)
+    threshold = constants.EMOTION_LOCAL_CONFIDENCE
+    confident = np.array([confidence >= threshold for _, confidence, _ in local])
+    correct = np.array([emotion == label for (emotion, _, _), label in zip(local, labels)])
+    local_ms = np.array([elapsed for _, _, elapsed in local])
+
+    print(f"{len(samples)} frases etiquetadas, umbral de confianza {threshold}")
+    print(f"local: precisión {correct.mean():.1%}, precisión con confianza {correct[confident].mean() if confident.any() else 0:.1%}, "
+          f"cobertura {confident.mean():.1%}, {local_ms.mean():.1f} ms/frase (p95 {np.percentile(local_ms, 95):.1f} ms)")
+
+    if '--remote' not in sys.argv:
+        return
+    remote = run_remote(samples)
+    remote_ms = np.array([elapsed for _, elapsed in remote])
+    remote_correct = np.array([emotion == label for (emotion, _), label in zip(remote, labels)])
+    agreement = np.array([l[0] == r[0] for l, r in zip(local, remote)])
+    # En modo local la API solo se consulta cuando el clasificador duda
+    hybrid_ms = np.where(confident, local_ms, local_ms + remote_ms)
+    hybrid_correct = np.where(confident, correct, remote_correct)
+    print(f"remoto: precisión {remote_correct.mean():.1%}, {remote_ms.mean():.0f} ms/frase (p95 {np.percentile(remote_ms, 95):.0f} ms)")
+    print(f"acuerdo local/remoto: {agreement.mean():.1%} (con confianza {agreement[confident].mean() if confident.any() else 0:.1%})")
+    print(f"modo local con respaldo remoto: precisión {hybrid_correct.mean():.1%}, {hybrid_ms.mean():.0f} ms/frase, "
+          f"ahorro {remote_ms.mean() - hybrid_ms.mean():.0f} ms/turno y {confident.mean():.0%} de llamadas")
+
+if __name__ == '__main__':
+    main()
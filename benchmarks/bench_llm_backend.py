@@ -0,0 +1,79 @@
+"""Mide el cliente LLM contra el servidor local de pruebas
+
+Lanza peticiones concurrentes a través de LLMClientRegistry (pool de
+conexiones, límite de concurrencia por servicio, reintentos y timeouts) contra
+FakeLLMServer, sin red ni coste. Informa de la latencia completa, el tiempo
+hasta el primer fragmento en streaming, la tasa de errores y la concurrencia
+máxima que llegó al servidor.
+
+Uso: python benchmarks/bench_llm_backend.py [peticiones] [hilos] [latencia] [tasa_errores]
+     (p. ej. 200 8 lognormal:-2,0.5 0.05)
+"""
+import importlib
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# Los módulos del bot usan imports relativos: se importan como paquete
+sys.path.insert(0, os.path.dirname(ROOT))
+package = os.path.basename(ROOT)
+LLMClientRegistry = importlib.import_module(package + '.llm_clients').LLMClientRegistry
+FakeLLMServer = importlib.import_module(package + '.fake_llm_server').FakeLLMServer
+
+MESSAGES = [{"role": "user", "content": "Cuéntame algo interesante sobre los volcanes"}]
+
+def timed_create(registry):
+    start = time.perf_counter()
+    try:
+        registry.create("main", model="fake", messages=MESSAGES)
+        return (time.perf_counter() - start) * 1000, None, True
+    except Exception:
+        return (time.perf_counter() - start) * 1000, None, False
+
+def timed_stream(registry):
+    start = time.perf_counter()
+    first = None
+    try:
+        for chunk in registry.stream("main", model="fake", messages=MESSAGES):
+            if first is None and chunk.choices and chunk.choices[0].delta.content:
+                first = (time.perf_counter() - start) * 1000
+        return (time.perf_counter() - start) * 1000, first, True
+    except Exception:
+        return (time.perf_counter() - start) * 1000, first, False
+
+def report(label, results, elapsed):
+    total = np.array([r[0] for r in results if r[2]])
+    first = np.array([r[1] for r in results if r[2] and r[1] is not None])
+    errors = sum(1 for r in results if not r[2])
+    line = f"{label:<10}{len(results) / elapsed:>8.1f} pet/s  p50 {np.percentile(total, 50):>7.1f} ms  p95 {np.percentile(total, 95):>7.1f} ms"
+    if first.size:
+        line += f"  primer fragmento p50 {np.percentile(first, 50):>6.1f} ms"
+    print(line + f"  errores {errors / len(results):.1%}")
+
+def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    latency = sys.argv[3] if len(sys.argv) > 3 else "lognormal:-2.5,0.5"
+    error_rate = float(sys.argv[4]) if len(sys.argv) > 4 else 0.0
+
+    server = FakeLLMServer(latency=latency, token_delay=0.005, error_rate=error_rate, seed=0).start()
+    # Sin reintentos para que la tasa de errores del servidor se vea tal cual
+    registry = LLMClientRegistry(max_retries=0, max_concurrency=4, fake_server=server)
+    print(f"{requests} peticiones, {threads} hilos, latencia {latency}, errores simulados {error_rate:.0%}, "
+          f"concurrencia por servicio {registry.max_concurrency}")
+    try:
+        for label, function in (("completa", timed_create), ("streaming", timed_stream)):
+            with ThreadPoolExecutor(threads) as pool:
+                start = time.perf_counter()
+                results = list(pool.map(lambda _: function(registry), range(requests)))
+                report(label, results, time.perf_counter() - start)
+        print(f"concurrencia máxima en el servidor: {server.stats['max_in_flight']}")
+    finally:
+        registry.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""Compara la memoria vectorial en float32, float16 e int8
+
+Mide recall@5 frente a la búsqueda exacta en float32 (con y sin reordenar en
+float32), la latencia por consulta y la memoria residente de los embeddings.
+
+Uso: python benchmarks/bench_memory_quantization.py [memorias] [consultas]
+"""
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from vector_memory import VectorMemory
+
+DIMENSION = 384  # all-MiniLM-L6-v2
+TOP_K = 5
+
+def synthetic_embeddings(count, queries, clusters=200, noise=0.35, seed=0):
+    """Embeddings normalizados agrupados por temas, parecidos a los de frases reales"""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, DIMENSION)).astype(np.float32)
+    def sample(n):
+        points = centers[rng.integers(0, clusters, n)] + noise * rng.standard_normal((n, DIMENSION)).astype(np.float32)
+        return points / np.linalg.norm(points, axis=1, keepdims=True)
+    return sample(count), sample(queries), rng.random(count).astype(np.float32)
+
+def build(matrix, importance, dtype, rescore):
+    entries = [{'id': i, 'importance': float(importance[i])} for i in range(matrix.shape[0])]
+    memory = VectorMemory(dtype=dtype, rescorer=(lambda rows: matrix[rows]) if rescore else None)
+    memory.load_matrix(entries, matrix)
+    return memory
+
+def run(memory, queries):
+    results = []
+    start = time.perf_counter()
+    for query in queries:
+        results.append([entry['id'] for entry in memory.search(query, TOP_K)])
+    elapsed_ms = (time.perf_counter() - start) * 1000 / len(queries)
+    return results, elapsed_ms
+
+def recall(results, reference):
+    hits = sum(len(set(r) & set(ref)) for r, ref in zip(results, reference))
+    return hits / (len(reference) * TOP_K)
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    query_count = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    matrix, queries, importance = synthetic_embeddings(count, query_count)
+
+    reference, base_ms = run(build(matrix, importance, 'float32', False), queries)
+    base_bytes = build(matrix, importance, 'float32', False).nbytes()
+    print(f"{count} memorias, {query_count} consultas, recall@{TOP_K} frente a float32 exacto")
+    print(f"{'formato':<18}{'recall':>8}{'ms/consulta':>14}{'MiB':>8}{'ahorro':>9}")
+    print(f"{'float32':<18}{1.0:>8.3f}{base_ms:>14.3f}{base_bytes / 2**20:>8.1f}{0:>8.0%}")
+    for dtype in ('float16', 'int8'):
+        for rescore in (False, True):
+            memory = build(matrix, importance, dtype, rescore)
+            results, elapsed_ms = run(memory, queries)
+            label = dtype + (' + reordenar' if rescore else '')
+            saved = 1 - memory.nbytes() / base_bytes
+            print(f"{label:<18}{recall(results, reference):>8.3f}{elapsed_ms:>14.3f}"
+                  f"{memory.nbytes() / 2**20:>8.1f}{saved:>8.0%}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""Compara el detector de voz por tramas con el corte por energía fija
+
+Recorre los WAV de fixtures/vad en bloques de 30 ms, como llegan de la
+captura, y mide para cada frase etiquetada:
+- latencia de cierre: tiempo desde que termina la voz hasta que se da la frase por cerrada
+- truncado: la frase se parte en dos, se corta antes de su final o se pierde su inicio
+- falsos inicios: frases detectadas donde no hay voz
+La referencia imita SpeechRecognition (umbral de energía fijo y pause_threshold).
+
+Uso: python benchmarks/bench_vad.py [hangover_ms] [min_speech_ms]
+(los WAV se generan con benchmarks/make_vad_fixtures.py)
+"""
+import json
+import os
+import sys
+import time
+import wave
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from vad import VoiceActivityDetector
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'vad')
+BLOCK = 480
+PREROLL = 0.3  # Audio previo que añade SpeechToText al recortar la frase
+TOLERANCE = 0.1
+
+class EnergyEndpointer:
+    """Corte como SpeechRecognition: RMS por encima de un umbral fijo y pausa mínima"""
+    def __init__(self, sample_rate, energy_threshold=300, pause_threshold=0.8):
+        self.frame_size = BLOCK
+        self.threshold = energy_threshold
+        self.pause_frames = int(pause_threshold * sample_rate / BLOCK)
+        self.frame_count = 0
+        self.start = None
+        self.silence = 0
+
+    def process(self, samples):
+        utterances = []
+        for frame in samples.reshape(-1, BLOCK):
+            self.frame_count += 1
+            loud = np.sqrt(np.mean(frame.astype(np.float32) ** 2)) > self.threshold
+            if self.start is None:
+                if loud:
+                    self.start, self.silence = self.frame_count - 1, 0
+                continue
+            self.silence = 0 if loud else self.silence + 1
+            if self.silence >= self.pause_frames:
+                utterances.append((self.start, self.frame_count - self.silence))
+                self.start = None
+        return utterances
+
+def read_wav(path):
+    with wave.open(path, 'rb') as f:
+        return np.frombuffer(f.readframes(f.getnframes()), dtype=np.int16), f.getframerate()
+
+def run(detector, samples, sample_rate):
+    """Devuelve [(inicio_s, fin_s, cerrada_en_s)] y el tiempo de CPU por segundo de audio"""
+    frame_seconds = detector.frame_size / sample_rate
+    detections = []
+    start = time.perf_counter()
+    for offset in range(0, len(samples) - BLOCK + 1, BLOCK):
+        for first, last in detector.process(samples[offset:offset + BLOCK]):
+            detections.append((first * frame_seconds, last * frame_seconds, (offset + BLOCK) / sample_rate))
+    cpu = (time.perf_counter() - start) / (len(samples) / sample_rate)
+    return detections, cpu
+
+def score(detections, labels):
+    latencies, truncated, used = [], 0, set()
+    for true_start, true_end in labels:
+        overlapping = [i for i, (s, e, _) in enumerate(detections) if s < true_end and e > true_start]
+        used.update(overlapping)
+        if len(overlapping) != 1:
+            truncated += 1
+            continue
+        start, end, closed = detections[overlapping[0]]
+        if end < true_end - TOLERANCE or start - PREROLL > true_start + TOLERANCE:
+            truncated += 1
+        latencies.append(closed - true_end)
+    return latencies, truncated, len(detections) - len(used)
+
+def main():
+    hangover = int(sys.argv[1]) if len(sys.argv) > 1 else 450
+    min_speech = int(sys.argv[2]) if len(sys.argv) > 2 else 90
+    with open(os.path.join(FIXTURES, 'labels.json'), 'r', encoding='utf-8') as f:
+        labels = json.load(f)
+
+    detectors = {
+        'vad': lambda rate: VoiceActivityDetector(rate, hangover_ms=hangover, min_speech_ms=min_speech),
+        'energía fija': lambda rate: EnergyEndpointer(rate)
+    }
+    print(f"{len(labels)} ficheros, {sum(len(v) for v in labels.values())} frases, hangover {hangover} ms")
+    print(f"{'detector':<14}{'cierre p50':>12}{'cierre p95':>12}{'truncadas':>11}{'falsos':>8}{'CPU':>9}")
+    for name, factory in detectors.items():
+        latencies, truncated, false_starts, cpu = [], 0, 0, []
+        for fixture, intervals in labels.items():
+            samples, rate = read_wav(os.path.join(FIXTURES, fixture + '.wav'))
+            detections, fixture_cpu = run(factory(rate), samples, rate)
+            fixture_latencies, fixture_truncated, fixture_false = score(detections, intervals)
+            latencies += fixture_latencies
+            truncated += fixture_truncated
+            false_starts += fixture_false
+            cpu.append(fixture_cpu)
+        total = sum(len(v) for v in labels.values())
+        latencies = np.array(latencies) * 1000 if latencies else np.zeros(1)
+        print(f"{name:<14}{np.percentile(latencies, 50):>9.0f} ms{np.percentile(latencies, 95):>9.0f} ms"
+              f"{truncated / total:>11.0%}{false_starts:>8}{np.mean(cpu):>8.2%}")
+
+if __name__ == '__main__':
+    main()
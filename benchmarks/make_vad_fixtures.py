@@ -0,0 +1,102 @@
+"""Genera los WAV de prueba del detector de voz y sus etiquetas
+
+Cada fichero es voz sintética (sílabas sonoras con armónicos y formantes,
+fricativas de ruido filtrado y pausas cortas dentro de la frase) sobre un
+ruido de fondo distinto. labels.json guarda, por fichero, los intervalos en
+segundos de cada frase; las pausas internas de hasta 350 ms forman parte de
+la frase y no deberían cortarla.
+
+Uso: python benchmarks/make_vad_fixtures.py
+"""
+import json
+import os
+import wave
+import numpy as np
+
+SAMPLE_RATE = 16000
+OUTPUT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'vad')
+
+def syllable(rng, duration):
+    """Sílaba sonora: armónicos de una f0 con deriva, realzados en dos formantes"""
+    t = np.arange(int(duration * SAMPLE_RATE)) / SAMPLE_RATE
+    f0 = rng.uniform(110, 230) * (1 + 0.08 * np.sin(2 * np.pi * rng.uniform(2, 5) * t))
+    phase = 2 * np.pi * np.cumsum(f0) / SAMPLE_RATE
+    formants = rng.uniform(300, 900), rng.uniform(1000, 2500)
+    wave_ = np.zeros_like(t)
+    for harmonic in range(1, 30):
+        frequency = harmonic * f0.mean()
+        gain = sum(np.exp(-((frequency - formant) / 250) ** 2) for formant in formants) + 0.05
+        wave_ += gain / harmonic * np.sin(harmonic * phase)
+    return wave_ * np.hanning(len(t)) / np.abs(wave_).max()
+
+def fricative(rng, duration):
+    """Fricativa: ruido paso alto (s, f, j)"""
+    noise = rng.standard_normal(int(duration * SAMPLE_RATE))
+    noise = np.diff(noise, prepend=0.0)
+    return 0.35 * noise * np.hanning(len(noise)) / np.abs(noise).max()
+
+def utterance(rng, words, internal_pause=None):
+    """Frase de varias palabras; internal_pause añade una pausa de duda a mitad"""
+    parts = []
+    for index in range(words):
+        for _ in range(rng.integers(1, 4)):
+            if rng.random() < 0.3:
+                parts.append(fricative(rng, rng.uniform(0.06, 0.12)))
+            parts.append(syllable(rng, rng.uniform(0.12, 0.25)))
+        gap = internal_pause if internal_pause and index == words // 2 else rng.uniform(0.04, 0.12)
+        if index < words - 1:
+            parts.append(np.zeros(int(gap * SAMPLE_RATE)))
+    return np.concatenate(parts) * rng.uniform(0.3, 0.6)
+
+def background(rng, kind, samples, level):
+    if kind == 'white':
+        noise = rng.standard_normal(samples)
+    elif kind == 'pink':
+        spectrum = np.fft.rfft(rng.standard_normal(samples))
+        spectrum /= np.sqrt(np.arange(1, len(spectrum) + 1))
+        noise = np.fft.irfft(spectrum, samples)
+    elif kind == 'hum':
+        t = np.arange(samples) / SAMPLE_RATE
+        noise = sum(np.sin(2 * np.pi * 50 * k * t) / k for k in range(1, 6)) + 0.3 * rng.standard_normal(samples)
+    else:
+        # Ruido que sube de nivel a lo largo del fichero (ventilador que se acelera)
+        noise = rng.standard_normal(samples) * np.linspace(0.3, 1.5, samples)
+    return level * noise / np.sqrt(np.mean(noise ** 2))
+
+FIXTURES = [
+    ('quiet_room', 'white', 0.002, [None, 0.3, None]),
+    ('pink_noise', 'pink', 0.01, [0.25, None, 0.35]),
+    ('mains_hum', 'hum', 0.01, [None, None, 0.3]),
+    ('rising_fan', 'rising', 0.008, [0.3, None, None]),
+    ('noisy_stream', 'white', 0.03, [None, 0.2, None])
+]
+
+def main():
+    os.makedirs(OUTPUT, exist_ok=True)
+    rng = np.random.default_rng(7)
+    labels = {}
+    for name, kind, level, pauses in FIXTURES:
+        pieces = [np.zeros(int(rng.uniform(0.6, 1.0) * SAMPLE_RATE))]
+        intervals = []
+        position = len(pieces[0])
+        for pause in pauses:
+            speech = utterance(rng, int(rng.integers(2, 6)), pause)
+            intervals.append([position / SAMPLE_RATE, (position + len(speech)) / SAMPLE_RATE])
+            silence = np.zeros(int(rng.uniform(1.0, 1.4) * SAMPLE_RATE))
+            pieces += [speech, silence]
+            position += len(speech) + len(silence)
+        signal = np.concatenate(pieces)
+        signal += background(rng, kind, len(signal), level)
+        samples = np.clip(signal * 32767, -32768, 32767).astype(np.int16)
+        with wave.open(os.path.join(OUTPUT, name + '.wav'), 'wb') as f:
+            f.setnchannels(1)
+            f.setsampwidth(2)
+            f.setframerate(SAMPLE_RATE)
+            f.writeframes(samples.tobytes())
+        labels[name] = [[round(start, 3), round(end, 3)] for start, end in intervals]
+    with open(os.path.join(OUTPUT, 'labels.json'), 'w', encoding='utf-8') as f:
+        json.dump(labels, f, indent=4)
+    print(f"{len(FIXTURES)} ficheros en {OUTPUT}")
+
+if __name__ == '__main__':
+    main()
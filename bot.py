@@ -1,50 +1,97 @@
 import os
+import queue
 import time
 import re
 import signal
 import sys
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from contextlib import contextmanager
 from dotenv import load_dotenv
 from modulos.stt import SpeechToText
+from modulos.stt_backends import TranscribedAudio
+from modulos.wake_word import create_wake_word_spotter
 from modulos.tts import TextToSpeech
 from modulos.ai_manager import AIManager
 from modulos.timer_manager import TimerManager
 from modulos.searchs_manager import SearchManager
 from modulos.notes_manager import NotesManager
 from modulos.filtrador import Filtrador
-from modulos.memory_manager import MemoryManager
+from modulos.memory_manager import create_memory_manager
 from modulos.personality_manager import PersonalityManager
 from modulos.logger_manager import LoggerManager
 from modulos.metrics_manager import MetricsManager
+from modulos.sentence_segmenter import SentenceSegmenter
+from modulos.conversation_summary import RollingSummary
+from modulos.pipeline import Pipeline, StageQueue
 import constants
 
 class Bot:
     def __init__(self):
+        # Tiempo de inicio
+        self.start_time = time.time()
+        
         # Cargar variables de entorno
         load_dotenv()
         
         # Inicializar logger y métricas
         self.logger = LoggerManager(constants.LOG_PATH)
-        self.metrics = MetricsManager(constants.METRICS_PATH)
-        
-        # Inicializar componentes
-        self.stt = SpeechToText()
-        self.tts = TextToSpeech()
-        self.ai_manager = AIManager()
-        self.timer_manager = TimerManager()
-        self.search_manager = SearchManager()
-        self.notes_manager = NotesManager()
-        self.filtrador = Filtrador()
-        self.memory_manager = MemoryManager(constants.MEMORY_PATH)
-        self.personality_manager = PersonalityManager(constants.MEMORY_PATH)
+        self.metrics = MetricsManager.shared(constants.METRICS_PATH)
+        
+        # Inicializar componentes (AIManager primero para que el modelo de
+        # embeddings empiece a cargar en segundo plano cuanto antes)
+        self.ai_manager = self._timed_init("ai_manager", AIManager)
+        self.stt = self._timed_init("stt", SpeechToText)
+        # Detector del nombre sobre el audio: las frases sin él no llegan a transcribirse
+        self.wake_word = self._timed_init(
+            "wake_word", create_wake_word_spotter,
+            constants.WAKE_WORD_MODE, constants.WAKE_WORD_TEMPLATES_PATH,
+            constants.WAKE_WORD_THRESHOLD, constants.WAKE_WORD_SEARCH_SECONDS, self.logger
+        )
+        self.tts = self._timed_init("tts", TextToSpeech)
+        self.timer_manager = self._timed_init("timer_manager", TimerManager)
+        self.search_manager = self._timed_init("search_manager", SearchManager)
+        self.notes_manager = self._timed_init("notes_manager", NotesManager)
+        self.filtrador = self._timed_init("filtrador", Filtrador)
+        self.memory_manager = self._timed_init("memory_manager", create_memory_manager, constants.MEMORY_PATH)
+        self.personality_manager = self._timed_init("personality_manager", PersonalityManager, constants.MEMORY_PATH)
+        
+        # Resumen acumulado de las conversaciones que salen de la ventana literal
+        self.rolling_summary = RollingSummary(
+            self.memory_manager,
+            self.ai_manager.secondary_ai.summarize_conversation,
+            window=constants.SUMMARY_VERBATIM_WINDOW,
+            update_every=constants.SUMMARY_UPDATE_EVERY,
+            max_length=constants.MAX_SUMMARY_LENGTH,
+            logger=self.logger
+        )
         
         # Flag para controlar el bucle principal
         self.running = False
         
-        # Tiempo de inicio
-        self.start_time = time.time()
+        # Con un motor en streaming se sabe si va dirigido al bot antes de que acabe la frase
+        self._directed_since = None
+        self._directed_lock = threading.Lock()
+        
+        # Voz del bot sonando (turnos activos) y cuándo terminó la última, para no escucharse a sí mismo
+        self._speech_active = 0
+        self._speech_ended_at = 0.0
+        self._speech_lock = threading.Lock()
+        self.stt.on_partial = self._on_partial_transcript
+        
+        # Momento de la última respuesta: abre la ventana de preguntas de seguimiento sin nombre
+        self._last_reply_at = 0.0
         
+        self.logger.log_startup_timing("bot", (time.time() - self.start_time) * 1000)
         self.logger.logger.info("Bot inicializado")
 
+    def _timed_init(self, name, component_class, *args):
+        """Crea un componente registrando cuánto tarda su arranque"""
+        start_time = time.time()
+        component = component_class(*args)
+        self.logger.log_startup_timing(name, (time.time() - start_time) * 1000)
+        return component
+
     def cleanup(self):
         """Limpia recursos antes de terminar"""
         try:
@@ -56,11 +103,30 @@ class Bot:
             # Cerrar temporizadores activos
             self.timer_manager.cleanup()
             
+            # Cerrar la captura de audio continua
+            self.stt.close()
+            
             # Guardar notas pendientes
             self.notes_manager.save_notes()
             
-            # Guardar estado de la memoria
+            # Aplicar las escrituras que quedaban en cola antes de guardar la memoria
+            self.ai_manager.write_behind.drain(constants.WRITE_BEHIND_DRAIN_TIMEOUT)
+            self.rolling_summary.close()
+            # Sin escrituras pendientes ya no se piden embeddings: detener el servicio (vuelca sus métricas)
+            self.ai_manager.embedding_service.stop()
+            if self.wake_word is not None:
+                self.logger.logger.info(f"Transcripción ahorrada por el detector de nombre: {self.metrics.get_wake_word_stats()}")
+            
+            # Guardar la caché de respuestas
+            if self.ai_manager.response_cache is not None:
+                self.ai_manager.response_cache.save()
+            
+            # Cerrar las conexiones abiertas con la API
+            self.ai_manager.llm.close()
+            
+            # Guardar estado de la memoria y sincronizar su journal
             self.memory_manager.save_memory()
+            self.ai_manager.store.close()
             
             self.logger.logger.info("Recursos limpiados correctamente")
         except Exception as e:
@@ -101,66 +167,271 @@ class Bot:
         return has_context and no_other_names
 
     def process_audio(self, audio_data):
-        """Procesa audio y genera una respuesta"""
+        """Procesa audio y genera una respuesta (todas las etapas seguidas)"""
         try:
             # Convertir audio a texto
-            text = self.stt.transcribe(audio_data)
+            text = self._transcribe(audio_data)
             if not text:
                 return
-            
-            self.logger.logger.info(f"Audio transcrito: {text}")
 
-            # Verificar si el mensaje está dirigido al bot
-            if not self._is_directed_to_bot(text):
+            # Verificar si va dirigido al bot, limpiarlo y filtrarlo
+            filtered_text = self._prepare_request(text)
+            if not filtered_text:
                 return
-
-            # Limpiar el texto de nombres y patrones de dirección
-            cleaned_text = text
-            for pattern in [
-                r"^(elenia|elena|elen|nena|helen|hellen|ellen)[\s,:.-]+",
-                r"^(oye|hey|eh|hola|buenas)[\s,:.-]+(elenia|elena|elen|nena|helen|hellen|ellen)[\s,:.-]+",
-                r"^(disculpa|perdón|perdon|por favor)[\s,:.-]+(elenia|elena|elen|nena|helen|hellen|ellen)[\s,:.-]+"
-            ]:
-                cleaned_text = re.sub(pattern, "", cleaned_text, flags=re.IGNORECASE)
-            
-            cleaned_text = cleaned_text.strip()
-
-            # Filtrar contenido sensible
-            filtered_text = self.filtrador.filter(cleaned_text)
             
-            # Obtener contexto de conversaciones recientes
-            recent_conversations = self.memory_manager.get_recent_conversations()
-            
-            # Si hay muchas conversaciones, resumirlas
-            if len(recent_conversations) > 5:
-                summary = self.ai_manager.secondary_ai.summarize_conversation(recent_conversations)
-                context = f"Resumen de conversaciones anteriores:\n{summary}\n\nConversaciones recientes:\n"
-                context += "\n".join([f"Usuario: {conv['user_input']}\nBot: {conv['bot_response']}" 
-                                    for conv in recent_conversations[-3:]])
+            # Obtener respuesta de la IA con contexto (en streaming ya se va diciendo)
+            context, summary = self._conversation_context()
+            if constants.STREAMING_RESPONSES:
+                response = self._stream_and_speak(filtered_text, context, summary)
             else:
-                context = "\n".join([f"Usuario: {conv['user_input']}\nBot: {conv['bot_response']}" 
-                                   for conv in recent_conversations])
-            
-            # Obtener respuesta de la IA con contexto
-            response = self.ai_manager.get_response(filtered_text, context)
+                response = self.ai_manager.get_response(filtered_text, context, summary)
             
             # Solo procesar y hablar si hay una respuesta
             if response and response.strip():
-                # Guardar la conversación en la memoria
-                self.memory_manager.add_conversation(filtered_text, response)
-                
-                # Procesar comandos implícitos en la respuesta
-                self._process_implicit_commands(response)
+                self._remember(filtered_text, response)
                 
                 # Convertir respuesta a audio
-                self.tts.speak(response)
+                if not constants.STREAMING_RESPONSES:
+                    with self._speaking():
+                        self.tts.speak(response)
                 
-                # Registrar la conversación
-                self.logger.log_conversation(filtered_text, response)
+                # Procesar comandos implícitos en la respuesta
+                self._process_implicit_commands(response)
                 
         except Exception as e:
             self.logger.log_error("audio_processing", str(e))
 
+    def _begin_speech(self):
+        with self._speech_lock:
+            self._speech_active += 1
+
+    def _end_speech(self):
+        with self._speech_lock:
+            self._speech_active -= 1
+            self._speech_ended_at = time.time()
+
+    @contextmanager
+    def _speaking(self):
+        """Marca el tiempo en que suena la voz del bot"""
+        self._begin_speech()
+        try:
+            yield
+        finally:
+            self._end_speech()
+
+    def _speak_stream(self, sentences, turn_start):
+        """Dice las frases a medida que llegan; cuenta como voz del bot desde el primer audio"""
+        started = threading.Event()
+        first_audio = self._first_audio_callback(turn_start)
+
+        def on_start():
+            self._begin_speech()
+            started.set()
+            first_audio()
+
+        try:
+            return self.tts.speak_stream(sentences, on_start=on_start)
+        finally:
+            if started.is_set():
+                self._end_speech()
+
+    def _is_own_voice(self, audio_data):
+        """Indica si la frase se solapa con la voz del bot (o su eco justo después)"""
+        if not constants.STT_IGNORE_OWN_VOICE:
+            return False
+        seconds = len(audio_data.frame_data) / (audio_data.sample_rate * audio_data.sample_width)
+        # La frase se cierra tras el silencio de cierre: su inicio es anterior a eso
+        started_at = time.time() - seconds - constants.VAD_HANGOVER_MS / 1000
+        with self._speech_lock:
+            return (self._speech_active > 0 or
+                    self._speech_ended_at + constants.STT_ECHO_TAIL_MS / 1000 > started_at)
+
+    def _listen(self):
+        """Escucha una frase y descarta antes de transcribirla la del propio bot o sin nombre"""
+        audio_data = self.stt.listen()
+        # Lo detectado en parciales pertenece a esta frase, que viaja con ella a la transcripción
+        with self._directed_lock:
+            directed_since, self._directed_since = self._directed_since, None
+        if audio_data is None:
+            return None
+        if self._is_own_voice(audio_data):
+            self.logger.logger.info("Frase descartada: se solapa con la voz del bot")
+            return None
+        audio_data.directed_since = directed_since
+        # Un motor en streaming ya la ha transcrito mientras se hablaba: no hay nada que ahorrar
+        if self.wake_word is None or isinstance(audio_data, TranscribedAudio):
+            return audio_data
+        spot_start = time.time()
+        name, distance, seconds = self.wake_word.detect_audio(audio_data)
+        # Tras una respuesta se aceptan preguntas de seguimiento sin nombre
+        follow_up = time.time() - self._last_reply_at < constants.WAKE_WORD_FOLLOWUP_SECONDS
+        transcribe = name is not None or follow_up or constants.WAKE_WORD_MODE != "gate"
+        self.ai_manager.write_behind.submit(
+            "metrics", self.metrics.record_wake_word,
+            name is not None, transcribe, seconds, (time.time() - spot_start) * 1000
+        )
+        if not transcribe:
+            self.logger.logger.info(f"Frase sin nombre descartada sin transcribir ({seconds:.1f} s, distancia {distance:.2f})")
+            return None
+        # En modo "prioritize" estas frases adelantan en la cola de transcripción
+        audio_data.priority = name is not None or follow_up
+        return audio_data
+
+    def _on_partial_transcript(self, text):
+        """Hipótesis parcial (hilo de captura): adelanta la comprobación de dirección"""
+        with self._speech_lock:
+            if self._speech_active:
+                return
+        with self._directed_lock:
+            if self._directed_since is not None or not self._is_directed_to_bot(text):
+                return
+            self._directed_since = time.time()
+        self.logger.logger.info(f"Dirigido al bot (parcial): {text}")
+
+    def _transcribe(self, audio_data):
+        """Convierte audio a texto; None si no se entiende"""
+        text = self.stt.transcribe(audio_data)
+        directed_since = getattr(audio_data, "directed_since", None)
+        if not text:
+            return None
+        self.logger.logger.info(f"Audio transcrito: {text}")
+        if directed_since is not None:
+            # Cuánto antes del final de la frase se supo que iba dirigida al bot
+            self.ai_manager.write_behind.submit(
+                "metrics", self.metrics.record_response_time,
+                "directed_early", (time.time() - directed_since) * 1000
+            )
+        return text
+
+    def _prepare_request(self, text):
+        """Devuelve el mensaje limpio y filtrado si va dirigido al bot, si no None"""
+        # Verificar si el mensaje está dirigido al bot
+        if not self._is_directed_to_bot(text):
+            return None
+
+        # Limpiar el texto de nombres y patrones de dirección
+        cleaned_text = text
+        for pattern in [
+            r"^(elenia|elena|elen|nena|helen|hellen|ellen)[\s,:.-]+",
+            r"^(oye|hey|eh|hola|buenas)[\s,:.-]+(elenia|elena|elen|nena|helen|hellen|ellen)[\s,:.-]+",
+            r"^(disculpa|perdón|perdon|por favor)[\s,:.-]+(elenia|elena|elen|nena|helen|hellen|ellen)[\s,:.-]+"
+        ]:
+            cleaned_text = re.sub(pattern, "", cleaned_text, flags=re.IGNORECASE)
+        
+        cleaned_text = cleaned_text.strip()
+
+        # Filtrar contenido sensible
+        return self.filtrador.filter(cleaned_text) or None
+
+    def _conversation_context(self):
+        """Conversaciones recientes literales y resumen acumulado (ya calculado) de las anteriores"""
+        summary, recent_conversations = self.rolling_summary.current()
+        context = "\n".join([f"Usuario: {conv['user_input']}\nBot: {conv['bot_response']}" 
+                            for conv in recent_conversations])
+        return context, summary
+
+    def _remember(self, filtered_text, response):
+        """Guarda y registra la conversación en segundo plano"""
+        self._last_reply_at = time.time()
+        write_behind = self.ai_manager.write_behind
+        write_behind.submit("conversation", self.memory_manager.add_conversation, filtered_text, response)
+        # Tras guardarla, actualizar el resumen si alguna conversación salió de la ventana
+        write_behind.submit("summary", self.rolling_summary.schedule)
+        write_behind.submit("log", self.logger.log_conversation, filtered_text, response)
+
+    def _stream_and_speak(self, text, context, summary):
+        """Dice la respuesta frase a frase mientras se genera y devuelve el texto completo"""
+        turn_start = time.time()
+        segmenter = SentenceSegmenter(constants.SENTENCE_MIN_CHARS, constants.SENTENCE_MAX_CHARS)
+        turn = {}
+        tokens = self.ai_manager.stream_response(text, context, summary, turn)
+        spoken = " ".join(self._speak_stream(segmenter.segment(tokens), turn_start))
+        # Al historial y a la memoria solo va lo que llegó a sonar
+        self.ai_manager.remember_spoken(text, spoken, turn)
+        return spoken
+
+    def _first_audio_callback(self, turn_start):
+        def on_first_audio():
+            self.ai_manager.write_behind.submit(
+                "metrics", self.metrics.record_response_time,
+                "first_audio", (time.time() - turn_start) * 1000
+            )
+        return on_first_audio
+
+    def _build_pipeline(self):
+        """Etapas concurrentes: captura -> transcripción -> dirección -> respuesta -> voz"""
+        pipeline = Pipeline(self.logger)
+        # La captura nunca espera: si la transcripción va atrasada se pierde el audio más antiguo
+        # Con el detector de nombre, las frases que lo llevan se transcriben antes y se descartan las últimas
+        audio_queue = pipeline.queue(
+            "audio", constants.PIPELINE_AUDIO_QUEUE, StageQueue.DROP_OLDEST,
+            priority=lambda audio: getattr(audio, "priority", False)
+        )
+        text_queue = pipeline.queue("transcripts", constants.PIPELINE_TEXT_QUEUE, StageQueue.BLOCK)
+        # Si llegan varias peticiones mientras piensa, se contesta a las más recientes
+        request_queue = pipeline.queue("requests", constants.PIPELINE_REQUEST_QUEUE, StageQueue.DROP_OLDEST)
+        # La respuesta siguiente espera a que haya hueco en la voz (contrapresión)
+        self.speech_queue = pipeline.queue("speech", constants.PIPELINE_SPEECH_QUEUE, StageQueue.BLOCK)
+
+        pipeline.stage("capture", self._listen, output_queue=audio_queue)
+        pipeline.stage("transcription", self._transcribe, audio_queue, text_queue)
+        pipeline.stage("directed", self._prepare_request, text_queue, request_queue)
+        pipeline.stage("response", self._respond_to_speech, request_queue)
+        pipeline.stage("speech", self._speak_turn, self.speech_queue)
+        return pipeline
+
+    def _respond_to_speech(self, filtered_text):
+        """Etapa de respuesta: entrega las frases a la etapa de voz a medida que se generan"""
+        # La etapa de voz devuelve en "spoken" el texto que llegó a sonar
+        turn = {"start": time.time(), "sentences": queue.Queue(), "spoken": Future()}
+        while self.running and not self.speech_queue.put(turn, timeout=0.2):
+            pass
+        context, summary = self._conversation_context()
+        stream_turn = {}
+        try:
+            if constants.STREAMING_RESPONSES:
+                segmenter = SentenceSegmenter(constants.SENTENCE_MIN_CHARS, constants.SENTENCE_MAX_CHARS)
+                tokens = self.ai_manager.stream_response(filtered_text, context, summary, stream_turn)
+                for sentence in segmenter.segment(tokens):
+                    turn["sentences"].put(sentence)
+            else:
+                response = self.ai_manager.get_response(filtered_text, context, summary) or ""
+                if response.strip():
+                    turn["sentences"].put(response)
+        finally:
+            turn["sentences"].put(None)
+        spoken = self._wait_spoken(turn)
+        if constants.STREAMING_RESPONSES:
+            self.ai_manager.remember_spoken(filtered_text, spoken, stream_turn)
+        if spoken.strip():
+            self._remember(filtered_text, spoken)
+
+    def _wait_spoken(self, turn):
+        """Espera a que la etapa de voz termine el turno; "" si el pipeline se detiene antes"""
+        while True:
+            try:
+                return turn["spoken"].result(timeout=0.2)
+            except FutureTimeout:
+                if not self.running:
+                    return ""
+
+    def _speak_turn(self, turn):
+        """Etapa de voz: dice las frases de un turno y procesa sus comandos implícitos"""
+        sentences = iter(turn["sentences"].get, None)
+        response = ""
+        try:
+            if constants.STREAMING_RESPONSES:
+                response = " ".join(self._speak_stream(sentences, turn["start"]))
+            else:
+                response = " ".join(sentences)
+                if response:
+                    with self._speaking():
+                        self.tts.speak(response)
+        finally:
+            turn["spoken"].set_result(response)
+        if response.strip():
+            self._process_implicit_commands(response)
+
     def _process_implicit_commands(self, response):
         """Procesa comandos implícitos en la respuesta"""
         try:
@@ -190,10 +461,20 @@ class Bot:
         self.logger.logger.info("Iniciando escucha de audio...")
         
         try:
+            if constants.PIPELINE_ENABLED:
+                # Cada etapa en su hilo: se sigue escuchando mientras piensa o habla
+                pipeline = self._build_pipeline().start()
+                try:
+                    while self.running:
+                        time.sleep(0.2)
+                finally:
+                    pipeline.stop(constants.PIPELINE_STOP_TIMEOUT)
+                    self.logger.logger.info(f"Estadísticas del pipeline: {pipeline.stats()}")
+                return
             while self.running:
                 try:
                     # Obtener audio de Voicemeeter
-                    audio_data = self.stt.listen()
+                    audio_data = self._listen()
                     if audio_data:
                         self.process_audio(audio_data)
                 except Exception as e:
@@ -213,7 +494,8 @@ class Bot:
                 'metrics': {
                     'api_usage': self.metrics.get_service_stats('main'),
                     'emotion_stats': self.metrics.get_emotion_stats(),
-                    'memory_ops': self.metrics.get_memory_stats()
+                    'memory_ops': self.metrics.get_memory_stats(),
+                    'wake_word': self.metrics.get_wake_word_stats()
                 },
                 'personality': {
                     'current_emotion': self.personality_manager.get_current_emotion(),
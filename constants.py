@@ -12,14 +12,97 @@ VOICEMEETER_INPUT_INDEX = 0  # Índice del input de Voicemeeter (normalmente 0 p
 #UNICO
 VOICEMEETER_OUTPUT_INDEX = 0  # Índice del output de Voicemeeter (normalmente 0 para el altavoz principal)
 
+# Captura de audio
+STT_CAPTURE_MODE = "stream"  # "stream" (un InputStream abierto con anillo en memoria) o "microphone" (abre sr.Microphone cada vez)
+STT_SAMPLE_RATE = 16000  # Muestras por segundo de la captura continua
+STT_BLOCK_MS = 30  # Duración de cada bloque del callback de audio
+STT_RING_SECONDS = 30  # Segundos de audio que guarda el anillo
+STT_PREROLL_MS = 300  # Audio anterior al inicio detectado que se incluye en la frase
+STT_MAX_UTTERANCE_SECONDS = 20  # Duración máxima de una frase antes de cortarla
+STT_BACKEND = "google"  # "google" (remoto, al acabar la frase) o "vosk" (local en CPU, con resultados parciales)
+VOSK_MODEL_PATH = os.path.join(BASE_DIR, 'data', 'models', 'vosk-model-small-es-0.42')  # Modelo de Vosk descargado
+VAD_HANGOVER_MS = 450  # Silencio que cierra una frase: más bajo responde antes, más alto respeta las pausas
+VAD_MIN_SPEECH_MS = 90  # Voz seguida necesaria para abrir una frase (ignora golpes y clics)
+VAD_MARGIN_DB = 6.0  # Decibelios sobre el ruido de fondo (adaptativo) para considerar que hay voz
+STT_IGNORE_OWN_VOICE = False  # Descarta las frases que se solapan con la voz del bot; solo si el micrófono capta los altavoces (también descarta las interrupciones)
+STT_ECHO_TAIL_MS = 300  # Tras terminar de hablar, tiempo en que lo captado aún se considera eco del bot
+WAKE_WORD_MODE = "prioritize"  # "off" (se transcribe todo), "prioritize" (las frases con el nombre se transcriben antes) o "gate" (opcional: solo se transcriben las que llevan el nombre)
+# Con "gate" se pierden las peticiones sin nombre que _is_directed_to_bot aceptaría por contexto ("puedes...", "necesito...") fuera de la ventana de seguimiento
+WAKE_WORD_TEMPLATES_PATH = os.path.join(BASE_DIR, 'data', 'wake_words')  # Grabaciones <nombre>_<n>.wav (python -m modulos.wake_word <nombre>)
+WAKE_WORD_THRESHOLD = None  # Distancia DTW máxima para aceptar el nombre; None = calibrada con las grabaciones
+WAKE_WORD_SEARCH_SECONDS = 2.5  # Segundos del principio de la frase en los que se busca el nombre
+WAKE_WORD_FOLLOWUP_SECONDS = 15  # Tras una respuesta, segundos en los que se transcribe todo (preguntas de seguimiento sin nombre)
+
 # Configuración de la IA
 AI_MODEL = "gpt-4o-mini"
 MAX_TOKENS = 150
+PROMPT_TOKEN_BUDGET = 3000  # Tokens máximos del prompt principal (instrucciones, secciones, historial y mensaje)
+PROMPT_SECTION_PRIORITY = ("personality", "context_analysis", "history", "memories", "conversation_context")  # Orden de llenado
 EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+EMBEDDING_CACHE_SIZE = 256  # Textos cuyo embedding se guarda en la caché LRU
+EMBEDDING_BATCH_WINDOW_MS = 5  # Ventana para agrupar peticiones de embeddings en un lote
+EMBEDDING_BATCH_MAX_SIZE = 32  # Tamaño máximo de cada lote
+EMBEDDING_METRICS_INTERVAL = 30  # Segundos entre volcados de aciertos/fallos de la caché de embeddings a las métricas
+EMBEDDING_TIMEOUT = 30  # Segundos máximos de espera de un embedding (incluye la primera carga del modelo)
+ANALYSIS_MODE = "concurrent"  # "concurrent" (análisis en paralelo) o "sequential" (uno tras otro)
+ANALYSIS_MAX_WORKERS = 4  # Hilos del pool de análisis secundarios
+ANALYSIS_TIMEOUT = 4.0  # Segundos máximos por análisis antes de usar el valor por defecto
+ANALYSIS_STRATEGY = "fused"  # "fused" (emoción, contexto y categoría en una llamada) o "separate" (tres llamadas)
+EMOTION_CLASSIFIER = "remote"  # "remote" (API) o "local" (léxico + embeddings, la API solo si hay dudas); aplica con "separate"
+EMOTION_LOCAL_CONFIDENCE = 0.6  # Confianza mínima del clasificador local para no consultar la API
+RESPONSE_CACHE_ENABLED = False  # Reutiliza respuestas a preguntas casi idénticas con el mismo estado emocional
+RESPONSE_CACHE_SIZE = 256  # Respuestas guardadas (se expulsa la menos usada)
+RESPONSE_CACHE_THRESHOLD = 0.92  # Similitud mínima entre preguntas para reutilizar la respuesta
+RESPONSE_CACHE_TTL = 3600  # Segundos que una respuesta sigue siendo válida
+RESPONSE_CACHE_SAVE_EVERY = 10  # Respuestas nuevas entre guardados de la caché en disco
+WRITE_BEHIND_MAX_SIZE = 64  # Tareas posteriores a la respuesta que pueden esperar en cola
+WRITE_BEHIND_PUT_TIMEOUT = 0.5  # Segundos esperando hueco antes de avisar de que la cola está llena
+WRITE_BEHIND_DRAIN_TIMEOUT = 30.0  # Segundos para vaciar la cola al cerrar el bot
+OPENAI_API_BASE = None  # URL base alternativa de la API (p. ej. un servidor local de pruebas); también OPENAI_API_BASE en .env
+LLM_TIMEOUT = 30.0  # Segundos máximos por petición a la API
+LLM_CONNECT_TIMEOUT = 5.0  # Segundos máximos para abrir una conexión
+LLM_MAX_RETRIES = 2  # Reintentos automáticos del cliente ante errores transitorios
+LLM_MAX_CONNECTIONS = 10  # Conexiones HTTP por cliente (uno por API key)
+LLM_MAX_KEEPALIVE_CONNECTIONS = 5  # Conexiones que se mantienen abiertas para reutilizarlas
+LLM_KEEPALIVE_EXPIRY = 60.0  # Segundos que una conexión inactiva sigue abierta
+LLM_MAX_CONCURRENCY = 4  # Peticiones simultáneas por servicio (main, emotion, context...)
+LLM_BACKEND = "openai"  # "openai" (API real u OPENAI_API_BASE) o "fake" (servidor local de pruebas, sin red ni coste)
+FAKE_LLM_SCRIPT = None  # JSON con las respuestas guionizadas del servidor de pruebas; None = respuestas por defecto
+FAKE_LLM_LATENCY = "lognormal:-1.5,0.5"  # Distribución del tiempo hasta el primer byte (segundos)
+FAKE_LLM_TOKEN_DELAY = 0.02  # Segundos entre fragmentos en streaming
+FAKE_LLM_ERROR_RATE = 0.0  # Proporción de peticiones que devuelven un error 500
+STREAMING_RESPONSES = True  # Recibe la respuesta en streaming y la dice frase a frase
+SENTENCE_MIN_CHARS = 12  # Fragmentos más cortos se juntan con la frase siguiente antes de sintetizar
+SENTENCE_MAX_CHARS = 200  # Frases más largas se cortan en la última coma o espacio
+TTS_STREAM_BUFFER = 2  # Frases ya sintetizadas que pueden esperar a ser reproducidas
+PIPELINE_ENABLED = True  # Captura, transcripción, dirección, respuesta y voz en hilos separados unidos por colas
+PIPELINE_AUDIO_QUEUE = 4  # Frases de audio pendientes de transcribir (si se llena se descarta la más antigua)
+PIPELINE_TEXT_QUEUE = 8  # Transcripciones pendientes de comprobar si van dirigidas al bot
+PIPELINE_REQUEST_QUEUE = 2  # Peticiones pendientes de respuesta (si se llena se descarta la más antigua)
+PIPELINE_SPEECH_QUEUE = 1  # Respuestas esperando a ser dichas (la siguiente espera a que haya hueco)
+PIPELINE_STOP_TIMEOUT = 2.0  # Segundos que se espera a cada etapa al cerrar
 
 # Configuración de memoria
-MAX_MEMORY_ITEMS = 1000
+MAX_MEMORY_ITEMS = 100000  # Tope que aplica la consolidación expulsando por puntuación (~150 MB en float32); None = sin límite
 MEMORY_RELEVANCE_THRESHOLD = 0.7
+MEMORY_COMPACTION_THRESHOLD = 0.5  # Proporción de filas descartadas que dispara la compactación
+MEMORY_INDEX = "ivf"  # "ivf" (aproximado, escala a meses de historial) o "exact" (fuerza bruta)
+IVF_NPROBE = 16  # Listas invertidas que se exploran por consulta
+IVF_MIN_TRAIN_SIZE = 2048  # Por debajo de este tamaño se usa búsqueda exacta
+MEMORY_EMBEDDING_DTYPE = "float32"  # Formato en RAM: "float32", "float16" (1/2) o "int8" (~1/4, escala por vector)
+# float16 ahorra RAM pero la búsqueda exacta es ~6x más lenta (NumPy no tiene producto float16 rápido y hay que
+# convertir por bloques); int8 ocupa menos y puntúa casi tan rápido como float32. Con IVF solo se convierten los candidatos
+MEMORY_RESCORE = True  # Reordena con los float32 exactos del fichero cuando el formato está cuantizado
+MEMORY_RESCORE_OVERSAMPLE = 4  # Candidatos preseleccionados por cada resultado pedido antes de reordenar
+MEMORY_FSYNC_INTERVAL = 1.0  # Segundos entre fsync agrupados del journal de memoria
+MEMORY_CHECKPOINT_EVERY = 500  # Operaciones del journal antes de escribir una instantánea
+MEMORY_BACKEND = "json"  # Backend de MemoryManager: "json" (journal) o "sqlite" (consultas indexadas)
+MEMORY_CONSOLIDATION_INTERVAL = 600  # Segundos entre consolidaciones de la memoria
+MEMORY_DUPLICATE_THRESHOLD = 0.95  # Similitud a partir de la cual dos memorias se fusionan
+MEMORY_SCORE_WEIGHTS = (0.6, 0.3, 0.1)  # Pesos de importancia, recencia y accesos al expulsar
+MEMORY_RECENCY_HALF_LIFE_DAYS = 7.0  # Días en los que la recencia de una memoria se reduce a la mitad
+SUMMARY_VERBATIM_WINDOW = 3  # Conversaciones recientes que se envían literales; las anteriores van en el resumen
+SUMMARY_UPDATE_EVERY = 2  # Conversaciones fuera de la ventana que se acumulan antes de actualizar el resumen
 
 # Configuración de personalidad
 EMOTION_DECAY_RATE = 0.1
@@ -28,4 +111,4 @@ MIN_EMOTION_INTENSITY = 0.0
 
 # Configuración de conversación
 MAX_CONVERSATION_HISTORY = 10
-MAX_SUMMARY_LENGTH = 200 
+MAX_SUMMARY_LENGTH = 400  # Caracteres máximos del resumen acumulado de la conversación
@@ -0,0 +1,74 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+class RollingSummary:
+    def __init__(self, memory_manager, summarizer, window=3, update_every=2, max_length=400, logger=None):
+        self.memory_manager = memory_manager
+        # summarizer(conversaciones, max_length, previous_summary) -> texto ("" si falla)
+        self.summarizer = summarizer
+        # Conversaciones más recientes que se envían literales en lugar de resumidas
+        self.window = window
+        # Conversaciones fuera de la ventana que se acumulan antes de actualizar el resumen
+        self.update_every = update_every
+        self.max_length = max_length
+        self.logger = logger
+        self._lock = threading.Lock()
+        self._scheduled = False
+        # Un solo hilo: las actualizaciones se aplican en orden y nunca dos a la vez
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rolling_summary")
+        stored = memory_manager.get_summary() or {}
+        self.text = stored.get("text", "")
+        # Marca de tiempo de la última conversación incluida en el resumen
+        self.through = stored.get("through")
+
+    def _unsummarized(self):
+        """Conversaciones guardadas posteriores a la última resumida"""
+        conversations = self.memory_manager.get_recent_conversations(limit=50)
+        if self.through is None:
+            return conversations
+        return [conv for conv in conversations if (conv.get("timestamp") or "") > self.through]
+
+    def current(self):
+        """Devuelve el resumen y las conversaciones recientes que deben ir literales"""
+        with self._lock:
+            text = self.text
+            recent = self._unsummarized()
+        # Si el resumen va con retraso se mantienen literales las pendientes, con un tope
+        return text, recent[-2 * self.window:]
+
+    def schedule(self):
+        """Programa una actualización si hay suficientes conversaciones fuera de la ventana"""
+        with self._lock:
+            pending = len(self._unsummarized()) - self.window
+            if self._scheduled or pending < self.update_every:
+                return False
+            self._scheduled = True
+        self._executor.submit(self._update)
+        return True
+
+    def _update(self):
+        """Incorpora al resumen las conversaciones que han salido de la ventana"""
+        try:
+            with self._lock:
+                previous = self.text
+                pending = self._unsummarized()[:-self.window] if self.window else self._unsummarized()
+            if not pending:
+                return
+            text = self.summarizer(pending, self.max_length, previous_summary=previous or None)
+            if not text:
+                # Si falla se reintenta con la siguiente conversación sin perder las pendientes
+                return
+            with self._lock:
+                self.text = text
+                self.through = pending[-1].get("timestamp")
+                self.memory_manager.set_summary({"text": self.text, "through": self.through})
+        except Exception as e:
+            if self.logger:
+                self.logger.log_error("rolling_summary", str(e))
+        finally:
+            with self._lock:
+                self._scheduled = False
+
+    def close(self):
+        """Espera a que termine la actualización en curso"""
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,45 @@
+import re
+import threading
+from collections import OrderedDict
+
+class EmbeddingCache:
+    def __init__(self, max_size=256):
+        self.max_size = max_size
+        self._cache = OrderedDict()
+        # La consultan los hilos que piden embeddings y la rellena el hilo de lotes
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def normalize_text(text):
+        """Normaliza el texto para que variaciones triviales compartan entrada"""
+        return re.sub(r'\s+', ' ', text.strip().lower())
+
+    def get(self, text):
+        """Devuelve el embedding cacheado o None, actualizando el orden LRU"""
+        key = self.normalize_text(text)
+        with self._lock:
+            embedding = self._cache.get(key)
+            if embedding is None:
+                self.misses += 1
+                return None
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return embedding
+
+    def put(self, text, embedding):
+        """Guarda un embedding expulsando el menos usado si se supera el tamaño"""
+        if self.max_size <= 0:
+            return
+        key = self.normalize_text(text)
+        # Se comparte entre llamadas, así que no debe modificarse
+        embedding.setflags(write=False)
+        with self._lock:
+            self._cache[key] = embedding
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_size:
+                self._cache.popitem(last=False)
+
+    def __len__(self):
+        return len(self._cache)
@@ -0,0 +1,60 @@
+import threading
+import time
+
+class LazyEmbeddingModel:
+    def __init__(self, model_name, logger=None):
+        self.model_name = model_name
+        self.logger = logger
+        self._model = None
+        self._error = None
+        self._ready = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Empieza a cargar el modelo en segundo plano sin bloquear el arranque"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._load, daemon=True)
+            self._thread.start()
+        return self
+
+    def _load(self):
+        """Importa torch/sentence-transformers, carga el modelo y lo calienta"""
+        try:
+            start_time = time.time()
+            # La importación se hace aquí para no pagar el coste de torch en el hilo principal
+            from sentence_transformers import SentenceTransformer
+            model = SentenceTransformer(self.model_name)
+            load_ms = (time.time() - start_time) * 1000
+
+            # La primera inferencia es mucho más lenta; se hace antes de que llegue una consulta
+            warmup_start = time.time()
+            model.encode("hola")
+            warmup_ms = (time.time() - warmup_start) * 1000
+
+            self._model = model
+            if self.logger:
+                self.logger.log_startup_timing("embedding_model", load_ms)
+                self.logger.log_startup_timing("embedding_warmup", warmup_ms)
+        except Exception as e:
+            self._error = e
+            if self.logger:
+                self.logger.log_error("embedding_model", f"Error al cargar el modelo: {str(e)}")
+        finally:
+            self._ready.set()
+
+    @property
+    def is_ready(self):
+        return self._ready.is_set() and self._model is not None
+
+    def wait(self, timeout=None):
+        """Espera a que el modelo esté cargado; solo bloquea si aún no lo está"""
+        self.start()
+        if not self._ready.wait(timeout):
+            raise TimeoutError("El modelo de embeddings aún no está cargado")
+        if self._model is None:
+            raise RuntimeError(f"No se pudo cargar el modelo de embeddings: {self._error}")
+        return self._model
+
+    def encode(self, sentences, **kwargs):
+        """Codifica igual que SentenceTransformer.encode, esperando a la carga si hace falta"""
+        return self.wait().encode(sentences, **kwargs)
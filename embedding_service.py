@@ -0,0 +1,140 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+import numpy as np
+
+class EmbeddingService:
+    def __init__(self, model, cache=None, metrics=None, batch_window_ms=5, max_batch_size=32, metrics_interval=30,
+                 timeout=30):
+        self.model = model
+        self.cache = cache
+        self.metrics = metrics
+        self.batch_window = batch_window_ms / 1000
+        self.max_batch_size = max_batch_size
+        # Espera máxima por defecto de encode()/encode_many() (incluye la primera carga del modelo)
+        self.timeout = timeout
+        # Los aciertos y fallos los cuenta la caché; se vuelcan a las métricas cada metrics_interval s
+        self.metrics_interval = metrics_interval
+        self._flushed_hits = 0
+        self._flushed_misses = 0
+        self._last_flush = time.time()
+        self._metrics_lock = threading.Lock()
+        self._queue = queue.Queue()
+        # Ordena submit() frente a stop(): nada se encola detrás del centinela
+        self._submit_lock = threading.Lock()
+        self._running = True
+        self._thread = threading.Thread(target=self._worker, daemon=True)
+        self._thread.start()
+
+    def submit(self, text):
+        """Encola un texto y devuelve un Future con su embedding normalizado"""
+        future = Future()
+        if self.cache is not None:
+            embedding = self.cache.get(text)
+            if embedding is not None:
+                future.set_result(embedding)
+                return future
+        with self._submit_lock:
+            if self._running:
+                self._queue.put((text, future))
+                return future
+        # Detenido el servicio se codifica en el hilo que llama
+        self._encode_batch([(text, future)])
+        return future
+
+    def encode(self, text, timeout=None):
+        """Obtiene el embedding de un texto esperando a su lote (timeout None = self.timeout)"""
+        return self.submit(text).result(self.timeout if timeout is None else timeout)
+
+    def encode_many(self, texts, timeout=None):
+        """Obtiene los embeddings de varios textos, que viajan en el mismo lote"""
+        futures = [self.submit(text) for text in texts]
+        timeout = self.timeout if timeout is None else timeout
+        return [future.result(timeout) for future in futures]
+
+    def flush_metrics(self):
+        """Registra los aciertos y fallos de la caché acumulados desde el último volcado"""
+        with self._metrics_lock:
+            self._last_flush = time.time()
+            if self.metrics is None or self.cache is None:
+                return
+            hits, misses = self.cache.hits, self.cache.misses
+            if hits == self._flushed_hits and misses == self._flushed_misses:
+                return
+            self.metrics.record_cache_counts("embeddings", hits - self._flushed_hits, misses - self._flushed_misses)
+            self._flushed_hits, self._flushed_misses = hits, misses
+
+    def _collect_batch(self):
+        """Espera una petición y agrupa las que lleguen dentro de la ventana"""
+        try:
+            # Sin peticiones se despierta igualmente para volcar las métricas
+            batch = [self._queue.get(timeout=self.metrics_interval)]
+        except queue.Empty:
+            return []
+        deadline = time.time() + self.batch_window
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return [item for item in batch if item is not None]
+
+    def _worker(self):
+        """Procesa los lotes con una sola llamada a encode(list)"""
+        while self._running:
+            batch = self._collect_batch()
+            if time.time() - self._last_flush >= self.metrics_interval:
+                self.flush_metrics()
+            if batch:
+                self._encode_batch(batch)
+        # Lo encolado antes de stop() también se atiende
+        remaining = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                remaining.append(item)
+        if remaining:
+            self._encode_batch(remaining)
+
+    def _encode_batch(self, batch):
+        """Codifica un lote de (texto, Future) y resuelve los Futures"""
+        # Textos repetidos dentro del lote se codifican una sola vez
+        pending = {}
+        for text, future in batch:
+            pending.setdefault(text, []).append(future)
+        texts = list(pending)
+
+        try:
+            embeddings = np.asarray(self.model.encode(texts, batch_size=len(texts)), dtype=np.float32)
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            embeddings = embeddings / norms
+        except Exception as e:
+            for futures in pending.values():
+                for future in futures:
+                    future.set_exception(e)
+            return
+
+        for text, embedding in zip(texts, embeddings):
+            embedding = embedding.copy()
+            if self.cache is not None:
+                self.cache.put(text, embedding)
+            for future in pending[text]:
+                future.set_result(embedding)
+
+    def stop(self):
+        """Detiene el hilo de trabajo y vuelca las métricas pendientes
+
+        Después de stop() encode() sigue funcionando, de forma síncrona.
+        """
+        with self._submit_lock:
+            self._running = False
+            self._queue.put(None)
+        self.flush_metrics()
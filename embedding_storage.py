@@ -0,0 +1,182 @@
+import json
+import os
+import numpy as np
+
+class EmbeddingStorage:
+    NAMESPACE = "ai_memory"
+
+    def __init__(self, storage_path, store, compaction_threshold=0.5):
+        self.storage_path = storage_path
+        self.store = store
+        self.compaction_threshold = compaction_threshold
+        # Filas escritas en disco (vivas y descartadas) desde la última compactación
+        self.total_rows = 0
+        # Primera fila del fichero que se cargó en memoria
+        self.start_row = 0
+        if not store.has_namespace(self.NAMESPACE):
+            self._migrate_log_files()
+        # Metadatos (dimensión, generación y entradas) en el almacén compartido con journal
+        self.meta = store.namespace(self.NAMESPACE, {'dimension': None, 'generation': 0, 'entries': []})
+
+    @property
+    def dimension(self):
+        return self.meta['dimension']
+
+    @property
+    def generation(self):
+        return self.meta['generation']
+
+    @property
+    def consolidated_rows(self):
+        """Filas del fichero que la consolidación ya comparó entre sí"""
+        return self.meta.get('consolidated_rows', 0)
+
+    def set_consolidated_rows(self, rows):
+        if rows != self.consolidated_rows:
+            self.store.set(self.NAMESPACE, ['consolidated_rows'], int(rows))
+
+    def _migrate_log_files(self):
+        """Importa el antiguo meta.json + memories.N.jsonl al almacén compartido"""
+        meta_file = os.path.join(self.storage_path, 'meta.json')
+        if not os.path.exists(meta_file):
+            return
+        with open(meta_file, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        generation = meta.get('generation', 0)
+        log_file = os.path.join(self.storage_path, f'memories.{generation}.jsonl')
+        entries = []
+        if os.path.exists(log_file):
+            with open(log_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entries.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        break
+        self.store.set(self.NAMESPACE, [], {
+            'dimension': meta.get('dimension'),
+            'generation': generation,
+            'entries': entries
+        })
+        self.store.checkpoint()
+        os.remove(meta_file)
+        if os.path.exists(log_file):
+            os.remove(log_file)
+
+    def _embeddings_file(self, generation=None):
+        generation = self.generation if generation is None else generation
+        return os.path.join(self.storage_path, f'embeddings.{generation}.f32')
+
+    def exists(self):
+        """Indica si ya hay memoria guardada en formato binario"""
+        return self.dimension is not None
+
+    def load(self, max_items=None):
+        """Mapea el fichero de embeddings y devuelve las entradas del almacén"""
+        if not self.exists():
+            return [], None
+
+        entries = self.meta['entries']
+        rows = 0
+        if os.path.exists(self._embeddings_file()):
+            rows = os.path.getsize(self._embeddings_file()) // (4 * self.dimension)
+        # Si el proceso murió entre las dos escrituras nos quedamos con las filas completas
+        self.total_rows = min(rows, len(entries))
+        if rows > self.total_rows:
+            # Filas sin entrada en el journal: se recortan para que la siguiente quede alineada
+            with open(self._embeddings_file(), 'r+b') as f:
+                f.truncate(self.total_rows * self.dimension * 4)
+        if self.total_rows == 0:
+            return [], None
+
+        matrix = np.memmap(self._embeddings_file(), dtype=np.float32, mode='r',
+                           shape=(self.total_rows, self.dimension))
+        start = 0
+        if max_items and self.total_rows > max_items:
+            start = self.total_rows - max_items
+        self.start_row = start
+        return entries[start:self.total_rows], matrix[start:]
+
+    def append(self, entry, embedding):
+        """Añade una memoria al final del fichero y del journal sin reescribirlos"""
+        vector = np.asarray(embedding, dtype=np.float32).reshape(-1)
+        if not self.exists():
+            os.makedirs(self.storage_path, exist_ok=True)
+            self.store.set(self.NAMESPACE, ['dimension'], int(vector.shape[0]))
+
+        # Entradas del journal sin embedding (cierre inesperado) se descartan para no desalinear filas
+        if len(self.meta['entries']) > self.total_rows:
+            self.store.set(self.NAMESPACE, ['entries'], self.meta['entries'][:self.total_rows])
+
+        # Se escribe en la fila total_rows aunque el fichero tenga restos de una escritura a medias
+        mode = 'r+b' if os.path.exists(self._embeddings_file()) else 'wb'
+        with open(self._embeddings_file(), mode) as f:
+            f.seek(self.total_rows * vector.shape[0] * 4)
+            f.write(vector.tobytes())
+        self.store.append(self.NAMESPACE, ['entries'], entry)
+        self.total_rows += 1
+
+    def index_file(self):
+        """Ruta del índice ANN persistido junto a los embeddings"""
+        return os.path.join(self.storage_path, 'ivf_index.npz')
+
+    def needs_compaction(self, live_rows):
+        """Indica si la proporción de filas descartadas supera el umbral"""
+        if self.total_rows == 0:
+            return False
+        dead_rows = self.total_rows - live_rows
+        return dead_rows / self.total_rows > self.compaction_threshold
+
+    def read_rows(self, rows):
+        """Lee del fichero los embeddings float32 exactos de las filas indicadas"""
+        rows = np.asarray(rows, dtype=np.int64)
+        if rows.size == 0 or self.total_rows == 0:
+            return np.zeros((rows.size, self.dimension or 0), dtype=np.float32)
+        matrix = np.memmap(self._embeddings_file(), dtype=np.float32, mode='r',
+                           shape=(self.total_rows, self.dimension))
+        return np.array(matrix[rows])
+
+    def compact(self, entries, file_rows=None, matrix=None, chunk_size=8192):
+        """Reescribe solo las memorias vivas en una nueva generación del fichero
+
+        Las filas se copian del fichero actual (file_rows) para no perder precisión
+        cuando la memoria en RAM está cuantizada; matrix sirve para migraciones.
+        """
+        old_generation = self.generation
+        # El punto de consolidación se traduce a la numeración nueva (una migración empieza de cero)
+        consolidated = 0
+        if matrix is None:
+            consolidated = int(np.searchsorted(np.asarray(file_rows), self.consolidated_rows))
+        os.makedirs(self.storage_path, exist_ok=True)
+        new_file = self._embeddings_file(old_generation + 1)
+        if matrix is not None:
+            dimension = int(matrix.shape[1]) if matrix.shape[0] else self.dimension
+            with open(new_file, 'wb') as f:
+                for start in range(0, matrix.shape[0], chunk_size):
+                    np.ascontiguousarray(matrix[start:start + chunk_size], dtype=np.float32).tofile(f)
+        else:
+            dimension = self.dimension
+            file_rows = np.asarray(file_rows, dtype=np.int64)
+            with open(new_file, 'wb') as f:
+                for start in range(0, file_rows.shape[0], chunk_size):
+                    self.read_rows(file_rows[start:start + chunk_size]).tofile(f)
+
+        # Una única operación del journal cambia generación y entradas a la vez
+        self.store.set(self.NAMESPACE, [], {
+            'dimension': dimension,
+            'generation': old_generation + 1,
+            'entries': list(entries),
+            'consolidated_rows': consolidated
+        })
+        # El cambio de generación debe estar en disco antes de borrar el fichero anterior
+        self.store.flush()
+        self.meta = self.store.namespace(self.NAMESPACE)
+        self.total_rows = len(entries)
+        self.start_row = 0
+
+        old_file = self._embeddings_file(old_generation)
+        try:
+            if os.path.exists(old_file):
+                os.remove(old_file)
+        except OSError:
+            # En Windows el fichero puede seguir mapeado; dejarlo huérfano no afecta a la carga
+            pass
@@ -0,0 +1,136 @@
+import re
+import threading
+import numpy as np
+
+EMOTIONS = ("feliz", "triste", "enojado", "sorprendido", "neutral")
+
+# Palabras clave en español e inglés como expresiones regulares que tienen que coincidir
+# con palabras completas: las terminaciones se enumeran para que "content" no encaje en
+# "contenido" ni "miss" en "mission"
+LEXICON = {
+    "feliz": (
+        r"feli(z|ces|cidad)", r"alegr(e|es|ía|ías|o|a|an|ado|ada)", r"content[oa]s?", r"genial(es)?",
+        r"encant(a|an|o|ado|ada|ador|adora)", r"fantástic[oa]s?", r"maravill(a|as|oso|osa)",
+        r"estupend[oa]s?", r"guay", r"gracias", r"ilusi(ón|ona|onado|onada)", r"divert(ido|ida|idos|idas|irme)",
+        r"me gusta", r"happy", r"glad", r"great", r"awesome", r"lov(e|ed|ing)", r"wonderful",
+        r"excited", r"thank(s| you)?", r"amazing"
+    ),
+    "triste": (
+        r"trist(e|es|eza)", r"deprim(ido|ida|e|en)", r"llor(o|a|ar|ando|ado)", r"soledad", r"pena",
+        r"melancolía", r"desanimad[oa]", r"echo de menos", r"sad", r"lonely", r"cr(y|ies|ied|ying)",
+        r"depress(ed|ing|ion)", r"miss(ed|ing)?", r"upset", r"hurt(s|ing)?", r"unhappy", r"grief"
+    ),
+    "enojado": (
+        r"enfad(o|ado|ada|a|an|ando)", r"enojad[oa]", r"cabre(a|an|ado|ada|ando|o)", r"hart[oa]s?", r"odi(o|a|as|an|ar|amos)",
+        r"molest(a|an|as|ar|o|ado|ada|ando|arme)", r"furios[oa]", r"rabia", r"idiotas?", r"maldit[oa]s?",
+        r"angry", r"hat(e|es|ed)", r"annoy(ed|ing|s)?", r"furious", r"pissed", r"sick of", r"fed up", r"stupid"
+    ),
+    "sorprendido": (
+        r"sorpren(de|den|dido|dida|dente|sa)", r"increíble", r"no me lo creo", r"en serio", r"vaya", r"guau",
+        r"wow", r"impresionante", r"surpris(e|ed|ing)", r"unbelievable", r"no way", r"really\?",
+        r"seriously", r"whoa", r"shock(ed|ing)?", r"omg"
+    ),
+    "neutral": ()
+}
+NEGATIONS = {"no", "ni", "nunca", "jamás", "not", "never", "don't", "isn't"}
+INTENSIFIERS = {"muy", "mucho", "muchísimo", "demasiado", "tan", "super", "súper", "very", "really", "so", "too"}
+WORD_PATTERN = re.compile(r"[\wáéíóúüñ']+", re.UNICODE)
+
+# Frases de ejemplo cuyos embeddings promediados forman el centroide de cada emoción
+PROTOTYPES = {
+    "feliz": [
+        "Estoy muy contento hoy", "Qué alegría, me ha salido todo bien", "Me encanta esta canción",
+        "Gracias, eres genial", "I'm so happy right now", "This is the best day ever", "I love it, thank you"
+    ],
+    "triste": [
+        "Me siento muy triste", "Hoy estoy de bajón y no tengo ganas de nada", "Echo de menos a mi familia",
+        "Se murió mi perro", "I feel really sad today", "I miss my friends so much", "Nothing is going right and I feel down"
+    ],
+    "enojado": [
+        "Estoy harto de todo esto", "Me tiene muy enfadado", "Qué rabia me da", "Deja de molestarme",
+        "I'm so angry right now", "This is driving me crazy", "I hate when that happens"
+    ],
+    "sorprendido": [
+        "¿En serio? No me lo puedo creer", "Vaya, no me lo esperaba", "¡Qué sorpresa!", "Increíble, ¿cómo has hecho eso?",
+        "Wow, I didn't expect that", "No way, really?", "That's unbelievable"
+    ],
+    "neutral": [
+        "¿Qué hora es?", "Pon un temporizador de cinco minutos", "¿Qué tiempo hace mañana?", "Apunta que tengo que comprar pan",
+        "What time is it?", "Set a timer for ten minutes", "Tell me about the weather"
+    ]
+}
+
+class LocalEmotionClassifier:
+    def __init__(self, encode_many=None, lexicon=LEXICON, prototypes=PROTOTYPES, lexicon_weight=0.4, temperature=0.05):
+        # encode_many(textos) -> embeddings normalizados; sin él solo se usa el léxico
+        self.encode_many = encode_many
+        self.lexicon = lexicon
+        # Una expresión por emoción; los límites de palabra evitan coincidencias dentro de otras
+        self._patterns = {
+            label: re.compile(r"(?<!\w)(?:" + "|".join(stems) + r")(?!\w)")
+            for label, stems in lexicon.items() if stems
+        }
+        self.prototypes = prototypes
+        # Peso del léxico frente a la similitud con los centroides cuando hay palabras clave
+        self.lexicon_weight = lexicon_weight
+        # Temperatura del softmax sobre similitudes coseno (más baja = más decidido)
+        self.temperature = temperature
+        self.labels = list(EMOTIONS)
+        self._centroids = None
+        self._lock = threading.Lock()
+
+    def _get_centroids(self):
+        """Calcula una sola vez los centroides (el modelo puede seguir cargando al arrancar)"""
+        if self._centroids is None and self.encode_many is not None:
+            with self._lock:
+                if self._centroids is None:
+                    centroids = []
+                    for label in self.labels:
+                        embeddings = np.asarray(self.encode_many(self.prototypes[label]), dtype=np.float32)
+                        centroid = embeddings.mean(axis=0)
+                        centroids.append(centroid / np.linalg.norm(centroid))
+                    self._centroids = np.stack(centroids)
+        return self._centroids
+
+    def _lexicon_hits(self, text):
+        """Palabras clave por emoción, ignorando las que van justo detrás de una negación"""
+        lowered = text.lower()
+        hits = {label: [] for label in self.labels}
+        for label, pattern in self._patterns.items():
+            for match in pattern.finditer(lowered):
+                previous = WORD_PATTERN.findall(lowered[:match.start()])[-2:]
+                if not any(word in NEGATIONS for word in previous):
+                    hits[label].append(match.group())
+        intensifiers = sum(word in INTENSIFIERS for word in WORD_PATTERN.findall(lowered))
+        return hits, intensifiers + lowered.count("!")
+
+    def classify(self, text, embedding=None):
+        """Devuelve (análisis con el formato de analyze_emotion, confianza entre 0 y 1)"""
+        hits, intensifiers = self._lexicon_hits(text)
+        counts = np.array([len(hits[label]) for label in self.labels], dtype=np.float32)
+
+        centroids = self._get_centroids()
+        if centroids is not None:
+            if embedding is None:
+                embedding = self.encode_many([text])[0]
+            similarities = centroids @ np.asarray(embedding, dtype=np.float32)
+            scores = np.exp((similarities - similarities.max()) / self.temperature)
+            probabilities = scores / scores.sum()
+            if counts.sum() > 0:
+                probabilities = (1 - self.lexicon_weight) * probabilities + self.lexicon_weight * counts / counts.sum()
+        elif counts.sum() > 0:
+            probabilities = counts / counts.sum()
+        else:
+            # Sin embeddings ni palabras clave no hay base para decidir
+            return {"emotion": "neutral", "intensity": 0.5, "keywords": [], "context": "local"}, 0.0
+
+        best = int(np.argmax(probabilities))
+        emotion = self.labels[best]
+        confidence = float(probabilities[best])
+        intensity = 0.5 if emotion == "neutral" else min(1.0, 0.4 + 0.4 * confidence + 0.1 * intensifiers)
+        return {
+            "emotion": emotion,
+            "intensity": round(intensity, 2),
+            "keywords": hits[emotion],
+            "context": "local"
+        }, confidence
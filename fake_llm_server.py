@@ -0,0 +1,259 @@
+"""Servidor local que imita la API de chat completions de OpenAI
+
+Sirve POST /v1/chat/completions (con y sin streaming) con respuestas
+guionizadas, latencias aleatorias y una tasa de errores configurable, para
+medir y probar el pipeline sin red ni coste. GET /stats devuelve los contadores.
+
+Uso: python fake_llm_server.py [--port 8765] [--script guion.json]
+         [--latency lognormal:-1.5,0.5] [--token-delay 0.02] [--error-rate 0.05]
+
+El guion es una lista de reglas que se prueban en orden contra el texto de
+todos los mensajes:
+    {"match": "regex", "content": "texto" | "responses": [...],
+     "latency": "spec", "token_delay": 0.02, "error_rate": 0.1, "error_status": 429}
+En content, {user} se sustituye por el último mensaje del usuario y {n} por el
+número de petición.
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Respuestas por defecto con el formato que esperan AIManager y SecondaryAIManager
+DEFAULT_SCRIPT = [
+    {"match": "analizador de emociones", "content": json.dumps(
+        {"emotion": "neutral", "intensity": 0.5, "keywords": [], "context": "prueba"})},
+    {"match": "resumidor de conversaciones", "content": "El usuario ha charlado con Elenia sobre temas cotidianos."},
+    {"match": "categorizador de memorias", "content": json.dumps(
+        {"category": "temporal", "importance": 0.5, "tags": ["prueba"], "reason": "respuesta simulada"})},
+    {"match": "analizador de contexto", "content": json.dumps(
+        {"topic": "conversación", "user_emotion": "neutral", "patterns": [], "suggestions": []})},
+    {"match": "analizador de conversaciones", "content": json.dumps({
+        "emotion": {"emotion": "neutral", "intensity": 0.5, "keywords": [], "context": "prueba"},
+        "context": {"topic": "conversación", "user_emotion": "neutral", "patterns": [], "suggestions": []},
+        "memory": {"category": "temporal", "importance": 0.5, "tags": ["prueba"], "reason": "respuesta simulada"}
+    })},
+    {"match": "", "content": "Respuesta de prueba número {n}. Me has dicho: {user}"}
+]
+TOKEN_PATTERN = re.compile(r"\S+\s*")
+
+def parse_latency(spec):
+    """Convierte "fixed:0.2", "uniform:0.1,0.5", "normal:0.3,0.05", "lognormal:mu,sigma"
+    o "exponential:media" (en segundos) en una función que devuelve una muestra"""
+    if spec is None:
+        return lambda rng: 0.0
+    if isinstance(spec, (int, float)):
+        return lambda rng: float(spec)
+    kind, _, params = spec.partition(":")
+    values = [float(value) for value in params.split(",") if value]
+    samplers = {
+        "fixed": lambda rng: values[0],
+        "uniform": lambda rng: rng.uniform(values[0], values[1]),
+        "normal": lambda rng: max(0.0, rng.gauss(values[0], values[1])),
+        "lognormal": lambda rng: rng.lognormvariate(values[0], values[1]),
+        "exponential": lambda rng: rng.expovariate(1 / values[0])
+    }
+    if kind not in samplers:
+        raise ValueError(f"Distribución de latencia desconocida: {kind}")
+    return samplers[kind]
+
+class FakeLLMServer:
+    def __init__(self, host="127.0.0.1", port=0, script=None, latency=None, token_delay=0.0,
+                 error_rate=0.0, error_status=500, seed=None):
+        self.script = [dict(rule) for rule in (script if script is not None else DEFAULT_SCRIPT)]
+        for rule in self.script:
+            rule["_pattern"] = re.compile(rule.get("match", ""), re.IGNORECASE)
+            rule["_latency"] = parse_latency(rule["latency"]) if "latency" in rule else None
+            rule["_served"] = 0
+        # Tiempo hasta el primer byte de cada respuesta
+        self.latency = parse_latency(latency)
+        # Pausa entre fragmentos en streaming
+        self.token_delay = token_delay
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "streams": 0, "errors": 0, "in_flight": 0, "max_in_flight": 0, "by_model": {}}
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        """Atiende peticiones en un hilo en segundo plano y devuelve el propio servidor"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+            self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self._httpd.serve_forever()
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def _sample(self, sampler):
+        with self._lock:
+            return sampler(self._rng)
+
+    def _plan(self, request):
+        """Decide respuesta, latencia y error de una petición según el guion"""
+        messages = request.get("messages", [])
+        text = "\n".join(str(message.get("content", "")) for message in messages)
+        user = next((message.get("content", "") for message in reversed(messages) if message.get("role") == "user"), "")
+        rule = next((rule for rule in self.script if rule["_pattern"].search(text)), {"content": ""})
+        with self._lock:
+            self.stats["requests"] += 1
+            number = self.stats["requests"]
+            model = request.get("model", "")
+            self.stats["by_model"][model] = self.stats["by_model"].get(model, 0) + 1
+            served = rule.get("_served", 0)
+            rule["_served"] = served + 1
+            failed = self._rng.random() < rule.get("error_rate", self.error_rate)
+        if "responses" in rule:
+            content = rule["responses"][served % len(rule["responses"])]
+        else:
+            content = rule.get("content", "")
+        content = content.replace("{user}", user).replace("{n}", str(number))
+        return {
+            "content": content,
+            "latency": self._sample(rule.get("_latency") or self.latency),
+            "token_delay": rule.get("token_delay", self.token_delay),
+            "error_status": rule.get("error_status", self.error_status) if failed else None,
+            "prompt_tokens": len(TOKEN_PATTERN.findall(text)),
+            "number": number
+        }
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, status, payload):
+                body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _send_chunk(self, data):
+                body = data.encode("utf-8")
+                self.wfile.write(f"{len(body):x}\r\n".encode("ascii") + body + b"\r\n")
+                self.wfile.flush()
+
+            def do_GET(self):
+                if self.path.rstrip("/").endswith("/stats"):
+                    with server._lock:
+                        self._send_json(200, server.stats)
+                else:
+                    self._send_json(404, {"error": {"message": "No encontrado", "type": "invalid_request_error"}})
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                request = json.loads(self.rfile.read(length) or b"{}")
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    self._send_json(404, {"error": {"message": "No encontrado", "type": "invalid_request_error"}})
+                    return
+                with server._lock:
+                    server.stats["in_flight"] += 1
+                    server.stats["max_in_flight"] = max(server.stats["max_in_flight"], server.stats["in_flight"])
+                try:
+                    self._complete(request)
+                finally:
+                    with server._lock:
+                        server.stats["in_flight"] -= 1
+
+            def _complete(self, request):
+                plan = server._plan(request)
+                time.sleep(plan["latency"])
+                if plan["error_status"]:
+                    with server._lock:
+                        server.stats["errors"] += 1
+                    self._send_json(plan["error_status"], {"error": {
+                        "message": "Error simulado por el servidor de pruebas",
+                        "type": "rate_limit_error" if plan["error_status"] == 429 else "server_error",
+                        "code": None
+                    }})
+                    return
+
+                completion_id = f"chatcmpl-fake-{plan['number']}"
+                model = request.get("model", "fake")
+                created = int(time.time())
+                pieces = TOKEN_PATTERN.findall(plan["content"]) or [plan["content"]]
+                usage = {
+                    "prompt_tokens": plan["prompt_tokens"],
+                    "completion_tokens": len(pieces),
+                    "total_tokens": plan["prompt_tokens"] + len(pieces)
+                }
+                if not request.get("stream"):
+                    self._send_json(200, {
+                        "id": completion_id, "object": "chat.completion", "created": created, "model": model,
+                        "choices": [{"index": 0, "message": {"role": "assistant", "content": plan["content"]},
+                                     "finish_reason": "stop"}],
+                        "usage": usage
+                    })
+                    return
+
+                with server._lock:
+                    server.stats["streams"] += 1
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for position, piece in enumerate(pieces):
+                    if position and plan["token_delay"]:
+                        time.sleep(plan["token_delay"])
+                    delta = {"role": "assistant", "content": piece} if position == 0 else {"content": piece}
+                    self._send_chunk("data: " + json.dumps({
+                        "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                        "choices": [{"index": 0, "delta": delta, "finish_reason": None}]
+                    }, ensure_ascii=False) + "\n\n")
+                self._send_chunk("data: " + json.dumps({
+                    "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                    "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]
+                }) + "\n\n")
+                self._send_chunk("data: [DONE]\n\n")
+                self.wfile.write(b"0\r\n\r\n")
+                self.wfile.flush()
+
+        return Handler
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor local de chat completions para pruebas")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--script", help="Fichero JSON con las reglas de respuesta")
+    parser.add_argument("--latency", help="Distribución del tiempo hasta el primer byte, p. ej. lognormal:-1.5,0.5")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="Segundos entre fragmentos en streaming")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Proporción de peticiones que fallan")
+    parser.add_argument("--error-status", type=int, default=500)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    script = None
+    if args.script:
+        with open(args.script, "r", encoding="utf-8") as f:
+            script = json.load(f)
+    server = FakeLLMServer(args.host, args.port, script, args.latency, args.token_delay,
+                           args.error_rate, args.error_status, args.seed)
+    print(f"Servidor de pruebas escuchando en {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+import json
+import os
+import threading
+import httpx
+from openai import OpenAI
+import constants
+from .fake_llm_server import FakeLLMServer
+
+class LLMClientRegistry:
+    # Variable de entorno con la API key de cada servicio
+    SERVICE_KEYS = {
+        "main": "OPENAI_API_KEY",
+        "emotion": "OPENAI_API_KEY_S1",
+        "context": "OPENAI_API_KEY_S1",
+        "summarizer": "OPENAI_API_KEY_S2",
+        "categorizer": "OPENAI_API_KEY_S3"
+    }
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, base_url=None, timeout=30.0, connect_timeout=5.0, max_retries=2,
+                 max_connections=10, max_keepalive_connections=5, keepalive_expiry=60.0,
+                 max_concurrency=4, fake_server=None):
+        # Con un servidor de pruebas todas las peticiones van a él en lugar de a la API real
+        self.fake_server = fake_server
+        self.base_url = fake_server.base_url if fake_server else base_url
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self.max_retries = max_retries
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry
+        )
+        self.max_concurrency = max_concurrency
+        self._lock = threading.Lock()
+        # Un cliente (y su pool de conexiones) por API key; los servicios con la misma key lo comparten
+        self._clients = {}
+        # Llamadas simultáneas permitidas por servicio
+        self._semaphores = {}
+
+    @classmethod
+    def shared(cls):
+        """Devuelve el registro único configurado desde constants"""
+        with cls._instance_lock:
+            if cls._instance is None:
+                fake_server = None
+                if constants.LLM_BACKEND == "fake":
+                    fake_server = cls._start_fake_server()
+                cls._instance = cls(
+                    base_url=os.getenv("OPENAI_API_BASE") or constants.OPENAI_API_BASE,
+                    timeout=constants.LLM_TIMEOUT,
+                    connect_timeout=constants.LLM_CONNECT_TIMEOUT,
+                    max_retries=constants.LLM_MAX_RETRIES,
+                    max_connections=constants.LLM_MAX_CONNECTIONS,
+                    max_keepalive_connections=constants.LLM_MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=constants.LLM_KEEPALIVE_EXPIRY,
+                    max_concurrency=constants.LLM_MAX_CONCURRENCY,
+                    fake_server=fake_server
+                )
+            return cls._instance
+
+    @staticmethod
+    def _start_fake_server():
+        """Arranca en segundo plano el servidor de pruebas configurado en constants"""
+        script = None
+        if constants.FAKE_LLM_SCRIPT:
+            with open(constants.FAKE_LLM_SCRIPT, 'r', encoding='utf-8') as f:
+                script = json.load(f)
+        return FakeLLMServer(
+            script=script,
+            latency=constants.FAKE_LLM_LATENCY,
+            token_delay=constants.FAKE_LLM_TOKEN_DELAY,
+            error_rate=constants.FAKE_LLM_ERROR_RATE
+        ).start()
+
+    def api_key(self, service):
+        """API key de un servicio; si falta se usa la principal"""
+        key = os.getenv(self.SERVICE_KEYS.get(service, "OPENAI_API_KEY")) or os.getenv("OPENAI_API_KEY")
+        if not key and self.fake_server:
+            # El servidor de pruebas no comprueba la key, pero el cliente necesita una
+            return "fake"
+        return key
+
+    def client(self, service):
+        """Devuelve el cliente de larga duración asociado a la key del servicio"""
+        key = self.api_key(service)
+        with self._lock:
+            if key not in self._clients:
+                self._clients[key] = OpenAI(
+                    api_key=key,
+                    base_url=self.base_url,
+                    timeout=self.timeout,
+                    max_retries=self.max_retries,
+                    # Conexiones keep-alive reutilizadas: sin handshake TLS en cada petición
+                    http_client=httpx.Client(limits=self.limits, timeout=self.timeout)
+                )
+            return self._clients[key]
+
+    def _semaphore(self, service):
+        with self._lock:
+            if service not in self._semaphores:
+                self._semaphores[service] = threading.BoundedSemaphore(self.max_concurrency)
+            return self._semaphores[service]
+
+    def create(self, service, **kwargs):
+        """Pide una respuesta completa respetando el límite de concurrencia del servicio"""
+        client = self.client(service)
+        with self._semaphore(service):
+            return client.chat.completions.create(**kwargs)
+
+    def stream(self, service, **kwargs):
+        """Pide una respuesta en streaming; el hueco de concurrencia se libera al agotar el stream"""
+        client = self.client(service)
+        with self._semaphore(service):
+            stream = client.chat.completions.create(stream=True, **kwargs)
+            try:
+                for chunk in stream:
+                    yield chunk
+            finally:
+                # Cierra la respuesta HTTP para devolver la conexión al pool aunque se corte antes
+                stream.response.close()
+
+    def close(self):
+        """Cierra los pools de conexiones de todos los clientes"""
+        with self._lock:
+            for client in self._clients.values():
+                client.close()
+            self._clients.clear()
+        if self.fake_server:
+            self.fake_server.stop()
+            self.fake_server = None
@@ -74,6 +74,10 @@ class LoggerManager:
         """Registra cambios en la personalidad"""
         self.logger.debug(f"Cambio de personalidad - Emoción: {emotion}, Valor: {value}")
 
+    def log_startup_timing(self, component, time_ms):
+        """Registra el tiempo de arranque de un componente"""
+        self.logger.info(f"Arranque - {component}: {time_ms:.0f} ms")
+
     def log_conversation(self, user_input, bot_response):
         """Registra una conversación"""
         self.logger.info(f"Usuario: {user_input}")
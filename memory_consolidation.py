@@ -0,0 +1,133 @@
+from datetime import datetime
+import numpy as np
+
+def retention_scores(importance, age_days, access_count, weights=(0.6, 0.3, 0.1), half_life_days=7.0):
+    """Puntuación de retención: combina importancia, recencia y número de accesos"""
+    importance = np.asarray(importance, dtype=np.float32)
+    recency = 0.5 ** (np.asarray(age_days, dtype=np.float32) / half_life_days)
+    access = np.log1p(np.asarray(access_count, dtype=np.float32))
+    if access.size and access.max() > 0:
+        access = access / access.max()
+    w_importance, w_recency, w_access = weights
+    return w_importance * importance + w_recency * recency + w_access * access
+
+def age_in_days(timestamps, now=None):
+    """Convierte timestamps ISO en antigüedad en días"""
+    now = now or datetime.now()
+    ages = []
+    for timestamp in timestamps:
+        try:
+            ages.append((now - datetime.fromisoformat(timestamp)).total_seconds() / 86400)
+        except (TypeError, ValueError):
+            ages.append(0.0)
+    return np.asarray(ages, dtype=np.float32)
+
+def combine_importance(a, b):
+    """Importancia combinada de dos memorias fusionadas (nunca supera 1.0)"""
+    return float(min(1.0, 1 - (1 - a) * (1 - b)))
+
+class MemoryConsolidator:
+    def __init__(self, duplicate_threshold=0.95, weights=(0.6, 0.3, 0.1), half_life_days=7.0, block_size=256):
+        self.duplicate_threshold = duplicate_threshold
+        self.weights = weights
+        self.half_life_days = half_life_days
+        self.block_size = block_size
+        # Las memorias por debajo de esta posición ya se compararon entre sí (se guarda con la memoria)
+        self.checked_rows = 0
+
+    def _merge(self, memory, keep, drop):
+        """Fusiona drop en keep sumando accesos y combinando importancias"""
+        entry = memory.entries[keep]
+        other = memory.entries[drop]
+        merged = dict(entry)
+        merged['importance'] = combine_importance(entry.get('importance', 0.5), other.get('importance', 0.5))
+        merged['timestamp'] = max(entry.get('timestamp', ''), other.get('timestamp', ''))
+        merged['merged_count'] = entry.get('merged_count', 1) + other.get('merged_count', 1)
+        merged['tags'] = sorted(set(entry.get('tags', [])) | set(other.get('tags', [])))
+        access = memory.access_counts()
+        memory.update(keep, merged, float(access[keep] + access[drop]))
+
+    def _candidate_rows(self, memory, start, count):
+        """Genera, para cada memoria nueva, las filas anteriores con las que compararla"""
+        matrix = memory.rows()
+        if memory.index is not None and memory.index.is_trained:
+            # Con índice ANN solo se comparan las listas invertidas cercanas
+            for row in range(start, count):
+                candidates = memory.index.candidates(matrix[row])
+                candidates = candidates[candidates < row]
+                yield row, candidates, matrix[candidates] @ matrix[row]
+            return
+        for block_start in range(start, count, self.block_size):
+            block_end = min(block_start + self.block_size, count)
+            block = matrix[block_start:block_end]
+            # Las filas anteriores se recorren por tramos para no descomprimir toda la matriz
+            similarities = np.concatenate([
+                block @ matrix[start:min(start + memory.chunk_size, block_end)].T
+                for start in range(0, block_end, memory.chunk_size)
+            ], axis=1)
+            for offset in range(block_end - block_start):
+                row = block_start + offset
+                yield row, np.arange(row), similarities[offset, :row]
+
+    def find_duplicates(self, memory, start):
+        """Compara las memorias desde start con las anteriores; devuelve las fusiones [(keep, drop)]
+
+        No modifica memory, así que puede recorrer una instantánea sin bloquear la memoria viva.
+        """
+        count = len(memory)
+        start = min(start, count)
+        # Copia: la importancia de las fusionadas cambia para las comparaciones siguientes
+        importance = memory.importances().copy()
+        removed = np.zeros(count, dtype=bool)
+        merges = []
+
+        for row, candidates, similarities in self._candidate_rows(memory, start, count):
+            if removed[row]:
+                continue
+            alive = ~removed[candidates]
+            candidates, similarities = candidates[alive], similarities[alive]
+            if candidates.size == 0:
+                continue
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.duplicate_threshold:
+                continue
+            best = int(candidates[best])
+            # Sobrevive la más importante; en empate, la más reciente
+            keep, drop = (best, row) if importance[best] > importance[row] else (row, best)
+            importance[keep] = combine_importance(importance[keep], importance[drop])
+            merges.append((keep, drop))
+            removed[drop] = True
+
+        return merges
+
+    def _select_evictions(self, memory, max_items):
+        """Elige las memorias con menor puntuación de retención por encima del tope"""
+        count = len(memory)
+        if not max_items or count <= max_items:
+            return np.zeros(0, dtype=np.int64)
+        ages = age_in_days([entry.get('timestamp') for entry in memory.entries])
+        scores = retention_scores(memory.importances(), ages, memory.access_counts(),
+                                  self.weights, self.half_life_days)
+        excess = count - max_items
+        return np.argpartition(scores, excess - 1)[:excess]
+
+    def apply(self, memory, merges, checked, max_items=None):
+        """Aplica las fusiones y expulsa por puntuación; devuelve (fusionadas, expulsadas)
+
+        checked es el número de memorias que se compararon; las añadidas después
+        quedan al final y se revisan en la siguiente consolidación.
+        """
+        for keep, drop in merges:
+            self._merge(memory, keep, drop)
+        duplicates = np.asarray([drop for _, drop in merges], dtype=np.int64)
+        memory.remove(duplicates)
+        checked -= len(duplicates)
+        evicted = self._select_evictions(memory, max_items)
+        memory.remove(evicted)
+        self.checked_rows = checked - int(np.count_nonzero(evicted < checked))
+        return len(duplicates), len(evicted)
+
+    def run(self, memory, max_items=None):
+        """Busca y aplica las fusiones sobre la misma memoria; devuelve (fusionadas, expulsadas)"""
+        count = len(memory)
+        return self.apply(memory, self.find_duplicates(memory, self.checked_rows), count, max_items)
@@ -1,30 +1,36 @@
 import json
 import os
 from datetime import datetime
+import constants
+from .memory_store import MemoryStore
+from .sqlite_memory_manager import SQLiteMemoryManager
+from .memory_consolidation import retention_scores, age_in_days
+
+def create_memory_manager(memory_path):
+    """Crea el gestor de memoria según constants.MEMORY_BACKEND ("json" o "sqlite")"""
+    if constants.MEMORY_BACKEND == "sqlite":
+        manager = SQLiteMemoryManager(memory_path)
+        # Migración única desde la memoria JSON existente
+        if manager.needs_migration():
+            manager.migrate_from_json(MemoryManager(memory_path).memory)
+        return manager
+    return MemoryManager(memory_path)
 
 class MemoryManager:
+    NAMESPACE = "memory_manager"
+
     def __init__(self, memory_path):
         self.memory_path = memory_path
         self.memory_file = os.path.join(memory_path, "memory.json")
+        self.store = MemoryStore.shared(
+            memory_path,
+            fsync_interval=constants.MEMORY_FSYNC_INTERVAL,
+            checkpoint_every=constants.MEMORY_CHECKPOINT_EVERY
+        )
         self.memory = self._load_memory()
 
-    def _load_memory(self):
-        """Carga la memoria desde el archivo JSON"""
-        if os.path.exists(self.memory_file):
-            try:
-                with open(self.memory_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except json.JSONDecodeError:
-                return {
-                    "conversations": [],
-                    "facts": {},
-                    "preferences": {},
-                    "categories": {
-                        "personal": [],
-                        "temporal": [],
-                        "importante": []
-                    }
-                }
+    @staticmethod
+    def _default_memory():
         return {
             "conversations": [],
             "facts": {},
@@ -36,10 +42,28 @@ class MemoryManager:
             }
         }
 
-    def _save_memory(self):
-        """Guarda la memoria en el archivo JSON"""
-        with open(self.memory_file, 'w', encoding='utf-8') as f:
-            json.dump(self.memory, f, ensure_ascii=False, indent=2)
+    def _load_memory(self):
+        """Carga la memoria desde el almacén compartido, importando el antiguo JSON si existe"""
+        if not self.store.has_namespace(self.NAMESPACE):
+            self.store.set(self.NAMESPACE, [], self._load_legacy_memory())
+        return self.store.namespace(self.NAMESPACE)
+
+    def _load_legacy_memory(self):
+        """Lee una sola vez el antiguo memory.json si tiene el esquema de MemoryManager"""
+        if os.path.exists(self.memory_file):
+            try:
+                with open(self.memory_file, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                # Un memory.json en forma de lista pertenece a AIManager
+                if isinstance(data, dict) and "categories" in data:
+                    return data
+            except json.JSONDecodeError:
+                pass
+        return self._default_memory()
+
+    def save_memory(self):
+        """Fuerza a disco las operaciones pendientes del journal"""
+        self.store.flush()
 
     def add_conversation(self, user_input, bot_response, category="temporal", importance=0.5):
         """Añade una conversación a la memoria con categoría e importancia"""
@@ -51,19 +75,26 @@ class MemoryManager:
             "importance": importance
         }
         
-        # Añadir a la categoría correspondiente
+        # Añadir a la categoría correspondiente (máximo 50 por categoría)
         if category in self.memory["categories"]:
-            self.memory["categories"][category].append(conversation)
-            # Mantener solo las últimas 50 conversaciones por categoría
-            if len(self.memory["categories"][category]) > 50:
-                self.memory["categories"][category] = self.memory["categories"][category][-50:]
+            self.store.append(self.NAMESPACE, ["categories", category], conversation)
+            self._evict_from_category(category)
         
         # Añadir también a conversaciones generales
-        self.memory["conversations"].append(conversation)
-        if len(self.memory["conversations"]) > 50:
-            self.memory["conversations"] = self.memory["conversations"][-50:]
-            
-        self._save_memory()
+        self.store.append(self.NAMESPACE, ["conversations"], conversation, limit=50)
+
+    def _evict_from_category(self, category, max_items=50):
+        """Expulsa las conversaciones con menor puntuación de importancia y recencia"""
+        items = self.memory["categories"][category]
+        while len(items) > max_items:
+            scores = retention_scores(
+                [item.get("importance", 0.5) for item in items],
+                age_in_days([item.get("timestamp") for item in items]),
+                [0] * len(items),
+                constants.MEMORY_SCORE_WEIGHTS,
+                constants.MEMORY_RECENCY_HALF_LIFE_DAYS
+            )
+            self.store.delete(self.NAMESPACE, ["categories", category, int(scores.argmin())])
 
     def add_fact(self, key, value, category="temporal", importance=0.5):
         """Añade un hecho a la memoria con categoría e importancia"""
@@ -73,16 +104,14 @@ class MemoryManager:
             "importance": importance,
             "timestamp": datetime.now().isoformat()
         }
-        self.memory["facts"][key] = fact
-        self._save_memory()
+        self.store.set(self.NAMESPACE, ["facts", key], fact)
 
     def add_preference(self, key, value):
         """Añade una preferencia del usuario"""
-        self.memory["preferences"][key] = {
+        self.store.set(self.NAMESPACE, ["preferences", key], {
             "value": value,
             "timestamp": datetime.now().isoformat()
-        }
-        self._save_memory()
+        })
 
     def get_recent_conversations(self, limit=5, category=None):
         """Obtiene las conversaciones más recientes, opcionalmente filtradas por categoría"""
@@ -90,6 +119,14 @@ class MemoryManager:
             return self.memory["categories"][category][-limit:]
         return self.memory["conversations"][-limit:]
 
+    def get_summary(self):
+        """Obtiene el resumen acumulado de las conversaciones anteriores"""
+        return self.memory.get("summary")
+
+    def set_summary(self, summary):
+        """Guarda el resumen acumulado ({'text', 'through'})"""
+        self.store.set(self.NAMESPACE, ["summary"], summary)
+
     def get_fact(self, key):
         """Obtiene un hecho específico"""
         return self.memory["facts"].get(key)
@@ -118,10 +155,9 @@ class MemoryManager:
 
     def update_importance(self, memory_id, new_importance):
         """Actualiza la importancia de una memoria"""
-        for category in self.memory["categories"].values():
-            for memory in category:
+        for category_name, category in self.memory["categories"].items():
+            for position, memory in enumerate(category):
                 if memory.get("timestamp") == memory_id:
-                    memory["importance"] = new_importance
-                    self._save_memory()
+                    self.store.set(self.NAMESPACE, ["categories", category_name, position, "importance"], new_importance)
                     return True
         return False 
\ No newline at end of file
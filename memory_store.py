@@ -0,0 +1,183 @@
+import json
+import os
+import threading
+import time
+
+class MemoryStore:
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, memory_path, fsync_interval=1.0, checkpoint_every=500, logger=None):
+        self.memory_path = memory_path
+        self.logger = logger
+        self.snapshot_file = os.path.join(memory_path, 'memory.snapshot.json')
+        self.journal_file = os.path.join(memory_path, 'memory.wal')
+        self.fsync_interval = fsync_interval
+        self.checkpoint_every = checkpoint_every
+        self._lock = threading.RLock()
+        self.data = {}
+        # Número de secuencia de la última operación aplicada
+        self.seq = 0
+        self._journal_records = 0
+        self._dirty = False
+        self._load()
+        os.makedirs(memory_path, exist_ok=True)
+        self._journal = open(self.journal_file, 'a', encoding='utf-8')
+        self._running = True
+        self._thread = threading.Thread(target=self._sync_loop, daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def shared(cls, memory_path, **kwargs):
+        """Devuelve la instancia única del almacén para una carpeta de memoria"""
+        key = os.path.abspath(memory_path)
+        with cls._instances_lock:
+            if key not in cls._instances:
+                cls._instances[key] = cls(memory_path, **kwargs)
+            return cls._instances[key]
+
+    def _load(self):
+        """Carga la última instantánea y reaplica el journal posterior"""
+        if os.path.exists(self.snapshot_file):
+            with open(self.snapshot_file, 'r', encoding='utf-8') as f:
+                snapshot = json.load(f)
+            self.data = snapshot.get('data', {})
+            self.seq = snapshot.get('seq', 0)
+
+        if os.path.exists(self.journal_file):
+            with open(self.journal_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Última línea incompleta por un cierre inesperado
+                        break
+                    self._journal_records += 1
+                    # Las operaciones ya incluidas en la instantánea se ignoran
+                    if record['seq'] <= self.seq:
+                        continue
+                    self._apply(record)
+                    self.seq = record['seq']
+
+    @staticmethod
+    def _resolve(document, path):
+        """Devuelve el contenedor padre y la última clave de una ruta"""
+        for key in path[:-1]:
+            document = document[key]
+        return document, path[-1]
+
+    def _apply(self, record):
+        """Aplica una operación del journal sobre los datos en memoria"""
+        op = record['op']
+        namespace = record['ns']
+        path = record.get('path', [])
+        value = record.get('value')
+
+        if not path:
+            if op == 'delete':
+                self.data.pop(namespace, None)
+            else:
+                self.data[namespace] = value
+            return
+
+        parent, key = self._resolve(self.data[namespace], path)
+        if op == 'set':
+            parent[key] = value
+        elif op == 'delete':
+            if isinstance(parent, dict):
+                parent.pop(key, None)
+            elif key < len(parent):
+                del parent[key]
+        elif op == 'append':
+            items = parent.setdefault(key, []) if isinstance(parent, dict) else parent[key]
+            items.append(value)
+            limit = record.get('limit')
+            if limit and len(items) > limit:
+                del items[:len(items) - limit]
+
+    def _write(self, op, namespace, path=None, value=None, limit=None):
+        """Aplica una operación y la añade al journal (el fsync se hace por lotes)"""
+        with self._lock:
+            record = {'seq': self.seq + 1, 'op': op, 'ns': namespace, 'path': path or []}
+            if value is not None:
+                record['value'] = value
+            if limit:
+                record['limit'] = limit
+            line = json.dumps(record, ensure_ascii=False)
+            self._apply(record)
+            self.seq = record['seq']
+            self._journal.write(line + '\n')
+            self._journal.flush()
+            self._journal_records += 1
+            self._dirty = True
+
+    def has_namespace(self, namespace):
+        """Indica si el almacén ya tiene datos para un componente"""
+        return namespace in self.data
+
+    def namespace(self, namespace, default=None):
+        """Devuelve el documento de un componente, creándolo si no existe"""
+        with self._lock:
+            if namespace not in self.data:
+                self._write('set', namespace, value=default if default is not None else {})
+            return self.data[namespace]
+
+    def set(self, namespace, path, value):
+        """Asigna un valor en la ruta indicada (ruta vacía = documento completo)"""
+        self._write('set', namespace, path, value)
+
+    def append(self, namespace, path, value, limit=None):
+        """Añade un valor a una lista, conservando solo los últimos limit elementos"""
+        self._write('append', namespace, path, value, limit)
+
+    def delete(self, namespace, path):
+        """Elimina la clave o posición indicada"""
+        self._write('delete', namespace, path)
+
+    def flush(self):
+        """Fuerza a disco las operaciones pendientes del journal"""
+        with self._lock:
+            if self._dirty and not self._journal.closed:
+                self._journal.flush()
+                os.fsync(self._journal.fileno())
+                self._dirty = False
+
+    def checkpoint(self):
+        """Escribe una instantánea atómica y vacía el journal"""
+        with self._lock:
+            temp_file = self.snapshot_file + '.tmp'
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump({'seq': self.seq, 'data': self.data}, f, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_file, self.snapshot_file)
+            # Si el proceso muere aquí, las operaciones del journal ya están en la instantánea
+            # y se ignoran al recargar gracias al número de secuencia
+            self._journal.close()
+            self._journal = open(self.journal_file, 'w', encoding='utf-8')
+            self._journal_records = 0
+            self._dirty = False
+
+    def _sync_loop(self):
+        """Hilo que agrupa los fsync y lanza instantáneas cuando el journal crece"""
+        while self._running:
+            time.sleep(self.fsync_interval)
+            try:
+                with self._lock:
+                    # close() puede haber cerrado el journal durante la espera
+                    if not self._running:
+                        return
+                    if self._journal_records >= self.checkpoint_every:
+                        self.checkpoint()
+                    else:
+                        self.flush()
+            except Exception as e:
+                if self.logger:
+                    self.logger.log_error("memory", f"Error al sincronizar la memoria: {str(e)}")
+
+    def close(self):
+        """Sincroniza el journal y detiene el hilo de fondo"""
+        self._running = False
+        with self._lock:
+            self.flush()
+            self._journal.close()
@@ -2,69 +2,173 @@ import json
 import os
 from datetime import datetime
 from collections import defaultdict
+import threading
 
 class MetricsManager:
+    _instances = {}
+    _instances_lock = threading.Lock()
+    # Contadores que se guardan como dict en el JSON y se reconstruyen como defaultdict
+    COUNTERS = {
+        'api_usage': int,
+        'response_times': list,
+        'error_rates': int,
+        'total_requests': int,
+        'emotion_distribution': int,
+        'memory_operations': int
+    }
+
     def __init__(self, metrics_path):
         self.metrics_path = metrics_path
         self.metrics_file = os.path.join(metrics_path, 'metrics.json')
+        # Varios hilos (análisis concurrentes) registran métricas a la vez
+        self._lock = threading.RLock()
         self._load_metrics()
 
+    @classmethod
+    def shared(cls, metrics_path):
+        """Devuelve la instancia única para una carpeta de métricas (un solo escritor de metrics.json)"""
+        key = os.path.abspath(metrics_path)
+        with cls._instances_lock:
+            if key not in cls._instances:
+                cls._instances[key] = cls(metrics_path)
+            return cls._instances[key]
+
+    def _empty_metrics(self):
+        metrics = {name: defaultdict(factory) for name, factory in self.COUNTERS.items()}
+        metrics.update({'cache_stats': {}, 'prompt_tokens': {}, 'last_updated': datetime.now().isoformat()})
+        return metrics
+
     def _load_metrics(self):
         """Carga las métricas desde el archivo"""
-        if os.path.exists(self.metrics_file):
+        self.metrics = self._empty_metrics()
+        if not os.path.exists(self.metrics_file):
+            self._save_metrics()
+            return
+        try:
             with open(self.metrics_file, 'r', encoding='utf-8') as f:
-                self.metrics = json.load(f)
-        else:
-            self.metrics = {
-                'api_usage': defaultdict(int),
-                'response_times': defaultdict(list),
-                'error_rates': defaultdict(int),
-                'total_requests': defaultdict(int),
-                'emotion_distribution': defaultdict(int),
-                'memory_operations': defaultdict(int),
-                'last_updated': datetime.now().isoformat()
-            }
+                loaded = json.load(f)
+        except json.JSONDecodeError:
+            # Fichero a medio escribir por una versión anterior: se empieza de cero
             self._save_metrics()
+            return
+        for name, value in loaded.items():
+            if name in self.COUNTERS:
+                # JSON devuelve dict normales; sin defaultdict los record_* darían KeyError
+                self.metrics[name].update(value)
+            else:
+                self.metrics[name] = value
 
     def _save_metrics(self):
-        """Guarda las métricas en el archivo"""
-        os.makedirs(os.path.dirname(self.metrics_file), exist_ok=True)
-        self.metrics['last_updated'] = datetime.now().isoformat()
-        with open(self.metrics_file, 'w', encoding='utf-8') as f:
-            json.dump(self.metrics, f, ensure_ascii=False, indent=2)
+        """Guarda las métricas en el archivo (fichero temporal y reemplazo atómico)"""
+        with self._lock:
+            os.makedirs(os.path.dirname(self.metrics_file), exist_ok=True)
+            self.metrics['last_updated'] = datetime.now().isoformat()
+            temp_file = self.metrics_file + '.tmp'
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump(self.metrics, f, ensure_ascii=False, indent=2)
+            os.replace(temp_file, self.metrics_file)
 
     def record_api_usage(self, service, tokens_used):
         """Registra el uso de tokens de una API"""
-        self.metrics['api_usage'][service] += tokens_used
-        self._save_metrics()
+        with self._lock:
+            self.metrics['api_usage'][service] += tokens_used
+            self._save_metrics()
 
     def record_response_time(self, service, time_ms):
         """Registra el tiempo de respuesta de un servicio"""
-        self.metrics['response_times'][service].append(time_ms)
-        # Mantener solo los últimos 1000 tiempos
-        if len(self.metrics['response_times'][service]) > 1000:
-            self.metrics['response_times'][service] = self.metrics['response_times'][service][-1000:]
-        self._save_metrics()
+        with self._lock:
+            self.metrics['response_times'][service].append(time_ms)
+            # Mantener solo los últimos 1000 tiempos
+            if len(self.metrics['response_times'][service]) > 1000:
+                self.metrics['response_times'][service] = self.metrics['response_times'][service][-1000:]
+            self._save_metrics()
 
     def record_error(self, service):
         """Registra un error en un servicio"""
-        self.metrics['error_rates'][service] += 1
-        self._save_metrics()
+        with self._lock:
+            self.metrics['error_rates'][service] += 1
+            self._save_metrics()
 
     def record_request(self, service):
         """Registra una petición a un servicio"""
-        self.metrics['total_requests'][service] += 1
-        self._save_metrics()
+        with self._lock:
+            self.metrics['total_requests'][service] += 1
+            self._save_metrics()
 
     def record_emotion(self, emotion):
         """Registra una emoción detectada"""
-        self.metrics['emotion_distribution'][emotion] += 1
-        self._save_metrics()
+        with self._lock:
+            self.metrics['emotion_distribution'][emotion] += 1
+            self._save_metrics()
 
     def record_memory_operation(self, operation):
         """Registra una operación de memoria"""
-        self.metrics['memory_operations'][operation] += 1
-        self._save_metrics()
+        with self._lock:
+            self.metrics['memory_operations'][operation] += 1
+            self._save_metrics()
+
+    def record_cache_event(self, cache, hit):
+        """Registra un acierto o un fallo de una caché"""
+        with self._lock:
+            stats = self.metrics.setdefault('cache_stats', {}).setdefault(cache, {'hits': 0, 'misses': 0})
+            stats['hits' if hit else 'misses'] += 1
+            self._save_metrics()
+
+    def record_cache_counts(self, cache, hits, misses):
+        """Registra de una vez los aciertos y fallos acumulados de una caché"""
+        with self._lock:
+            stats = self.metrics.setdefault('cache_stats', {}).setdefault(cache, {'hits': 0, 'misses': 0})
+            stats['hits'] += hits
+            stats['misses'] += misses
+            self._save_metrics()
+
+    def record_cache_savings(self, cache, tokens):
+        """Registra los tokens que se ha ahorrado una caché al acertar"""
+        with self._lock:
+            stats = self.metrics.setdefault('cache_stats', {}).setdefault(cache, {'hits': 0, 'misses': 0})
+            stats['saved_tokens'] = stats.get('saved_tokens', 0) + tokens
+            self._save_metrics()
+
+    def record_prompt_tokens(self, section_tokens):
+        """Registra los tokens que ocupa cada sección del prompt principal"""
+        with self._lock:
+            prompt_stats = self.metrics.setdefault('prompt_tokens', {})
+            for section, tokens in section_tokens.items():
+                stats = prompt_stats.setdefault(section, {'total': 0, 'count': 0, 'last': 0})
+                stats['total'] += tokens
+                stats['count'] += 1
+                stats['last'] = tokens
+            self._save_metrics()
+
+    def record_wake_word(self, detected, transcribed, audio_seconds, spot_ms):
+        """Registra una frase revisada por el detector de nombre y si acabó transcrita"""
+        with self._lock:
+            stats = self.metrics.setdefault('wake_word', {
+                'utterances': 0, 'detected': 0, 'skipped': 0,
+                'audio_seconds': 0.0, 'skipped_seconds': 0.0, 'spot_ms': 0.0
+            })
+            stats['utterances'] += 1
+            stats['detected'] += int(detected)
+            stats['audio_seconds'] += audio_seconds
+            stats['spot_ms'] += spot_ms
+            if not transcribed:
+                stats['skipped'] += 1
+                stats['skipped_seconds'] += audio_seconds
+            self._save_metrics()
+
+    def get_wake_word_stats(self):
+        """Obtiene cuánta transcripción se ha ahorrado el detector de nombre"""
+        stats = self.metrics.get('wake_word')
+        if not stats or not stats['utterances']:
+            return {}
+        return {
+            'utterances': stats['utterances'],
+            'detected': stats['detected'],
+            'skipped': stats['skipped'],
+            'skipped_seconds': stats['skipped_seconds'],
+            'saved_rate': (stats['skipped_seconds'] / stats['audio_seconds']) * 100 if stats['audio_seconds'] else 0,
+            'avg_spot_ms': stats['spot_ms'] / stats['utterances']
+        }
 
     def get_service_stats(self, service):
         """Obtiene estadísticas de un servicio"""
@@ -92,19 +196,33 @@ class MetricsManager:
             for emotion, count in self.metrics['emotion_distribution'].items()
         }
 
+    def get_cache_stats(self, cache):
+        """Obtiene aciertos, fallos y tasa de acierto de una caché"""
+        stats = self.metrics.get('cache_stats', {}).get(cache, {'hits': 0, 'misses': 0})
+        total = stats['hits'] + stats['misses']
+        return {
+            'hits': stats['hits'],
+            'misses': stats['misses'],
+            'hit_rate': (stats['hits'] / total) * 100 if total else 0,
+            'saved_tokens': stats.get('saved_tokens', 0)
+        }
+
+    def get_prompt_token_stats(self):
+        """Obtiene la media y el último valor de tokens por sección del prompt"""
+        return {
+            section: {
+                'avg_tokens': stats['total'] / stats['count'] if stats['count'] else 0,
+                'last_tokens': stats['last']
+            }
+            for section, stats in self.metrics.get('prompt_tokens', {}).items()
+        }
+
     def get_memory_stats(self):
         """Obtiene estadísticas de operaciones de memoria"""
         return dict(self.metrics['memory_operations'])
 
     def reset_metrics(self):
         """Reinicia todas las métricas"""
-        self.metrics = {
-            'api_usage': defaultdict(int),
-            'response_times': defaultdict(list),
-            'error_rates': defaultdict(int),
-            'total_requests': defaultdict(int),
-            'emotion_distribution': defaultdict(int),
-            'memory_operations': defaultdict(int),
-            'last_updated': datetime.now().isoformat()
-        }
-        self._save_metrics() 
\ No newline at end of file
+        with self._lock:
+            self.metrics = self._empty_metrics()
+            self._save_metrics() 
\ No newline at end of file
@@ -0,0 +1,160 @@
+import collections
+import threading
+import time
+
+class StageQueue:
+    # Políticas cuando la cola está llena
+    BLOCK = "block"  # El productor espera (contrapresión)
+    DROP_OLDEST = "drop_oldest"  # Se descarta lo más antiguo para dejar sitio a lo nuevo
+    DROP_NEWEST = "drop_newest"  # Se descarta lo que llega
+
+    def __init__(self, name, max_size, policy=BLOCK, priority=None):
+        self.name = name
+        self.policy = policy
+        self.max_size = max_size
+        # priority(item) -> True si el elemento adelanta a los que esperan y se descarta el último
+        self.priority = priority
+        self._items = collections.deque()
+        # Los elementos prioritarios van al principio, en orden de llegada
+        self._urgent = 0
+        self._condition = threading.Condition()
+        self.dropped = 0
+
+    def __len__(self):
+        with self._condition:
+            return len(self._items)
+
+    def _insert(self, item, urgent):
+        if urgent:
+            self._items.insert(self._urgent, item)
+            self._urgent += 1
+        else:
+            self._items.append(item)
+        # Productores y consumidores comparten la condición: se despierta a todos
+        self._condition.notify_all()
+
+    def _make_room(self, urgent):
+        """Con la cola llena descarta algo según la política; False si se descarta lo que llega"""
+        self.dropped += 1
+        waiting = len(self._items) - self._urgent
+        if not urgent:
+            if self.policy == self.DROP_NEWEST or not waiting:
+                return False
+            del self._items[self._urgent]
+            return True
+        if waiting:
+            # Se sacrifica un elemento sin prioridad (el más antiguo o el más nuevo según la política)
+            del self._items[self._urgent if self.policy == self.DROP_OLDEST else -1]
+            return True
+        if self.policy == self.DROP_NEWEST:
+            return False
+        self._items.popleft()
+        self._urgent -= 1
+        return True
+
+    def put(self, item, timeout=None):
+        """Encola según la política; devuelve False si el elemento se descartó"""
+        urgent = self.priority is not None and bool(self.priority(item))
+        with self._condition:
+            if self.policy == self.BLOCK:
+                if not self._condition.wait_for(lambda: len(self._items) < self.max_size, timeout):
+                    # No es un descarte: el productor decide si vuelve a intentarlo
+                    return False
+            elif len(self._items) >= self.max_size and not self._make_room(urgent):
+                return False
+            self._insert(item, urgent)
+            return True
+
+    def get(self, timeout=None):
+        """Saca el siguiente elemento o None si no llega ninguno a tiempo"""
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._items, timeout):
+                return None
+            item = self._items.popleft()
+            if self._urgent:
+                self._urgent -= 1
+            self._condition.notify_all()
+            return item
+
+class PipelineStage:
+    def __init__(self, name, function, input_queue=None, output_queue=None, logger=None, poll_interval=0.2):
+        # function(item) -> resultado (None = no pasa nada a la siguiente etapa); sin
+        # input_queue la etapa es una fuente y function() se llama en bucle
+        self.name = name
+        self.function = function
+        self.input_queue = input_queue
+        self.output_queue = output_queue
+        self.logger = logger
+        self.poll_interval = poll_interval
+        self.processed = 0
+        self.errors = 0
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name=f"stage-{self.name}", daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while self._running:
+            if self.input_queue is None:
+                item = None
+            else:
+                item = self.input_queue.get(timeout=self.poll_interval)
+                if item is None:
+                    continue
+            try:
+                result = self.function() if self.input_queue is None else self.function(item)
+            except Exception as e:
+                self.errors += 1
+                if self.logger:
+                    self.logger.log_error(f"pipeline_{self.name}", str(e))
+                # Pausa breve para no girar en vacío si el fallo se repite (p. ej. sin dispositivo)
+                time.sleep(self.poll_interval)
+                continue
+            self.processed += 1
+            if result is not None and self.output_queue is not None:
+                accepted = self.output_queue.put(result, timeout=self.poll_interval)
+                # Contrapresión: con la cola llena se espera mientras la etapa siga activa
+                while not accepted and self.output_queue.policy == StageQueue.BLOCK and self._running:
+                    accepted = self.output_queue.put(result, timeout=self.poll_interval)
+
+    def stop(self, timeout=None):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+class Pipeline:
+    def __init__(self, logger=None):
+        self.logger = logger
+        self.stages = []
+        self.queues = []
+
+    def queue(self, name, max_size, policy=StageQueue.BLOCK, priority=None):
+        stage_queue = StageQueue(name, max_size, policy, priority)
+        self.queues.append(stage_queue)
+        return stage_queue
+
+    def stage(self, name, function, input_queue=None, output_queue=None):
+        stage = PipelineStage(name, function, input_queue, output_queue, self.logger)
+        self.stages.append(stage)
+        return stage
+
+    def start(self):
+        for stage in self.stages:
+            stage.start()
+        return self
+
+    def stop(self, timeout=None):
+        """Detiene las etapas empezando por la fuente para no aceptar trabajo nuevo"""
+        for stage in self.stages:
+            stage.stop(timeout)
+
+    def stats(self):
+        """Elementos procesados y errores por etapa; pendientes y descartes por cola"""
+        return {
+            "stages": {stage.name: {"processed": stage.processed, "errors": stage.errors} for stage in self.stages},
+            "queues": {q.name: {"pending": len(q), "dropped": q.dropped} for q in self.queues}
+        }
@@ -0,0 +1,111 @@
+import re
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# Tokens extra que añade el formato de chat por cada mensaje
+MESSAGE_OVERHEAD = 4
+WORD_PATTERN = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+
+class TokenCounter:
+    def __init__(self, model=None):
+        self._encoding = None
+        if tiktoken is not None:
+            try:
+                self._encoding = tiktoken.encoding_for_model(model) if model else tiktoken.get_encoding("o200k_base")
+            except (KeyError, ValueError):
+                self._encoding = tiktoken.get_encoding("o200k_base")
+
+    def count(self, text):
+        """Cuenta los tokens de un texto (exacto con tiktoken, estimado sin él)"""
+        if not text:
+            return 0
+        if self._encoding is not None:
+            return len(self._encoding.encode(text))
+        # Estimación: cada signo es un token y las palabras largas se parten en trozos de ~4 letras
+        return sum(max(1, (len(word) + 3) // 4) for word in WORD_PATTERN.findall(text))
+
+    def count_message(self, message):
+        return self.count(message["content"]) + MESSAGE_OVERHEAD
+
+
+class PromptBuilder:
+    def __init__(self, static_prompt, budget=3000, priorities=(), counter=None):
+        # Primer mensaje idéntico byte a byte en todos los turnos para aprovechar la caché de prompts
+        self.static_message = {"role": "system", "content": static_prompt}
+        self.budget = budget
+        # Orden en que las secciones reciben presupuesto (las primeras se llenan antes)
+        self.priorities = list(priorities)
+        self.counter = counter or TokenCounter()
+        self.static_tokens = self.counter.count_message(self.static_message)
+
+    def _priority(self, name):
+        return self.priorities.index(name) if name in self.priorities else len(self.priorities)
+
+    @staticmethod
+    def _exchanges(history):
+        """Agrupa el historial en intercambios que empiezan por un mensaje del usuario"""
+        exchanges = []
+        for message in history:
+            if message["role"] == "user" or not exchanges:
+                exchanges.append([message])
+            else:
+                exchanges[-1].append(message)
+        # Una respuesta suelta al principio (sin su pregunta) no se envía
+        if exchanges and exchanges[0][0]["role"] != "user":
+            exchanges.pop(0)
+        return exchanges
+
+    def build(self, user_message, sections, history=()):
+        """Compone los mensajes dentro del presupuesto
+
+        sections es una lista ordenada de (nombre, cabecera, elementos): cada sección
+        se envía como un mensaje de sistema con los elementos que quepan, del más al
+        menos relevante. history (la sección "history") se recorta por lo más antiguo,
+        en intercambios completos (usuario y respuesta) para no empezar por una respuesta.
+        Devuelve los mensajes y los tokens usados por sección.
+        """
+        user = {"role": "user", "content": user_message}
+        counts = {"static": self.static_tokens, "user": self.counter.count_message(user)}
+        remaining = self.budget - counts["static"] - counts["user"]
+
+        chosen = {}
+        named = [(name, header, items) for name, header, items in sections]
+        named.append(("history", None, list(history)))
+        for name, header, items in sorted(named, key=lambda section: self._priority(section[0])):
+            if name == "history":
+                # Los intercambios más recientes primero; se devuelven en orden cronológico
+                kept = []
+                used = 0
+                for exchange in reversed(self._exchanges(items)):
+                    tokens = sum(self.counter.count_message(message) for message in exchange)
+                    if used + tokens > remaining:
+                        break
+                    kept[:0] = exchange
+                    used += tokens
+                chosen[name] = kept
+            else:
+                kept = []
+                used = MESSAGE_OVERHEAD + self.counter.count(header or "")
+                for item in items:
+                    tokens = self.counter.count(item) + 1
+                    if used + tokens <= remaining:
+                        kept.append(item)
+                        used += tokens
+                if not kept:
+                    counts[name] = 0
+                    continue
+                chosen[name] = {"role": "system", "content": (header or "") + "\n".join(kept)}
+                used = self.counter.count_message(chosen[name])
+            counts[name] = used
+            remaining -= used
+
+        messages = [self.static_message]
+        for name, _, _ in sections:
+            if name in chosen:
+                messages.append(chosen[name])
+        messages.extend(chosen.get("history", []))
+        messages.append(user)
+        return messages, counts
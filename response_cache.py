@@ -0,0 +1,89 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+
+class SemanticResponseCache:
+    def __init__(self, cache_file=None, max_size=256, threshold=0.92, ttl_seconds=3600):
+        self.cache_file = cache_file
+        self.max_size = max_size
+        # Similitud coseno mínima entre consultas para reutilizar una respuesta
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        # clave -> {'state', 'embedding', 'response', 'tokens', 'created'}; el final es lo más reciente
+        self._entries = OrderedDict()
+        self._next_key = 0
+        # Respuestas añadidas desde la última vez que se guardó
+        self.unsaved = 0
+        self._load()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _load(self):
+        """Carga la caché persistida descartando las respuestas caducadas"""
+        if not self.cache_file or not os.path.exists(self.cache_file):
+            return
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                items = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return
+        now = time.time()
+        for item in items[-self.max_size:]:
+            if now - item['created'] > self.ttl_seconds:
+                continue
+            item['embedding'] = np.asarray(item['embedding'], dtype=np.float32)
+            self._entries[self._next_key] = item
+            self._next_key += 1
+
+    def save(self):
+        """Guarda la caché de forma atómica (del menos al más reciente)"""
+        if not self.cache_file:
+            return
+        with self._lock:
+            items = [dict(item, embedding=item['embedding'].tolist()) for item in self._entries.values()]
+            self.unsaved = 0
+        os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+        temp_file = self.cache_file + '.tmp'
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump(items, f, ensure_ascii=False)
+        os.replace(temp_file, self.cache_file)
+
+    def _expire(self, now):
+        expired = [key for key, item in self._entries.items() if now - item['created'] > self.ttl_seconds]
+        for key in expired:
+            del self._entries[key]
+
+    def get(self, embedding, state):
+        """Devuelve la entrada más parecida con el mismo estado si supera el umbral"""
+        query = np.asarray(embedding, dtype=np.float32)
+        with self._lock:
+            self._expire(time.time())
+            keys = [key for key, item in self._entries.items() if item['state'] == state]
+            if not keys:
+                return None
+            similarities = np.stack([self._entries[key]['embedding'] for key in keys]) @ query
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                return None
+            self._entries.move_to_end(keys[best])
+            return dict(self._entries[keys[best]])
+
+    def put(self, embedding, state, response, tokens=0):
+        """Guarda una respuesta expulsando la menos usada si se supera el tamaño"""
+        with self._lock:
+            self._entries[self._next_key] = {
+                'state': state,
+                'embedding': np.asarray(embedding, dtype=np.float32),
+                'response': response,
+                'tokens': int(tokens),
+                'created': time.time()
+            }
+            self._next_key += 1
+            self.unsaved += 1
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
@@ -1,4 +1,4 @@
-import openai
+import copy
 import json
 from datetime import datetime
 from dotenv import load_dotenv
@@ -6,8 +6,87 @@ import os
 import time
 from .logger_manager import LoggerManager
 from .metrics_manager import MetricsManager
+from .llm_clients import LLMClientRegistry
+
+# Esquema JSON del análisis combinado de un turno (emoción + contexto + categoría provisional)
+STRING_LIST = {"type": "array", "items": {"type": "string"}}
+TURN_ANALYSIS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "emotion": {
+            "type": "object",
+            "properties": {
+                "emotion": {"type": "string", "enum": ["feliz", "triste", "enojado", "sorprendido", "neutral"]},
+                "intensity": {"type": "number", "minimum": 0.0, "maximum": 1.0},
+                "keywords": STRING_LIST,
+                "context": {"type": "string"}
+            }
+        },
+        "context": {
+            "type": "object",
+            "properties": {
+                "topic": {"type": "string"},
+                "user_emotion": {"type": "string"},
+                "patterns": STRING_LIST,
+                "suggestions": STRING_LIST
+            }
+        },
+        "memory": {
+            "type": "object",
+            "properties": {
+                "category": {"type": "string", "enum": ["personal", "temporal", "importante"]},
+                "importance": {"type": "number", "minimum": 0.0, "maximum": 1.0},
+                "tags": STRING_LIST,
+                "reason": {"type": "string"}
+            }
+        }
+    },
+    "required": ["emotion", "context", "memory"]
+}
+
+def matches_schema(value, schema):
+    """Comprueba un valor contra el subconjunto de JSON Schema que usan estos análisis"""
+    kind = schema.get("type")
+    if kind == "object":
+        return isinstance(value, dict) and all(key in value for key in schema.get("required", []))
+    if kind == "array":
+        return isinstance(value, list) and all(matches_schema(item, schema.get("items", {})) for item in value)
+    if kind == "string" and not isinstance(value, str):
+        return False
+    if kind == "number":
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            return False
+        if not schema.get("minimum", value) <= value <= schema.get("maximum", value):
+            return False
+    return "enum" not in schema or value in schema["enum"]
 
 class SecondaryAIManager:
+    # Resultados por defecto cuando un análisis falla o no llega a tiempo
+    DEFAULT_EMOTION = {
+        "emotion": "neutral",
+        "intensity": 0.5,
+        "keywords": [],
+        "context": "neutral"
+    }
+    DEFAULT_CATEGORY = {
+        "category": "temporal",
+        "importance": 0.5,
+        "tags": [],
+        "reason": "Error en categorización"
+    }
+    DEFAULT_CONTEXT = {
+        "topic": "general",
+        "user_emotion": "neutral",
+        "patterns": [],
+        "suggestions": []
+    }
+    # Cada sección del análisis combinado con el valor por defecto de sus campos
+    DEFAULT_TURN_ANALYSIS = {
+        "emotion": DEFAULT_EMOTION,
+        "context": DEFAULT_CONTEXT,
+        "memory": DEFAULT_CATEGORY
+    }
+
     def __init__(self, log_path, metrics_path):
         load_dotenv()
         self.api_keys = {
@@ -18,12 +97,15 @@ class SecondaryAIManager:
         
         # Inicializar logger y métricas
         self.logger = LoggerManager(log_path)
-        self.metrics = MetricsManager(metrics_path)
+        self.metrics = MetricsManager.shared(metrics_path)
         
         # Verificar que todas las API keys estén disponibles
         for service, key in self.api_keys.items():
             if not key:
-                self.logger.log_error(service, "No se encontró la API key")
+                self.logger.log_error(service, "No se encontró la API key, se usará la principal")
+        
+        # Clientes con pool de conexiones, uno por API key
+        self.llm = LLMClientRegistry.shared()
         
         self.models = {
             "emotion": "gpt-3.5-turbo",
@@ -31,23 +113,14 @@ class SecondaryAIManager:
             "categorizer": "gpt-3.5-turbo"
         }
         
-    def _get_api_key(self, service):
-        """Obtiene la API key para un servicio específico"""
-        key = self.api_keys.get(service)
-        if not key:
-            self.logger.log_error(service, "No se encontró la API key")
-            # Si no hay key específica, usar la key principal como fallback
-            return os.getenv("OPENAI_API_KEY")
-        return key
-
     def analyze_emotion(self, text):
         """Analiza el texto para determinar emociones y sentimientos"""
         start_time = time.time()
         try:
-            openai.api_key = self._get_api_key("emotion")
             self.metrics.record_request("emotion")
             
-            response = openai.ChatCompletion.create(
+            response = self.llm.create(
+                "emotion",
                 model=self.models["emotion"],
                 messages=[
                     {"role": "system", "content": (
@@ -78,18 +151,12 @@ class SecondaryAIManager:
         except Exception as e:
             self.metrics.record_error("emotion")
             self.logger.log_error("emotion", str(e))
-            return {
-                "emotion": "neutral",
-                "intensity": 0.5,
-                "keywords": [],
-                "context": "neutral"
-            }
+            return copy.deepcopy(self.DEFAULT_EMOTION)
 
-    def summarize_conversation(self, conversations, max_length=200):
-        """Resume una serie de conversaciones"""
+    def summarize_conversation(self, conversations, max_length=200, previous_summary=None):
+        """Resume una serie de conversaciones, ampliando previous_summary si se indica"""
         start_time = time.time()
         try:
-            openai.api_key = self._get_api_key("summarizer")
             self.metrics.record_request("summarizer")
             
             # Preparar el contexto de las conversaciones
@@ -97,14 +164,18 @@ class SecondaryAIManager:
                 f"Usuario: {conv['user_input']}\nBot: {conv['bot_response']}"
                 for conv in conversations
             ])
+            if previous_summary:
+                conversation_text = f"Resumen actual:\n{previous_summary}\n\nNuevas conversaciones:\n{conversation_text}"
             
-            response = openai.ChatCompletion.create(
+            response = self.llm.create(
+                "summarizer",
                 model=self.models["summarizer"],
                 messages=[
                     {"role": "system", "content": (
                         "Eres un resumidor de conversaciones. "
                         "Crea un resumen conciso y relevante de la conversación, "
                         "manteniendo los puntos más importantes y el contexto emocional. "
+                        "Si recibes un resumen actual, actualízalo con las nuevas conversaciones. "
                         f"El resumen no debe exceder {max_length} caracteres."
                     )},
                     {"role": "user", "content": conversation_text}
@@ -131,10 +202,10 @@ class SecondaryAIManager:
         """Categoriza una memoria basada en su contenido"""
         start_time = time.time()
         try:
-            openai.api_key = self._get_api_key("categorizer")
             self.metrics.record_request("categorizer")
             
-            response = openai.ChatCompletion.create(
+            response = self.llm.create(
+                "categorizer",
                 model=self.models["categorizer"],
                 messages=[
                     {"role": "system", "content": (
@@ -165,18 +236,12 @@ class SecondaryAIManager:
         except Exception as e:
             self.metrics.record_error("categorizer")
             self.logger.log_error("categorizer", str(e))
-            return {
-                "category": "temporal",
-                "importance": 0.5,
-                "tags": [],
-                "reason": "Error en categorización"
-            }
+            return copy.deepcopy(self.DEFAULT_CATEGORY)
 
     def analyze_context(self, text, recent_memories):
         """Analiza el contexto completo de una interacción"""
         start_time = time.time()
         try:
-            openai.api_key = self._get_api_key("emotion")
             self.metrics.record_request("context")
             
             # Preparar el contexto
@@ -185,7 +250,8 @@ class SecondaryAIManager:
                 for i, mem in enumerate(recent_memories)
             ])
             
-            response = openai.ChatCompletion.create(
+            response = self.llm.create(
+                "context",
                 model=self.models["emotion"],
                 messages=[
                     {"role": "system", "content": (
@@ -215,9 +281,74 @@ class SecondaryAIManager:
         except Exception as e:
             self.metrics.record_error("context")
             self.logger.log_error("context", str(e))
-            return {
-                "topic": "general",
-                "user_emotion": "neutral",
-                "patterns": [],
-                "suggestions": []
-            } 
\ No newline at end of file
+            return copy.deepcopy(self.DEFAULT_CONTEXT)
+
+    def _validate_turn_analysis(self, result):
+        """Valida cada campo contra el esquema y rellena con el valor por defecto los que falten"""
+        analysis = {}
+        fallbacks = []
+        if not isinstance(result, dict):
+            result = {}
+        for section, section_schema in TURN_ANALYSIS_SCHEMA["properties"].items():
+            values = result.get(section)
+            if not isinstance(values, dict):
+                values = {}
+            analysis[section] = {}
+            for field, field_schema in section_schema["properties"].items():
+                if field in values and matches_schema(values[field], field_schema):
+                    analysis[section][field] = values[field]
+                else:
+                    analysis[section][field] = copy.deepcopy(self.DEFAULT_TURN_ANALYSIS[section][field])
+                    fallbacks.append(f"{section}.{field}")
+        return analysis, fallbacks
+
+    def analyze_turn(self, text, recent_memories):
+        """Obtiene emoción, contexto y categoría provisional en una sola llamada"""
+        start_time = time.time()
+        try:
+            self.metrics.record_request("turn_analysis")
+            
+            # Preparar el contexto
+            context = "\n".join([
+                f"Memoria {i+1}: {mem['text']} -> {mem['response']}"
+                for i, mem in enumerate(recent_memories)
+            ])
+            
+            response = self.llm.create(
+                "emotion",
+                model=self.models["emotion"],
+                messages=[
+                    {"role": "system", "content": (
+                        "Eres un analizador de conversaciones. "
+                        "Analiza el mensaje actual y el contexto histórico, y devuelve un JSON con tres secciones: "
+                        "'emotion' (emoción principal, intensidad de 0.0 a 1.0, palabras clave y contexto emocional), "
+                        "'context' (tema principal, estado emocional del usuario, patrones de interacción y sugerencias de respuesta) y "
+                        "'memory' (categoría, importancia de 0.0 a 1.0, etiquetas y razón para guardar el mensaje como memoria). "
+                        f"El JSON debe cumplir este esquema: {json.dumps(TURN_ANALYSIS_SCHEMA, ensure_ascii=False)} "
+                        "Responde SOLO con el JSON, sin texto adicional."
+                    )},
+                    {"role": "user", "content": f"Contexto:\n{context}\n\nMensaje actual: {text}"}
+                ],
+                temperature=0.3,
+                response_format={"type": "json_object"}
+            )
+            
+            analysis, fallbacks = self._validate_turn_analysis(json.loads(response.choices[0].message.content))
+            
+            # Registrar métricas
+            self.metrics.record_api_usage("turn_analysis", response.usage.total_tokens)
+            self.metrics.record_response_time("turn_analysis", (time.time() - start_time) * 1000)
+            self.metrics.record_emotion(analysis["emotion"]["emotion"])
+            if fallbacks:
+                self.metrics.record_error("turn_analysis_fields")
+                self.logger.log_error("turn_analysis", f"Campos inválidos o ausentes: {', '.join(fallbacks)}")
+            
+            # Registrar en logs
+            self.logger.log_emotion_analysis(text, analysis["emotion"])
+            self.logger.log_context_analysis(text, recent_memories, analysis["context"])
+            
+            return analysis
+        except Exception as e:
+            self.metrics.record_error("turn_analysis")
+            self.logger.log_error("turn_analysis", str(e))
+            return copy.deepcopy(self.DEFAULT_TURN_ANALYSIS)
@@ -0,0 +1,56 @@
+import re
+
+# Fin de frase o de cláusula seguido de espacio (el espacio confirma que el token ya terminó)
+BOUNDARY = re.compile(r'[.!?…;:]+["»”’\')\]]*(?=\s)|\n+')
+# Abreviaturas tras las que un punto no cierra la frase
+ABBREVIATIONS = {"sr", "sra", "srta", "dr", "dra", "etc", "ej", "vs", "mr", "mrs", "ud", "uds", "aprox", "núm", "pág"}
+
+class SentenceSegmenter:
+    def __init__(self, min_chars=12, max_chars=200):
+        # Fragmentos más cortos se juntan con el siguiente para no sintetizar trozos sueltos
+        self.min_chars = min_chars
+        # Si una frase se alarga sin puntuación se corta en la última coma o espacio
+        self.max_chars = max_chars
+        self._buffer = ""
+
+    def _is_abbreviation(self, end):
+        """Indica si el punto que termina en end pertenece a una abreviatura"""
+        if self._buffer[end - 1] != '.':
+            return False
+        words = self._buffer[:end - 1].split()
+        return bool(words) and words[-1].lower().strip('¿¡("') in ABBREVIATIONS
+
+    def feed(self, token):
+        """Añade texto generado y devuelve las frases que ya están completas"""
+        self._buffer += token
+        sentences = []
+        position = 0
+        for match in BOUNDARY.finditer(self._buffer):
+            end = match.end()
+            if self._is_abbreviation(end) or len(self._buffer[position:end].strip()) < self.min_chars:
+                continue
+            sentences.append(self._buffer[position:end].strip())
+            position = end
+        self._buffer = self._buffer[position:]
+
+        while len(self._buffer) > self.max_chars:
+            cut = max(self._buffer.rfind(', ', 0, self.max_chars) + 1, self._buffer.rfind(' ', 0, self.max_chars))
+            if cut <= 0:
+                cut = self.max_chars
+            sentences.append(self._buffer[:cut].strip())
+            self._buffer = self._buffer[cut:]
+        return [sentence for sentence in sentences if sentence]
+
+    def flush(self):
+        """Devuelve el texto que quedaba pendiente al terminar la generación"""
+        rest = self._buffer.strip()
+        self._buffer = ""
+        return rest or None
+
+    def segment(self, tokens):
+        """Convierte un flujo de tokens en un flujo de frases"""
+        for token in tokens:
+            yield from self.feed(token)
+        rest = self.flush()
+        if rest:
+            yield rest
@@ -0,0 +1,265 @@
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+import constants
+from .memory_consolidation import retention_scores, age_in_days
+
+CATEGORIES = ("personal", "temporal", "importante")
+
+class SQLiteMemoryManager:
+    def __init__(self, memory_path, max_per_list=50):
+        self.memory_path = memory_path
+        self.db_file = os.path.join(memory_path, "memory.db")
+        self.max_per_list = max_per_list
+        os.makedirs(memory_path, exist_ok=True)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(self.db_file, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self._setup_database()
+
+    def _setup_database(self):
+        """Crea las tablas e índices y activa el modo WAL"""
+        with self._lock, self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.executescript("""
+                CREATE TABLE IF NOT EXISTS conversations (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    timestamp TEXT NOT NULL,
+                    user_input TEXT,
+                    bot_response TEXT,
+                    category TEXT,
+                    importance REAL,
+                    in_general INTEGER NOT NULL DEFAULT 1,
+                    in_category INTEGER NOT NULL DEFAULT 0
+                );
+                CREATE INDEX IF NOT EXISTS idx_conversations_general ON conversations(in_general, id);
+                CREATE INDEX IF NOT EXISTS idx_conversations_category ON conversations(category, in_category, id);
+                CREATE INDEX IF NOT EXISTS idx_conversations_importance ON conversations(in_category, importance);
+                CREATE INDEX IF NOT EXISTS idx_conversations_timestamp ON conversations(timestamp);
+
+                CREATE TABLE IF NOT EXISTS facts (
+                    key TEXT PRIMARY KEY,
+                    value TEXT,
+                    category TEXT,
+                    importance REAL,
+                    timestamp TEXT
+                );
+                CREATE INDEX IF NOT EXISTS idx_facts_category ON facts(category);
+
+                CREATE TABLE IF NOT EXISTS preferences (
+                    key TEXT PRIMARY KEY,
+                    value TEXT,
+                    timestamp TEXT
+                );
+
+                CREATE TABLE IF NOT EXISTS meta (
+                    key TEXT PRIMARY KEY,
+                    value TEXT
+                );
+            """)
+
+    @staticmethod
+    def _conversation_from_row(row):
+        return {
+            "timestamp": row["timestamp"],
+            "user_input": row["user_input"],
+            "bot_response": row["bot_response"],
+            "category": row["category"],
+            "importance": row["importance"]
+        }
+
+    def _insert_conversation(self, conversation, in_general=True, in_category=None):
+        """Inserta una conversación (debe llamarse dentro de una transacción)"""
+        category = conversation.get("category", "temporal")
+        if in_category is None:
+            in_category = category in CATEGORIES
+        self.conn.execute(
+            "INSERT INTO conversations (timestamp, user_input, bot_response, category, importance, in_general, in_category) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (conversation.get("timestamp"), conversation.get("user_input"), conversation.get("bot_response"),
+             category, conversation.get("importance", 0.5), int(in_general), int(in_category))
+        )
+
+    def _prune(self, category):
+        """Limita la lista general (por antigüedad) y la de la categoría (por puntuación)"""
+        self.conn.execute(
+            "UPDATE conversations SET in_general = 0 WHERE in_general = 1 AND id NOT IN "
+            "(SELECT id FROM conversations WHERE in_general = 1 ORDER BY id DESC LIMIT ?)",
+            (self.max_per_list,)
+        )
+        # En las categorías se expulsa por puntuación (importancia y recencia), no por antigüedad
+        rows = self.conn.execute(
+            "SELECT id, importance, timestamp FROM conversations WHERE category = ? AND in_category = 1",
+            (category,)
+        ).fetchall()
+        if len(rows) > self.max_per_list:
+            scores = retention_scores(
+                [row["importance"] if row["importance"] is not None else 0.5 for row in rows],
+                age_in_days([row["timestamp"] for row in rows]),
+                [0] * len(rows),
+                constants.MEMORY_SCORE_WEIGHTS,
+                constants.MEMORY_RECENCY_HALF_LIFE_DAYS
+            )
+            evicted = [rows[i]["id"] for i in scores.argsort()[:len(rows) - self.max_per_list]]
+            self.conn.executemany("UPDATE conversations SET in_category = 0 WHERE id = ?", [(i,) for i in evicted])
+        self.conn.execute("DELETE FROM conversations WHERE in_general = 0 AND in_category = 0")
+
+    def add_conversation(self, user_input, bot_response, category="temporal", importance=0.5):
+        """Añade una conversación a la memoria con categoría e importancia"""
+        conversation = {
+            "timestamp": datetime.now().isoformat(),
+            "user_input": user_input,
+            "bot_response": bot_response,
+            "category": category,
+            "importance": importance
+        }
+        with self._lock, self.conn:
+            self._insert_conversation(conversation)
+            self._prune(category)
+
+    def add_fact(self, key, value, category="temporal", importance=0.5):
+        """Añade un hecho a la memoria con categoría e importancia"""
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO facts (key, value, category, importance, timestamp) VALUES (?, ?, ?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), category, importance, datetime.now().isoformat())
+            )
+
+    def add_preference(self, key, value):
+        """Añade una preferencia del usuario"""
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO preferences (key, value, timestamp) VALUES (?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), datetime.now().isoformat())
+            )
+
+    def get_recent_conversations(self, limit=5, category=None):
+        """Obtiene las conversaciones más recientes, opcionalmente filtradas por categoría"""
+        with self._lock:
+            if category and category in CATEGORIES:
+                rows = self.conn.execute(
+                    "SELECT * FROM conversations WHERE category = ? AND in_category = 1 ORDER BY id DESC LIMIT ?",
+                    (category, limit)
+                ).fetchall()
+            else:
+                rows = self.conn.execute(
+                    "SELECT * FROM conversations WHERE in_general = 1 ORDER BY id DESC LIMIT ?",
+                    (limit,)
+                ).fetchall()
+        return [self._conversation_from_row(row) for row in reversed(rows)]
+
+    def get_summary(self):
+        """Obtiene el resumen acumulado de las conversaciones anteriores"""
+        with self._lock:
+            row = self.conn.execute("SELECT value FROM meta WHERE key = 'summary'").fetchone()
+        return json.loads(row["value"]) if row else None
+
+    def set_summary(self, summary):
+        """Guarda el resumen acumulado ({'text', 'through'})"""
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('summary', ?)",
+                (json.dumps(summary, ensure_ascii=False),)
+            )
+
+    @staticmethod
+    def _fact_from_row(row):
+        return {
+            "value": json.loads(row["value"]),
+            "category": row["category"],
+            "importance": row["importance"],
+            "timestamp": row["timestamp"]
+        }
+
+    def get_fact(self, key):
+        """Obtiene un hecho específico"""
+        with self._lock:
+            row = self.conn.execute("SELECT * FROM facts WHERE key = ?", (key,)).fetchone()
+        return self._fact_from_row(row) if row else None
+
+    def get_all_facts(self, category=None):
+        """Obtiene todos los hechos, opcionalmente filtrados por categoría"""
+        with self._lock:
+            if category:
+                rows = self.conn.execute("SELECT * FROM facts WHERE category = ?", (category,)).fetchall()
+            else:
+                rows = self.conn.execute("SELECT * FROM facts").fetchall()
+        return {row["key"]: self._fact_from_row(row) for row in rows}
+
+    def get_preference(self, key):
+        """Obtiene una preferencia específica del usuario"""
+        with self._lock:
+            row = self.conn.execute("SELECT * FROM preferences WHERE key = ?", (key,)).fetchone()
+        if not row:
+            return None
+        return {"value": json.loads(row["value"]), "timestamp": row["timestamp"]}
+
+    def get_important_memories(self, limit=5):
+        """Obtiene las memorias más importantes"""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT * FROM conversations WHERE in_category = 1 ORDER BY importance DESC LIMIT ?",
+                (limit,)
+            ).fetchall()
+        return [self._conversation_from_row(row) for row in rows]
+
+    def update_importance(self, memory_id, new_importance):
+        """Actualiza la importancia de una memoria"""
+        with self._lock, self.conn:
+            cursor = self.conn.execute(
+                "UPDATE conversations SET importance = ? WHERE id = "
+                "(SELECT id FROM conversations WHERE timestamp = ? AND in_category = 1 LIMIT 1)",
+                (new_importance, memory_id)
+            )
+        return cursor.rowcount > 0
+
+    def save_memory(self):
+        """Vuelca el WAL de SQLite a la base de datos"""
+        with self._lock:
+            self.conn.execute("PRAGMA wal_checkpoint(PASSIVE)")
+
+    def needs_migration(self):
+        """Indica si todavía no se ha importado la memoria JSON"""
+        with self._lock:
+            row = self.conn.execute("SELECT value FROM meta WHERE key = 'migrated'").fetchone()
+        return row is None
+
+    def migrate_from_json(self, memory):
+        """Importa una sola vez el documento de MemoryManager (formato JSON)"""
+        # La misma conversación aparece en la lista general y en la de su categoría
+        conversations = {}
+        for conversation in memory.get("conversations", []):
+            key = (conversation.get("timestamp"), conversation.get("user_input"))
+            conversations[key] = [conversation, True, False]
+        for category, items in memory.get("categories", {}).items():
+            for conversation in items:
+                key = (conversation.get("timestamp"), conversation.get("user_input"))
+                entry = conversations.setdefault(key, [dict(conversation, category=category), False, False])
+                entry[2] = True
+
+        with self._lock, self.conn:
+            for conversation, in_general, in_category in sorted(conversations.values(), key=lambda c: c[0].get("timestamp") or ""):
+                self._insert_conversation(conversation, in_general, in_category)
+            for key, fact in memory.get("facts", {}).items():
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO facts (key, value, category, importance, timestamp) VALUES (?, ?, ?, ?, ?)",
+                    (key, json.dumps(fact.get("value"), ensure_ascii=False), fact.get("category"),
+                     fact.get("importance"), fact.get("timestamp"))
+                )
+            for key, preference in memory.get("preferences", {}).items():
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO preferences (key, value, timestamp) VALUES (?, ?, ?)",
+                    (key, json.dumps(preference.get("value"), ensure_ascii=False), preference.get("timestamp"))
+                )
+            if memory.get("summary"):
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES ('summary', ?)",
+                    (json.dumps(memory["summary"], ensure_ascii=False),)
+                )
+            self.conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('migrated', ?)",
+                (datetime.now().isoformat(),)
+            )
@@ -1,8 +1,12 @@
+import time
 import speech_recognition as sr
 import numpy as np
 import sounddevice as sd
 import constants
 from scipy import signal
+from .audio_capture import AudioCapture
+from .vad import VoiceActivityDetector
+from .stt_backends import create_stt_backend, TranscribedAudio
 
 class SpeechToText:
     def __init__(self):
@@ -14,8 +18,48 @@ class SpeechToText:
         # Configuración del dispositivo de entrada
         self.input_device = constants.INPUT_INDEX
         
+        # Motor de transcripción (Google en remoto o Vosk local con resultados parciales)
+        self.backend = create_stt_backend(
+            constants.STT_BACKEND,
+            self.recognizer,
+            constants.STT_LANGUAGE,
+            sample_rate=constants.STT_SAMPLE_RATE,
+            vosk_model_path=constants.VOSK_MODEL_PATH
+        )
+        # on_partial(texto) se llama con cada hipótesis parcial mientras se sigue hablando
+        self.on_partial = None
+        
+        # Captura continua: un solo InputStream escribe en un anillo y las frases se recortan de él
+        self.capture = None
+        if constants.STT_CAPTURE_MODE == "stream":
+            self.capture = AudioCapture(
+                device=constants.VOICEMEETER_INPUT_INDEX,
+                sample_rate=constants.STT_SAMPLE_RATE,
+                block_ms=constants.STT_BLOCK_MS,
+                ring_seconds=constants.STT_RING_SECONDS
+            ).start()
+            # Detector de voz por tramas que decide dónde empieza y termina cada frase
+            self.vad = VoiceActivityDetector(
+                sample_rate=constants.STT_SAMPLE_RATE,
+                frame_ms=constants.STT_BLOCK_MS,
+                hangover_ms=constants.VAD_HANGOVER_MS,
+                min_speech_ms=constants.VAD_MIN_SPEECH_MS,
+                max_utterance_ms=constants.STT_MAX_UTTERANCE_SECONDS * 1000,
+                margin_db=constants.VAD_MARGIN_DB
+            )
+            # Posición del anillo hasta la que ya se ha escuchado (se mantiene entre frases)
+            self._cursor = self.capture.ring.write_pos
+            # Posición del anillo que corresponde a la trama 0 del detector
+            self._vad_origin = self._cursor
+        
     def adjust_for_ambient_noise(self, duration=1):
         """Ajusta el umbral de ruido según el ambiente"""
+        if self.capture is not None:
+            samples = int(duration * self.capture.sample_rate)
+            self.capture.wait_for(self.capture.ring.write_pos + samples, timeout=duration + 1)
+            self.vad.set_noise_floor(self.capture.latest(samples))
+            print(f"Ruido de fondo ajustado a: {self.vad.noise_floor:.1f} dBFS")
+            return
         with sr.Microphone(device_index=self.input_device) as source:
             print("Ajustando al ruido ambiente...")
             self.recognizer.adjust_for_ambient_noise(source, duration=duration)
@@ -23,6 +67,8 @@ class SpeechToText:
 
     def listen(self):
         """Escucha el audio y lo convierte a texto"""
+        if self.capture is not None:
+            return self._listen_stream()
         try:
             with sr.Microphone(device_index=self.input_device) as source:
                 print("Escuchando...")
@@ -32,25 +78,90 @@ class SpeechToText:
             print(f"Error al escuchar: {str(e)}")
             return None
 
+    def _listen_stream(self, timeout=1.0):
+        """Recorta la siguiente frase del anillo de captura
+
+        Recorre los bloques desde donde terminó la frase anterior, así que no se
+        pierde audio entre turnos; el detector de voz decide el inicio y el final.
+        Devuelve None si no empieza ninguna frase antes de timeout para que el
+        bucle principal pueda comprobar si debe parar.
+        """
+        capture = self.capture
+        ring = capture.ring
+        block = capture.block_size
+        frame = self.vad.frame_size
+        preroll = capture.sample_rate * constants.STT_PREROLL_MS // 1000
+        deadline = time.monotonic() + timeout
+        # Sesión del motor en streaming para la frase en curso y hasta dónde se le ha dado audio
+        session = None
+        fed = None
+
+        while True:
+            written = capture.wait_for(self._cursor + block, timeout)
+            if self._cursor < ring.oldest():
+                # El consumidor se ha quedado atrás más de lo que cabe en el anillo
+                self._cursor = self._vad_origin = ring.oldest()
+                self.vad.reset()
+                session = None
+            available = (written - self._cursor) // frame * frame
+            if available:
+                # Todas las tramas pendientes van juntas al detector (características vectorizadas)
+                utterances = self.vad.process(ring.view(self._cursor, self._cursor + available))
+                self._cursor += available
+                if self.backend.streaming:
+                    if session is None and (self.vad.in_utterance or utterances):
+                        first = utterances[0][0] if utterances else self.vad.utterance_start
+                        session = self.backend.start()
+                        fed = max(ring.oldest(), self._vad_origin + first * frame - preroll)
+                    if session is not None:
+                        # El motor avanza mientras se habla; solo recibe el audio nuevo
+                        feed_end = self._vad_origin + utterances[0][1] * frame if utterances else self._cursor
+                        if feed_end > fed:
+                            partial = session.accept(ring.view(fed, feed_end))
+                            fed = feed_end
+                            if partial and self.on_partial:
+                                self.on_partial(partial)
+                if utterances:
+                    first, last = utterances[0]
+                    start = max(ring.oldest(), self._vad_origin + first * frame - preroll)
+                    end = self._vad_origin + last * frame
+                    # Lo que quede tras esta frase se vuelve a analizar en la siguiente llamada
+                    self._cursor = self._vad_origin = end
+                    self.vad.reset()
+                    # Vista del anillo (sin copia); los bytes se sacan solo al entregarla a SpeechRecognition
+                    frame_data = ring.view(start, end).tobytes()
+                    if session is not None:
+                        # La transcripción final ya está lista al cerrar la frase
+                        return TranscribedAudio(frame_data, capture.sample_rate, 2, session.finish())
+                    return sr.AudioData(frame_data, capture.sample_rate, 2)
+            if not self.vad.in_utterance and time.monotonic() >= deadline:
+                return None
+
     def transcribe(self, audio):
         """Transcribe el audio a texto"""
-        try:
-            text = self.recognizer.recognize_google(audio, language=constants.STT_LANGUAGE)
+        if isinstance(audio, TranscribedAudio):
+            # El motor en streaming ya la transcribió mientras se hablaba
+            text = audio.transcript
+        else:
+            text = self.backend.transcribe(audio)
+        if text:
             print(f"Texto reconocido: {text}")
-            return text
-        except sr.UnknownValueError:
-            print("No se pudo entender el audio")
-            return None
-        except sr.RequestError as e:
-            print(f"Error en la solicitud a Google Speech Recognition: {str(e)}")
-            return None
+        return text
 
     def get_audio_level(self):
         """Obtiene el nivel de audio actual para ajuste de ruido"""
+        if self.capture is not None:
+            # Últimos 0,5 s del anillo, sin abrir el dispositivo otra vez
+            return float(np.abs(self.capture.latest(self.capture.sample_rate // 2)).mean())
         try:
             with sr.Microphone(device_index=self.input_device) as source:
                 audio = self.recognizer.listen(source, timeout=0.5)
                 data = np.frombuffer(audio.get_raw_data(), dtype=np.int16)
                 return np.abs(data).mean()
         except:
-            return 0 
\ No newline at end of file
+            return 0
+
+    def close(self):
+        """Cierra la captura continua"""
+        if self.capture is not None:
+            self.capture.stop() 
\ No newline at end of file
@@ -0,0 +1,86 @@
+import json
+import numpy as np
+import speech_recognition as sr
+
+try:
+    from vosk import Model, KaldiRecognizer, SetLogLevel
+except ImportError:
+    Model = KaldiRecognizer = SetLogLevel = None
+
+def create_stt_backend(name, recognizer, language, sample_rate=16000, vosk_model_path=None):
+    """Crea el motor de transcripción según constants.STT_BACKEND ("google" o "vosk")"""
+    if name == "vosk":
+        return VoskSTTBackend(vosk_model_path, sample_rate)
+    return GoogleSTTBackend(recognizer, language)
+
+class TranscribedAudio(sr.AudioData):
+    """Audio de una frase que ya trae su transcripción (motores en streaming)"""
+    def __init__(self, frame_data, sample_rate, sample_width, transcript=None):
+        super().__init__(frame_data, sample_rate, sample_width)
+        self.transcript = transcript
+
+class GoogleSTTBackend:
+    # Transcribe la frase completa al terminar; no da resultados parciales
+    streaming = False
+
+    def __init__(self, recognizer, language):
+        self.recognizer = recognizer
+        self.language = language
+
+    def transcribe(self, audio):
+        """Transcribe una frase completa; None si no se entiende"""
+        try:
+            return self.recognizer.recognize_google(audio, language=self.language)
+        except sr.UnknownValueError:
+            print("No se pudo entender el audio")
+            return None
+        except sr.RequestError as e:
+            print(f"Error en la solicitud a Google Speech Recognition: {str(e)}")
+            return None
+
+class VoskSession:
+    def __init__(self, recognizer):
+        self.recognizer = recognizer
+        # Tramos que Vosk ya ha cerrado por su cuenta dentro de la frase
+        self._segments = []
+        self.partial = ""
+
+    def accept(self, samples):
+        """Añade audio int16 y devuelve la hipótesis parcial de toda la frase"""
+        if self.recognizer.AcceptWaveform(samples.tobytes()):
+            text = json.loads(self.recognizer.Result()).get("text", "")
+            if text:
+                self._segments.append(text)
+            current = ""
+        else:
+            current = json.loads(self.recognizer.PartialResult()).get("partial", "")
+        self.partial = " ".join(self._segments + ([current] if current else []))
+        return self.partial
+
+    def finish(self):
+        """Cierra la frase y devuelve la transcripción final (None si está vacía)"""
+        text = json.loads(self.recognizer.FinalResult()).get("text", "")
+        if text:
+            self._segments.append(text)
+        return " ".join(self._segments) or None
+
+class VoskSTTBackend:
+    # Local y solo CPU: procesa el audio mientras se habla y da hipótesis parciales
+    streaming = True
+
+    def __init__(self, model_path, sample_rate=16000):
+        if Model is None:
+            raise RuntimeError("STT_BACKEND='vosk' necesita el paquete vosk (pip install vosk)")
+        SetLogLevel(-1)
+        self.model = Model(model_path)
+        self.sample_rate = sample_rate
+
+    def start(self):
+        """Abre una sesión para una frase nueva"""
+        return VoskSession(KaldiRecognizer(self.model, self.sample_rate))
+
+    def transcribe(self, audio):
+        """Transcribe una frase completa (p. ej. capturada con sr.Microphone)"""
+        session = self.start()
+        session.accept(np.frombuffer(audio.get_raw_data(convert_rate=self.sample_rate, convert_width=2), dtype=np.int16))
+        return session.finish()
@@ -5,6 +5,8 @@ import numpy as np
 from scipy.io import wavfile
 import tempfile
 import os
+import queue
+import threading
 from scipy import signal
 
 class TextToSpeech:
@@ -110,36 +112,75 @@ class TextToSpeech:
     def speak(self, text):
         """Convierte texto a voz y lo reproduce"""
         try:
-            # Crear archivo temporal para el audio
-            with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as temp_file:
-                temp_filename = temp_file.name
+            audio = self._synthesize(text)
+            if audio is not None:
+                self._play(*audio)
+        except Exception as e:
+            print(f"Error en TTS: {str(e)}")
 
+    def speak_stream(self, sentences, on_start=None):
+        """Sintetiza y reproduce frases a medida que llegan
+
+        Mientras suena la frase N, este hilo ya está sacando (y por tanto
+        generando) la N+1 y sintetizándola. Devuelve las frases pronunciadas.
+        """
+        spoken = []
+        ready = queue.Queue(maxsize=constants.TTS_STREAM_BUFFER)
+
+        def player():
+            started = False
+            while True:
+                audio = ready.get()
+                if audio is None:
+                    return
+                if not started and on_start:
+                    started = True
+                    on_start()
+                self._play(*audio)
+
+        thread = threading.Thread(target=player, daemon=True)
+        thread.start()
+        try:
+            for sentence in sentences:
+                try:
+                    audio = self._synthesize(sentence)
+                except Exception as e:
+                    print(f"Error en TTS: {str(e)}")
+                    continue
+                if audio is not None:
+                    # Solo cuenta como dicha la frase que se ha podido sintetizar
+                    spoken.append(sentence)
+                    ready.put(audio)
+        finally:
+            ready.put(None)
+            thread.join()
+        return spoken
+
+    def _synthesize(self, text):
+        """Genera el audio procesado de un texto; devuelve (audio, sample_rate)"""
+        # Crear archivo temporal para el audio
+        with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as temp_file:
+            temp_filename = temp_file.name
+
+        try:
             # Generar audio
             self.engine.save_to_file(text, temp_filename)
             self.engine.runAndWait()
 
-            # Procesar y reproducir audio
-            self._play_audio(temp_filename)
-
+            # Cargar y procesar el audio
+            sample_rate, audio_data = wavfile.read(temp_filename)
+            if len(audio_data) == 0:
+                return None
+            return self._process_audio(audio_data, sample_rate), sample_rate
+        finally:
             # Limpiar archivo temporal
             os.unlink(temp_filename)
 
-        except Exception as e:
-            print(f"Error en TTS: {str(e)}")
-
-    def _play_audio(self, filename):
-        """Reproduce el archivo de audio a través del dispositivo especificado"""
+    def _play(self, audio, sample_rate):
+        """Reproduce audio procesado a través del dispositivo especificado"""
         try:
-            # Cargar archivo de audio
-            sample_rate, audio_data = wavfile.read(filename)
-            
-            # Procesar el audio
-            processed_audio = self._process_audio(audio_data, sample_rate)
-            
-            # Reproducir audio procesado
-            sd.play(processed_audio, sample_rate, device=self.output_device)
+            sd.play(audio, sample_rate, device=self.output_device)
             sd.wait()  # Esperar a que termine la reproducción
-
         except Exception as e:
             print(f"Error al reproducir audio: {str(e)}")
 
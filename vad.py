@@ -0,0 +1,109 @@
+from collections import deque
+import numpy as np
+
+class VoiceActivityDetector:
+    def __init__(self, sample_rate=16000, frame_ms=30, hangover_ms=450, min_speech_ms=90,
+                 max_utterance_ms=20000, margin_db=6.0, max_flatness=0.5, fricative_zcr=0.25,
+                 noise_adaptation=0.05, noise_window_ms=1000, noise_percentile=10):
+        self.sample_rate = sample_rate
+        self.frame_size = sample_rate * frame_ms // 1000
+        # Silencio seguido que cierra una frase (más alto = más paciente con las pausas)
+        self.hangover_frames = max(1, hangover_ms // frame_ms)
+        # Voz seguida necesaria para abrir una frase (descarta golpes y chasquidos)
+        self.min_speech_frames = max(1, min_speech_ms // frame_ms)
+        self.max_utterance_frames = max(1, max_utterance_ms // frame_ms)
+        # Decibelios por encima del ruido de fondo para considerar que hay voz
+        self.margin_db = margin_db
+        # Por encima de esta planitud espectral la trama suena a ruido, no a voz sonora
+        self.max_flatness = max_flatness
+        # Cruces por cero a partir de los que una trama fuerte cuenta como fricativa (s, f, j)
+        self.fricative_zcr = fricative_zcr
+        # Velocidad con la que el ruido de fondo sigue a las tramas sin voz
+        self.noise_adaptation = noise_adaptation
+        # Si el ruido baja se sigue un percentil bajo de las últimas tramas y no la más
+        # silenciosa: un hueco o un corte del audio no arrastra el ruido de fondo
+        self.noise_percentile = noise_percentile
+        self._recent_energy = deque(maxlen=max(1, noise_window_ms // frame_ms))
+        self._window = np.hanning(self.frame_size).astype(np.float32)
+        self.noise_floor = None
+        self.reset()
+
+    def reset(self):
+        """Vuelve al estado sin frase abierta (conserva el ruido de fondo aprendido)"""
+        # Tramas procesadas desde el arranque (posición absoluta)
+        self.frame_count = 0
+        self.in_utterance = False
+        self.utterance_start = None
+        self._speech_run = 0
+        self._silence_run = 0
+
+    def set_noise_floor(self, samples):
+        """Fija el ruido de fondo a partir de audio sin voz"""
+        frames = self._frames(samples)
+        if len(frames):
+            self.noise_floor = float(np.median(self.features(frames)[0]))
+            self._recent_energy.clear()
+
+    def _frames(self, samples):
+        usable = len(samples) - len(samples) % self.frame_size
+        return samples[:usable].reshape(-1, self.frame_size)
+
+    def features(self, frames):
+        """Energía (dBFS), tasa de cruces por cero y planitud espectral de cada trama"""
+        frames = frames.astype(np.float32) / 32768.0
+        energy = 10 * np.log10(np.mean(frames * frames, axis=1) + 1e-10)
+        signs = np.signbit(frames)
+        zcr = np.mean(signs[:, 1:] != signs[:, :-1], axis=1)
+        power = np.abs(np.fft.rfft(frames * self._window, axis=1)) ** 2 + 1e-12
+        flatness = np.exp(np.mean(np.log(power), axis=1)) / np.mean(power, axis=1)
+        return energy, zcr, flatness
+
+    def classify(self, frames):
+        """Decide trama a trama si hay voz, adaptando el ruido de fondo en las que no la tienen"""
+        energy, zcr, flatness = self.features(frames)
+        if self.noise_floor is None:
+            self.noise_floor = float(energy[0])
+        speech = np.zeros(len(frames), dtype=bool)
+        # Las características van vectorizadas; solo el seguimiento del ruido es secuencial
+        for i in range(len(frames)):
+            above = energy[i] - self.noise_floor
+            voiced = above > self.margin_db and flatness[i] < self.max_flatness
+            fricative = above > 2 * self.margin_db and zcr[i] > self.fricative_zcr
+            speech[i] = voiced or fricative
+            self._recent_energy.append(float(energy[i]))
+            if energy[i] < self.noise_floor:
+                # Si el ruido baja se sigue enseguida (hasta el percentil bajo de la ventana)
+                self.noise_floor = min(self.noise_floor, float(np.percentile(self._recent_energy, self.noise_percentile)))
+            elif not speech[i]:
+                self.noise_floor += self.noise_adaptation * (float(energy[i]) - self.noise_floor)
+        return speech
+
+    def process(self, samples):
+        """Procesa audio (múltiplo de frame_size) y devuelve las frases cerradas
+
+        Cada frase es (trama_inicial, trama_final) en posiciones absolutas de
+        trama, con el final exclusivo y sin contar la cola de silencio.
+        """
+        utterances = []
+        for is_speech in self.classify(self._frames(samples)):
+            self.frame_count += 1
+            if not self.in_utterance:
+                self._speech_run = self._speech_run + 1 if is_speech else 0
+                if self._speech_run >= self.min_speech_frames:
+                    self.in_utterance = True
+                    self.utterance_start = self.frame_count - self._speech_run
+                    self._silence_run = 0
+                continue
+
+            self._silence_run = 0 if is_speech else self._silence_run + 1
+            if self._silence_run >= self.hangover_frames:
+                utterances.append((self.utterance_start, self.frame_count - self._silence_run))
+                self.in_utterance = False
+                self._speech_run = 0
+            elif self.frame_count - self.utterance_start >= self.max_utterance_frames:
+                # Frase demasiado larga: se corta aquí y, si sigue la voz, empieza otra
+                utterances.append((self.utterance_start, self.frame_count))
+                self.in_utterance = bool(is_speech)
+                self.utterance_start = self.frame_count
+                self._speech_run = self._silence_run = 0
+        return utterances
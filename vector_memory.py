@@ -0,0 +1,308 @@
+import copy
+import numpy as np
+
+STORAGE_DTYPES = {
+    'float32': np.float32,
+    'float16': np.float16,
+    'int8': np.int8
+}
+
+class _DecodedRows:
+    """Vista de solo lectura que decodifica a float32 solo las filas que se piden"""
+
+    def __init__(self, memory):
+        self._memory = memory
+        self.shape = (len(memory), memory.dimension or 0)
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, rows):
+        if isinstance(rows, slice):
+            rows = slice(*rows.indices(self.shape[0]))
+        return self._memory.vectors(rows)
+
+
+class VectorMemory:
+    def __init__(self, dimension=None, initial_capacity=256, index=None, dtype='float32',
+                 rescorer=None, rescore_oversample=4, chunk_size=8192):
+        self.dimension = dimension
+        # Índice ANN opcional; sin él la búsqueda es exacta por fuerza bruta
+        self.index = index
+        # Formato en RAM: float32, float16 o int8 con una escala por vector
+        self.dtype = dtype
+        # Función que devuelve los embeddings float32 exactos de unas filas del fichero
+        self.rescorer = rescorer
+        self.rescore_oversample = rescore_oversample
+        self.chunk_size = chunk_size
+        self.entries = []
+        self._capacity = 0
+        self._matrix = None
+        self._scales = None
+        self._importance = None
+        # Veces que cada memoria ha sido recuperada (para la consolidación)
+        self._access = None
+        # Fila del fichero de embeddings en la que está guardada cada memoria
+        self._file_rows = None
+        # Cuenta las compactaciones: invalida los índices entrenados sobre una instantánea anterior
+        self._removals = 0
+        if dimension:
+            self._allocate(dimension, initial_capacity)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _allocate(self, dimension, capacity):
+        """Reserva la matriz contigua de embeddings y los vectores paralelos"""
+        self.dimension = dimension
+        self._capacity = max(capacity, 1)
+        self._matrix = np.zeros((self._capacity, dimension), dtype=STORAGE_DTYPES[self.dtype])
+        self._scales = np.ones(self._capacity, dtype=np.float32)
+        self._importance = np.zeros(self._capacity, dtype=np.float32)
+        self._access = np.zeros(self._capacity, dtype=np.float32)
+        self._file_rows = np.zeros(self._capacity, dtype=np.int64)
+
+    def _arrays(self):
+        return ('_matrix', '_scales', '_importance', '_access', '_file_rows')
+
+    def _ensure_capacity(self, size):
+        """Amplía la capacidad duplicándola para que añadir sea O(1) amortizado"""
+        if size <= self._capacity:
+            return
+        new_capacity = max(size, self._capacity * 2)
+        count = len(self.entries)
+        for name in self._arrays():
+            old = getattr(self, name)
+            new = np.zeros((new_capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:count] = old[:count]
+            setattr(self, name, new)
+        self._capacity = new_capacity
+
+    @staticmethod
+    def normalize(embedding):
+        """Convierte un embedding a float32 con norma unitaria"""
+        vector = np.asarray(embedding, dtype=np.float32).reshape(-1)
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector = vector / norm
+        return vector
+
+    def _quantize(self, vectors):
+        """Convierte vectores float32 al formato en RAM; devuelve (códigos, escalas)"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if self.dtype == 'int8':
+            # Una escala por vector para aprovechar todo el rango [-127, 127]
+            scales = np.abs(vectors).max(axis=-1) / 127.0
+            scales = np.where(scales > 0, scales, 1.0).astype(np.float32)
+            return np.rint(vectors / scales[..., None]).astype(np.int8), scales
+        return vectors.astype(STORAGE_DTYPES[self.dtype]), np.ones(vectors.shape[:-1], dtype=np.float32)
+
+    def vectors(self, rows):
+        """Devuelve en float32 los embeddings de las filas indicadas"""
+        if self.dtype == 'float32':
+            return self._matrix[rows]
+        vectors = self._matrix[rows].astype(np.float32)
+        if self.dtype == 'int8':
+            vectors *= self._scales[rows][..., None]
+        return vectors
+
+    def add(self, entry, embedding, file_row=None):
+        """Añade una memoria y su embedding normalizado al final de la matriz"""
+        vector = self.normalize(embedding)
+        if self._matrix is None:
+            self._allocate(vector.shape[0], 256)
+        count = len(self.entries)
+        self._ensure_capacity(count + 1)
+        self._matrix[count], self._scales[count] = self._quantize(vector)
+        self._importance[count] = float(entry.get('importance', 0.5))
+        self._access[count] = float(entry.get('access_count', 0))
+        self._file_rows[count] = count if file_row is None else file_row
+        self.entries.append(entry)
+        if self.index is not None:
+            # El (re)entrenamiento no se hace aquí: ver needs_index_training() y swap_index()
+            self.index.add(count, vector)
+
+    def load(self, entries):
+        """Construye la matriz de golpe a partir de entradas con 'embedding' en lista"""
+        valid = [e for e in entries if e.get('embedding')]
+        self.entries = []
+        if not valid:
+            return
+        matrix = np.asarray([e['embedding'] for e in valid], dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        # El embedding vive solo en la matriz, no en las entradas
+        self.load_matrix([{k: v for k, v in e.items() if k != 'embedding'} for e in valid], matrix / norms)
+
+    def load_matrix(self, entries, matrix, first_file_row=0):
+        """Copia por bloques una matriz ya normalizada (p. ej. un memmap) al buffer interno"""
+        self.entries = []
+        count = len(entries)
+        if count == 0:
+            return
+        self._allocate(matrix.shape[1], max(count, 256))
+        for start in range(0, count, self.chunk_size):
+            end = min(start + self.chunk_size, count)
+            self._matrix[start:end], self._scales[start:end] = self._quantize(matrix[start:end])
+        self._importance[:count] = [float(e.get('importance', 0.5)) for e in entries]
+        self._access[:count] = [float(e.get('access_count', 0)) for e in entries]
+        self._file_rows[:count] = np.arange(first_file_row, first_file_row + count)
+        self.entries = list(entries)
+
+    def rows(self):
+        """Devuelve las memorias vivas como matriz float32 (decodificada bajo demanda)"""
+        if self._matrix is None:
+            return np.zeros((0, self.dimension or 0), dtype=np.float32)
+        if self.dtype == 'float32':
+            return self._matrix[:len(self.entries)]
+        return _DecodedRows(self)
+
+    def snapshot(self):
+        """Copia de las memorias vivas (e índice) para recorrerlas sin bloquear la original"""
+        count = len(self.entries)
+        snapshot = VectorMemory(index=copy.deepcopy(self.index), dtype=self.dtype, chunk_size=self.chunk_size)
+        snapshot.dimension = self.dimension
+        if self._matrix is not None:
+            for name in self._arrays():
+                setattr(snapshot, name, getattr(self, name)[:count].copy())
+            snapshot._capacity = count
+        snapshot.entries = list(self.entries)
+        snapshot._removals = self._removals
+        return snapshot
+
+    def needs_index_training(self):
+        """Indica si el índice ANN debe (re)entrenarse para el tamaño actual"""
+        return self.index is not None and self.index.needs_training(len(self.entries))
+
+    def swap_index(self, index, snapshot):
+        """Sustituye el índice por uno entrenado sobre snapshot y le añade las filas posteriores
+
+        Devuelve False (y conserva el actual) si desde la instantánea se han eliminado memorias.
+        """
+        if snapshot._removals != self._removals:
+            return False
+        for row in range(len(snapshot), len(self.entries)):
+            index.add(row, self.vectors(row))
+        self.index = index
+        return True
+
+    def file_rows(self):
+        """Devuelve la fila del fichero de embeddings de cada memoria viva"""
+        if self._file_rows is None:
+            return np.zeros(0, dtype=np.int64)
+        return self._file_rows[:len(self.entries)]
+
+    def renumber_file_rows(self):
+        """Tras compactar el fichero cada memoria pasa a ocupar la fila de su posición"""
+        if self._file_rows is not None:
+            self._file_rows[:len(self.entries)] = np.arange(len(self.entries))
+
+    def nbytes(self):
+        """Memoria residente ocupada por los embeddings (y sus escalas)"""
+        if self._matrix is None:
+            return 0
+        count = len(self.entries)
+        total = self._matrix[:count].nbytes
+        if self.dtype == 'int8':
+            total += self._scales[:count].nbytes
+        return total
+
+    def truncate(self, max_items):
+        """Conserva solo las últimas max_items memorias (None = sin límite)"""
+        count = len(self.entries)
+        if not max_items or count <= max_items:
+            return
+        self.remove(np.arange(count - max_items))
+
+    def remove(self, rows):
+        """Elimina memorias por posición compactando la matriz"""
+        count = len(self.entries)
+        keep = np.ones(count, dtype=bool)
+        keep[np.asarray(rows, dtype=np.int64)] = False
+        kept = int(keep.sum())
+        if kept == count:
+            return
+        for name in self._arrays():
+            array = getattr(self, name)
+            array[:kept] = array[:count][keep]
+        self.entries = [entry for entry, k in zip(self.entries, keep) if k]
+        self._removals += 1
+        if self.index is not None:
+            self.index.remove(np.flatnonzero(~keep))
+
+    def importances(self):
+        """Devuelve la vista del vector de importancias de las memorias vivas"""
+        return self._importance[:len(self.entries)]
+
+    def access_counts(self):
+        """Devuelve la vista del contador de accesos de las memorias vivas"""
+        return self._access[:len(self.entries)]
+
+    def update(self, index, entry, access_count=None):
+        """Sustituye la entrada de una memoria manteniendo su embedding"""
+        self.entries[index] = entry
+        self._importance[index] = float(entry.get('importance', 0.5))
+        if access_count is not None:
+            self._access[index] = access_count
+
+    def embedding(self, index):
+        """Devuelve el embedding normalizado de una memoria"""
+        return self.vectors(index)
+
+    def _score_all(self, query):
+        """Similitud coseno de todas las memorias sin descomprimir la matriz entera
+
+        En float16 la conversión por bloques domina el coste (~6x float32); int8
+        también se convierte pero la escala se aplica al final sobre las puntuaciones.
+        """
+        count = len(self.entries)
+        if self.dtype == 'float32':
+            return self._matrix[:count] @ query
+        scores = np.empty(count, dtype=np.float32)
+        for start in range(0, count, self.chunk_size):
+            end = min(start + self.chunk_size, count)
+            scores[start:end] = self._matrix[start:end].astype(np.float32) @ query
+        if self.dtype == 'int8':
+            scores *= self._scales[:count]
+        return scores
+
+    @staticmethod
+    def _top(scores, k):
+        """Posiciones de las k puntuaciones más altas, de mayor a menor"""
+        if k < scores.shape[0]:
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(scores.shape[0])
+        return top[np.argsort(-scores[top])]
+
+    def search(self, query_embedding, max_items=5):
+        """Devuelve las memorias más similares ponderadas por importancia"""
+        count = len(self.entries)
+        if count == 0:
+            return []
+
+        query = self.normalize(query_embedding)
+        if self.index is not None and self.index.is_trained:
+            # Solo se puntúan las filas de las listas invertidas más cercanas
+            rows = self.index.candidates(query)
+            scores = self.vectors(rows) @ query
+        else:
+            # Similitud coseno de todas las memorias en un solo producto matriz-vector
+            rows = np.arange(count)
+            scores = self._score_all(query)
+        scores *= 1.0 + self._importance[rows]
+
+        k = min(max_items, rows.shape[0])
+        if k == 0:
+            return []
+        rescore = self.rescorer is not None and self.dtype != 'float32'
+        if rescore:
+            # Con vectores comprimidos se preseleccionan más candidatos y se reordenan en float32
+            top = rows[self._top(scores, min(k * self.rescore_oversample, rows.shape[0]))]
+            exact = self.rescorer(self._file_rows[top]) @ query
+            exact *= 1.0 + self._importance[top]
+            top = top[self._top(exact, k)]
+        else:
+            top = rows[self._top(scores, k)]
+        self._access[top] += 1
+        return [self.entries[i] for i in top]
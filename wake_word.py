@@ -0,0 +1,196 @@
+import glob
+import os
+import sys
+import wave
+import numpy as np
+
+# Nombres por los que se llama al bot (los mismos que busca _is_directed_to_bot)
+WAKE_WORDS = ["elenia", "elena", "elen", "nena", "helen", "hellen", "ellen"]
+
+class MFCCExtractor:
+    def __init__(self, sample_rate=16000, frame_ms=25, hop_ms=10, n_mels=26, n_coeffs=13):
+        self.sample_rate = sample_rate
+        self.frame_size = sample_rate * frame_ms // 1000
+        self.hop_size = sample_rate * hop_ms // 1000
+        self.n_fft = 1 << (self.frame_size - 1).bit_length()
+        self._window = np.hamming(self.frame_size).astype(np.float32)
+        self._filterbank = self._mel_filterbank(n_mels)
+        # DCT-II como matriz; se descarta c0 (volumen) para no depender de lo fuerte que se hable
+        k = np.arange(n_mels)
+        self._dct = np.cos(np.pi / n_mels * (k + 0.5)[None, :] * np.arange(1, n_coeffs)[:, None]).astype(np.float32)
+
+    def _mel_filterbank(self, n_mels):
+        """Filtros triangulares en escala mel entre 0 Hz y Nyquist"""
+        to_mel = lambda hz: 2595 * np.log10(1 + hz / 700)
+        to_hz = lambda mel: 700 * (10 ** (mel / 2595) - 1)
+        edges = to_hz(np.linspace(0, to_mel(self.sample_rate / 2), n_mels + 2))
+        bins = np.fft.rfftfreq(self.n_fft, 1 / self.sample_rate)
+        lower, center, upper = edges[:-2, None], edges[1:-1, None], edges[2:, None]
+        rising = (bins - lower) / (center - lower)
+        falling = (upper - bins) / (upper - center)
+        return np.maximum(0, np.minimum(rising, falling)).astype(np.float32)
+
+    def __call__(self, samples):
+        """Coeficientes MFCC (tramas x coeficientes) de audio int16"""
+        signal = samples.astype(np.float32) / 32768.0
+        # Preénfasis: realza los agudos, donde están las consonantes
+        signal = np.append(signal[:1], signal[1:] - 0.97 * signal[:-1])
+        if len(signal) < self.frame_size:
+            return np.zeros((0, self._dct.shape[0]), dtype=np.float32)
+        n_frames = 1 + (len(signal) - self.frame_size) // self.hop_size
+        starts = np.arange(n_frames)[:, None] * self.hop_size
+        frames = signal[starts + np.arange(self.frame_size)] * self._window
+        power = np.abs(np.fft.rfft(frames, self.n_fft, axis=1)) ** 2
+        log_mel = np.log(power @ self._filterbank.T + 1e-10)
+        return log_mel @ self._dct.T
+
+def subsequence_dtw(template, features, skip_penalty=0.1):
+    """Distancia media entre la plantilla y su mejor alineamiento dentro de features
+
+    La plantilla puede empezar y acabar en cualquier trama de features. Cada
+    trama de la plantilla avanza 0, 1 o 2 tramas de features (ritmo entre la
+    mitad y el doble), así que el camino tiene siempre len(template) pasos y
+    cada fila se calcula vectorizada a partir de la anterior.
+    """
+    if len(features) == 0:
+        return float("inf")
+    # Distancia euclídea entre cada trama de la plantilla y cada trama del audio
+    cost = np.sqrt(np.maximum(
+        (template ** 2).sum(1)[:, None] + (features ** 2).sum(1)[None, :] - 2 * template @ features.T, 0))
+    # Penalización relativa al coste típico para no favorecer estirar o comprimir
+    penalty = skip_penalty * float(np.median(cost))
+    accumulated = cost[0].copy()
+    for row in cost[1:]:
+        stay = accumulated + penalty
+        diagonal = np.concatenate(([np.inf], accumulated[:-1]))
+        skip = np.concatenate(([np.inf, np.inf], accumulated[:-2])) + penalty
+        accumulated = row + np.minimum(np.minimum(diagonal, skip), stay)
+    return float(accumulated.min()) / len(template)
+
+def read_wav(path):
+    with wave.open(path, 'rb') as f:
+        return np.frombuffer(f.readframes(f.getnframes()), dtype=np.int16), f.getframerate()
+
+def trim_silence(samples, sample_rate, floor_db=30, frame_ms=10):
+    """Recorta el silencio de los extremos (tramas a más de floor_db por debajo del pico)"""
+    frame = sample_rate * frame_ms // 1000
+    usable = len(samples) - len(samples) % frame
+    if usable == 0:
+        return samples
+    energy = 10 * np.log10(np.mean(samples[:usable].astype(np.float32).reshape(-1, frame) ** 2, axis=1) + 1e-10)
+    loud = np.flatnonzero(energy > energy.max() - floor_db)
+    return samples[loud[0] * frame:(loud[-1] + 1) * frame]
+
+class WakeWordSpotter:
+    def __init__(self, templates, sample_rate=16000, threshold=None, search_seconds=2.5, calibration_margin=1.3):
+        # templates: {nombre: [muestras int16 del nombre dicho suelto]}
+        self.sample_rate = sample_rate
+        self.search_seconds = search_seconds
+        self.extract = MFCCExtractor(sample_rate)
+        # Plantillas (nombre, MFCC) sin el silencio de alrededor; se ignoran las casi vacías
+        extracted = [
+            (name, self.extract(trim_silence(samples, sample_rate)))
+            for name, recordings in templates.items() for samples in recordings
+        ]
+        self.templates = [(name, features) for name, features in extracted if len(features) > 2]
+        # Sin umbral fijo se calibra con las propias plantillas
+        self.threshold = threshold if threshold is not None else self._calibrate(calibration_margin)
+
+    def _calibrate(self, margin):
+        """Umbral = mayor distancia de cada plantilla a la más parecida de las demás, con margen
+
+        Todas las grabaciones deberían aceptarse entre sí; el margen cubre la
+        variación de una grabación nueva respecto a las de referencia.
+        """
+        if len(self.templates) < 2:
+            return None
+        nearest = []
+        for index, (_, features) in enumerate(self.templates):
+            nearest.append(min(
+                subsequence_dtw(other, features) for other_index, (_, other) in enumerate(self.templates)
+                if other_index != index
+            ))
+        return max(nearest) * margin
+
+    @property
+    def ready(self):
+        """Hacen falta al menos dos grabaciones para fijar el umbral"""
+        return bool(self.templates) and self.threshold is not None
+
+    def detect(self, samples):
+        """Busca un nombre al principio de la frase; devuelve (nombre o None, distancia)"""
+        features = self.extract(samples[:int(self.search_seconds * self.sample_rate)])
+        best_name, best_distance = None, float("inf")
+        for name, template in self.templates:
+            distance = subsequence_dtw(template, features)
+            if distance < best_distance:
+                best_name, best_distance = name, distance
+        if best_distance > self.threshold:
+            return None, best_distance
+        return best_name, best_distance
+
+    def detect_audio(self, audio_data):
+        """detect() sobre un sr.AudioData; devuelve (nombre o None, distancia, segundos de audio)"""
+        samples = np.frombuffer(
+            audio_data.get_raw_data(convert_rate=self.sample_rate, convert_width=2), dtype=np.int16)
+        name, distance = self.detect(samples)
+        return name, distance, len(samples) / self.sample_rate
+
+def load_templates(path, words=WAKE_WORDS):
+    """Lee las grabaciones <nombre>_<n>.wav de la carpeta: ({nombre: [muestras]}, frecuencia)"""
+    templates = {}
+    rate = None
+    for wav_path in sorted(glob.glob(os.path.join(path, "*.wav"))):
+        name = os.path.basename(wav_path).rsplit("_", 1)[0].lower()
+        if name not in words:
+            continue
+        samples, rate = read_wav(wav_path)
+        templates.setdefault(name, []).append(samples)
+    return templates, rate
+
+def create_wake_word_spotter(mode, templates_path, threshold=None, search_seconds=2.5, logger=None):
+    """Crea el detector de nombre según constants.WAKE_WORD_MODE; None si está desactivado
+
+    Sin grabaciones suficientes también devuelve None: todo se transcribe como antes.
+    """
+    if mode == "off":
+        return None
+    templates, sample_rate = load_templates(templates_path)
+    spotter = WakeWordSpotter(templates, sample_rate or 16000, threshold, search_seconds) if templates else None
+    if spotter is None or not spotter.ready:
+        if logger:
+            logger.logger.warning(
+                f"Sin grabaciones suficientes en {templates_path} (python -m modulos.wake_word <nombre>); se transcribe todo"
+            )
+        return None
+    if logger:
+        logger.logger.info(f"Detector de nombre ({mode}): {len(spotter.templates)} plantillas, umbral {spotter.threshold:.2f}")
+        if mode == "gate":
+            logger.logger.warning("WAKE_WORD_MODE='gate': las frases sin nombre no se transcriben fuera de la ventana de seguimiento")
+    return spotter
+
+def enroll(name, count=5, seconds=2.0):
+    """Graba count veces el nombre dicho suelto como plantillas del detector"""
+    import sounddevice as sd
+    import constants
+    os.makedirs(constants.WAKE_WORD_TEMPLATES_PATH, exist_ok=True)
+    existing = len(glob.glob(os.path.join(constants.WAKE_WORD_TEMPLATES_PATH, f"{name}_*.wav")))
+    for index in range(existing, existing + count):
+        input(f"Pulsa Enter y di \"{name}\" ({index - existing + 1}/{count})...")
+        recording = sd.rec(int(seconds * constants.STT_SAMPLE_RATE), samplerate=constants.STT_SAMPLE_RATE,
+                           channels=1, dtype='int16', device=constants.VOICEMEETER_INPUT_INDEX)
+        sd.wait()
+        path = os.path.join(constants.WAKE_WORD_TEMPLATES_PATH, f"{name}_{index}.wav")
+        with wave.open(path, 'wb') as f:
+            f.setnchannels(1)
+            f.setsampwidth(2)
+            f.setframerate(constants.STT_SAMPLE_RATE)
+            f.writeframes(recording.tobytes())
+        print(f"Guardado {path}")
+
+if __name__ == '__main__':
+    # Uso: python -m modulos.wake_word <nombre> [grabaciones]
+    if len(sys.argv) < 2 or sys.argv[1].lower() not in WAKE_WORDS:
+        print(f"Uso: python -m modulos.wake_word <{'|'.join(WAKE_WORDS)}> [grabaciones]")
+        sys.exit(1)
+    enroll(sys.argv[1].lower(), int(sys.argv[2]) if len(sys.argv) > 2 else 5)
@@ -0,0 +1,74 @@
+import queue
+import threading
+import time
+
+class WriteBehindQueue:
+    def __init__(self, max_size=64, put_timeout=0.5, logger=None):
+        self.put_timeout = put_timeout
+        self.logger = logger
+        self._queue = queue.Queue(maxsize=max_size)
+        # Veces que un productor tuvo que esperar porque la cola estaba llena
+        self.backpressure_count = 0
+        # Ordena submit() frente a drain(): ninguna tarea se encola detrás del centinela
+        self._lock = threading.Lock()
+        self._running = True
+        # Un solo hilo: las tareas se aplican en el mismo orden en que se encolan
+        self._thread = threading.Thread(target=self._worker, daemon=True)
+        self._thread.start()
+
+    def __len__(self):
+        return self._queue.qsize()
+
+    def submit(self, name, function, *args, **kwargs):
+        """Encola trabajo posterior a la respuesta; si la cola está llena espera a que haya hueco"""
+        task = (name, function, args, kwargs)
+        with self._lock:
+            if self._running:
+                try:
+                    self._queue.put(task, timeout=self.put_timeout)
+                except queue.Full:
+                    # Contrapresión: el productor espera en lugar de descartar escrituras o desordenarlas
+                    self.backpressure_count += 1
+                    if self.logger:
+                        self.logger.logger.warning(f"Cola de escritura llena, '{name}' espera a que haya hueco")
+                    self._queue.put(task)
+                return
+        # Iniciado el cierre ya no se encola nada: se ejecuta en el hilo que llama
+        self._run(task)
+
+    def _run(self, task):
+        name, function, args, kwargs = task
+        try:
+            function(*args, **kwargs)
+        except Exception as e:
+            if self.logger:
+                self.logger.log_error("write_behind", f"{name}: {str(e)}")
+
+    def _worker(self):
+        """Ejecuta las tareas encoladas una a una"""
+        while True:
+            task = self._queue.get()
+            try:
+                if task is None:
+                    return
+                self._run(task)
+            finally:
+                self._queue.task_done()
+
+    def drain(self, timeout=None):
+        """Espera a que se apliquen las tareas pendientes y detiene el hilo; devuelve si terminó"""
+        with self._lock:
+            self._running = False
+        deadline = None if timeout is None else time.time() + timeout
+        while self._thread.is_alive():
+            try:
+                self._queue.put(None, timeout=0.1)
+                break
+            except queue.Full:
+                if deadline is not None and time.time() > deadline:
+                    break
+        remaining = None if deadline is None else max(0.0, deadline - time.time())
+        self._thread.join(remaining)
+        if self._thread.is_alive() and self.logger:
+            self.logger.log_error("write_behind", f"Quedaron {len(self)} tareas sin escribir al cerrar")
+        return not self._thread.is_alive()